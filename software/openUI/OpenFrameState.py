@@ -25,6 +25,7 @@ class OpenFrameState(OpenFrame.OpenFrame):
         
         # local variables
         self.updatePeriod    = None
+        self.lastJson        = None
         
         temp = OpenGuiLib.HeaderLabel(self.container,text="data")
         #temp.grid(row=0,column=0)
@@ -68,7 +69,11 @@ class OpenFrameState(OpenFrame.OpenFrame):
     
     def _cb_autoUpdate(self):
         
-        self.update(json.loads(self.updateFunc(*self.updateParams).toJson()))
+        # only redraw when the state changed
+        newJson = self.updateFunc(*self.updateParams).toJson()
+        if newJson!=self.lastJson:
+            self.lastJson = newJson
+            self.update(json.loads(newJson))
         
         if self.updatePeriod:
             self.after(self.updatePeriod,self._cb_autoUpdate)
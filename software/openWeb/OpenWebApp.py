@@ -1,15 +1,66 @@
+import time
+
 import web
 
+from moteState import StateStreamer
+
 openWebApp_moteState_handlers = None
+openWebApp_stateStreamer      = None
+
+# versions start over with each moteState, so ETags also tell which one
+ETAG_NONCE                    = '{0:x}'.format(int(time.time()*1000000))
+
+def getETagPrefix(ms):
+    return '{0}.{1:x}.'.format(ETAG_NONCE,id(ms))
+
+def getMoteState():
+    '''
+    \brief The moteState picked by the "mote" query parameter, the first one by default.
+    '''
+    serialPort = web.input(mote=None).mote
+    if serialPort==None:
+        return openWebApp_moteState_handlers[0]
+    for ms in openWebApp_moteState_handlers:
+        if ms.moteConnector.serialport==serialPort:
+            return ms
+    raise web.notfound()
 
 class moteState(object):
     def GET(self,stateName):
+        
+        ms           = getMoteState()
+        prefix       = getETagPrefix(ms)
+        
+        # the version of the state the client already has, if it got it from
+        # this very moteState
+        etag         = web.ctx.env.get('HTTP_IF_NONE_MATCH','').strip('"')
+        sinceVersion = None
+        if etag.startswith(prefix):
+            try:
+                sinceVersion = int(etag[len(prefix):])
+            except ValueError:
+                pass
+        
         try:
-            jsonToReturn = openWebApp_moteState_handlers[0].getStateElem(stateName)
-            web.header('Content-Type', 'text/json')
-            return jsonToReturn
+            state = ms.getStateElemIfChanged(stateName,sinceVersion)
         except ValueError:
             raise web.notfound()
+        
+        if state==None:
+            raise web.notmodified()
+        
+        (version,jsonToReturn) = state
+        web.header('Content-Type', 'text/json')
+        web.header('ETag', '"{0}{1}"'.format(prefix,version))
+        return jsonToReturn
+
+class moteStateStream(object):
+    def GET(self):
+        
+        # push the state of all motes as it changes, see StateStreamer
+        web.header('Content-Type',  'text/event-stream')
+        web.header('Cache-Control', 'no-cache')
+        return openWebApp_stateStreamer.stream()
 
 class index(object):
     def GET(self):
@@ -19,13 +70,16 @@ class OpenWebApp(web.application):
     
     urls = (
         '/',               'index',
+        '/moteStateStream','moteStateStream',
         '/moteState/(.*)', 'moteState',
     )
     
     def __init__(self, moteState_handlers):
         global openWebApp_moteState_handlers
+        global openWebApp_stateStreamer
         
         openWebApp_moteState_handlers = moteState_handlers
+        openWebApp_stateStreamer      = StateStreamer.StateStreamer(moteState_handlers)
         
         # initialize parent class
         web.application.__init__(self,self.urls,globals())
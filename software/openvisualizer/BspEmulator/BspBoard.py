@@ -45,10 +45,8 @@ class BspBoard(BspModule.BspModule):
             if self.log.isEnabledFor(logging.DEBUG):
                 self.log.debug('cmd_sleep')
             
-            self.motehandler.cpuDone.release()
-            
-            # block the mote until CPU is released by ISR
-            self.motehandler.cpuRunning.acquire()
+            # hand the CPU back until an ISR kicks the scheduler
+            self.motehandler.sleep()
             
         except Exception as err:
             self.log.critical(err)
@@ -24,7 +24,7 @@ class BspBsp_timer(BspModule.BspModule):
         self.hwCrystal       = self.motehandler.hwCrystal
         self.running         = False
         self.compareArmed    = False
-        self.timeLastReset   = self.hwCrystal.getTimeLastTick()
+        self.tickLastReset   = self.hwCrystal.getTickCount()
         
         # initialize the parent
         BspModule.BspModule.__init__(self,'BspBsp_timer')
@@ -45,7 +45,7 @@ class BspBsp_timer(BspModule.BspModule):
         self._cmd_reset_internal()
         
         # remember the time of last reset
-        self.timeLastReset   = self.hwCrystal.getTimeLastTick()
+        self.tickLastReset   = self.hwCrystal.getTickCount()
         
         # calculate time at overflow event (in 'PERIOD' ticks)
         overflowTime         = self.hwCrystal.getTimeIn(self.PERIOD)
@@ -81,7 +81,7 @@ class BspBsp_timer(BspModule.BspModule):
             self.log.debug('cmd_scheduleIn delayTicks='+str(delayTicks))
         
         # get current counter value
-        counterVal                = self.hwCrystal.getTicksSince(self.timeLastReset)
+        counterVal                = self.hwCrystal.getTickCount()-self.tickLastReset
         
         # how many ticks until compare event
         if counterVal<delayTicks:
@@ -123,7 +123,7 @@ class BspBsp_timer(BspModule.BspModule):
             self.log.debug('cmd_get_currentValue')
         
         # get current counter value
-        counterVal           = self.hwCrystal.getTicksSince(self.timeLastReset)
+        counterVal           = self.hwCrystal.getTickCount()-self.tickLastReset
         
         # respond
         return counterVal
@@ -148,7 +148,7 @@ class BspBsp_timer(BspModule.BspModule):
         self.counterVal      = 0
         
         # remember the time of last reset
-        self.timeLastReset   = self.hwCrystal.getTimeLastTick()
+        self.tickLastReset   = self.hwCrystal.getTickCount()
         
         # calculate time at overflow event (in 'PERIOD' ticks)
         overflowTime         = self.hwCrystal.getTimeIn(self.PERIOD)
@@ -168,11 +168,11 @@ class BspBsp_timer(BspModule.BspModule):
         '''
         
         # remember the time of this reset; needed internally to schedule further events
-        self.timeLastReset   = self.hwCrystal.getTimeLastTick()
+        self.tickLastReset   = self.hwCrystal.getTickCount()
         
         # log the activity
         if self.log.isEnabledFor(logging.DEBUG):
-            self.log.debug('timeLastReset='+str(self.timeLastReset))
+            self.log.debug('tickLastReset='+str(self.tickLastReset))
             self.log.debug('PERIOD='+str(self.PERIOD))
         
         # reschedule the next overflow event
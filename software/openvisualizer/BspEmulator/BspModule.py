@@ -6,6 +6,36 @@ class NullLogHandler(logging.Handler):
     def emit(self, record):
         pass
 
+#============================ checkpointing ===================================
+
+PLAIN_TYPES = (bool,int,long,float,str,type(None))
+
+def isPlainData(value):
+    '''
+    \brief Whether a value only contains data, no reference to other objects.
+    '''
+    if isinstance(value,PLAIN_TYPES):
+        return True
+    if isinstance(value,(list,tuple)):
+        return all([isPlainData(v) for v in value])
+    if isinstance(value,dict):
+        return all([isPlainData(k) and isPlainData(v) for (k,v) in value.items()])
+    return False
+
+def getModuleState(module):
+    '''
+    \brief Return the attributes of an emulated module which hold plain data.
+    
+    References to the engine, other modules, locks and loggers are left out;
+    they are recreated when the module is instantiated.
+    '''
+    return dict(
+        [(k,v) for (k,v) in module.__dict__.items() if isPlainData(v)]
+    )
+
+def setModuleState(module,state):
+    module.__dict__.update(state)
+
 class BspModule(object):
     '''
     \brief Emulates the 'board' BSP module
@@ -30,6 +60,14 @@ class BspModule(object):
     def getIsInitialized():
        return self.isInitialized
     
+    #=== checkpointing
+    
+    def getState(self):
+        return getModuleState(self)
+    
+    def setState(self,state):
+        setModuleState(self,state)
+    
     #======================== private =========================================
     
     def _checkInit(self):
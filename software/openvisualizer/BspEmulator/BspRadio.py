@@ -21,6 +21,24 @@ class RadioState:
     TXRX_DONE           = 'TXRX_DONE',           # Frame has been sent/received completely.
     TURNING_OFF         = 'TURNING_OFF',         # Turning the RF chain off.
 
+# what the radio spends energy on, in each state
+STATE_ACTIVITY = {
+    RadioState.STOPPED:            'off',
+    RadioState.RFOFF:              'off',
+    RadioState.SETTING_FREQUENCY:  'idle',
+    RadioState.FREQUENCY_SET:      'idle',
+    RadioState.LOADING_PACKET:     'idle',
+    RadioState.PACKET_LOADED:      'idle',
+    RadioState.ENABLING_TX:        'idle',
+    RadioState.TX_ENABLED:         'idle',
+    RadioState.TRANSMITTING:       'tx',
+    RadioState.ENABLING_RX:        'idle',
+    RadioState.LISTENING:          'listen',
+    RadioState.RECEIVING:          'rx',
+    RadioState.TXRX_DONE:          'idle',
+    RadioState.TURNING_OFF:        'off',
+}
+
 class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
     '''
     \brief Emulates the 'radio' BSP module
@@ -34,6 +52,17 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
     SIGNAL_WIRELESSTXSTART        = 'wirelessTxStart'
     SIGNAL_WIRELESSTXEND          = 'wirelessTxEnd'
     
+    DELAY_TX                      = 0.000214 # time between txNow and start of frame, in s
+    
+    # power drawn in each activity, in W (CC2420 at 3V)
+    POWER                         = {
+        'tx':                     0.0522,
+        'rx':                     0.0564,
+        'listen':                 0.0564,
+        'idle':                   0.001278,
+        'off':                    0.00000006,
+    }
+    
     def __init__(self,engine,motehandler):
         
         # store params
@@ -50,7 +79,16 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
         self.isRfOn      = False  # radio is off
         self.txBuf       = []
         self.rxBuf       = []
-        self.delayTx     = 0.000214
+        self.delayTx     = self.DELAY_TX
+        
+        # statistics
+        self.activity          = 'off'
+        self.timeLastChange    = self.timeline.getCurrentTime()
+        self.timeIn            = dict([(a,0) for a in self.POWER]) # time spent in each activity, in s
+        self.numFramesSent     = 0
+        self.numBytesSent      = 0
+        self.numFramesReceived = 0
+        self.numCollisions     = 0
         
         # initialize the parents
         BspModule.BspModule.__init__(self,'BspRadio')
@@ -76,6 +114,33 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
     
     #======================== public ==========================================
     
+    #=== statistics
+    
+    def getStats(self):
+        '''
+        \brief Return what the radio did since the mote was created.
+        
+        \returns A dictionary with the time spent in each activity (in s),
+            the energy drawn (in J), the duty cycle (the fraction of time the
+            radio was not off), and the number of frames and bytes sent,
+            frames received and collisions.
+        '''
+        
+        # include the time spent in the current state
+        timeIn = dict(self.timeIn)
+        timeIn[self.activity]   += self.timeline.getCurrentTime()-self.timeLastChange
+        totalTime                = sum(timeIn.values())
+        
+        return {
+            'timeIn':            timeIn,
+            'energy':            sum([timeIn[a]*self.POWER[a] for a in timeIn]),
+            'dutyCycle':         (totalTime-timeIn['off'])/totalTime if totalTime else 0,
+            'numFramesSent':     self.numFramesSent,
+            'numBytesSent':      self.numBytesSent,
+            'numFramesReceived': self.numFramesReceived,
+            'numCollisions':     self.numCollisions,
+        }
+    
     #=== commands
     
     def cmd_init(self):
@@ -250,6 +315,23 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
         # calculate when the "start of frame" event will take place
         startOfFrameTime     = currenttime+self.delayTx
         
+        # update statistics
+        self.numFramesSent  += 1
+        self.numBytesSent   += len(self.txBuf)
+        
+        # record the frame, if the engine is tracing
+        if self.timeline.trace:
+            self.timeline.trace.recordFrame(currenttime,self.motehandler.getId(),self.txBuf)
+        
+        # announce the upcoming transmission to the propagation model
+        self.propagation.indicateTxScheduled(
+            self.motehandler.getId(),
+            self.txBuf,
+            self.frequency,
+            startOfFrameTime,
+            startOfFrameTime+self._packetLengthToDuration(len(self.txBuf)),
+        )
+        
         # schedule "start of frame" event
         self.timeline.scheduleEvent(startOfFrameTime,
                                     self.motehandler.getId(),
@@ -401,6 +483,12 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
                 self.intr_startOfFrame_fromPropagation,
                 self.INTR_STARTOFFRAME_PROPAGATION,
             )
+        
+        elif (self.isInitialized==True         and
+              self.state==RadioState.RECEIVING and
+              self.frequency==channel):
+            # another frame starts while receiving one
+            self.numCollisions += 1
     
     def _indicateTxEnd(self,sender,signal,data):
         
@@ -412,6 +500,7 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
         if (self.isInitialized==True and
             self.state==RadioState.RECEIVING):
             self._changeState(RadioState.TXRX_DONE)
+            self.numFramesReceived += 1
             
             # schedule end of frame
             self.timeline.scheduleEvent(
@@ -427,6 +516,13 @@ class BspRadio(BspModule.BspModule,eventBusClient.eventBusClient):
         return float(numBytes*8)/250000.0
         
     def _changeState(self,newState):
+        
+        # account for the time spent in the previous state
+        now                         = self.timeline.getCurrentTime()
+        self.timeIn[self.activity] += now-self.timeLastChange
+        self.timeLastChange         = now
+        self.activity               = STATE_ACTIVITY[newState]
+        
         self.state = newState
         if self.log.isEnabledFor(logging.DEBUG):
             self.log.debug('state={0}'.format(self.state))
\ No newline at end of file
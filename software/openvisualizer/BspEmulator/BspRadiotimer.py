@@ -23,7 +23,7 @@ class BspRadiotimer(BspModule.BspModule):
         self.timeline        = self.engine.timeline
         self.hwCrystal       = self.motehandler.hwCrystal
         self.running         = False   # whether the counter is currently running
-        self.timeLastReset   = 0       # time at last counter reset
+        self.tickLastReset   = 0       # crystal tick at last counter reset
         self.period          = None    # counter period
         self.compareArmed    = False   # whether the compare is armed
         
@@ -57,7 +57,7 @@ class BspRadiotimer(BspModule.BspModule):
             self.log.debug('cmd_start period='+str(self.period))
         
         # remember the time of last reset
-        self.timeLastReset   = self.hwCrystal.getTimeLastTick()
+        self.tickLastReset   = self.hwCrystal.getTickCount()
         
         # calculate time at overflow event (in 'period' ticks)
         overflowTime         = self.hwCrystal.getTimeIn(self.period)
@@ -80,7 +80,7 @@ class BspRadiotimer(BspModule.BspModule):
             self.log.debug('cmd_getValue')
         
         # get current counter value
-        counterVal           = self.hwCrystal.getTicksSince(self.timeLastReset)
+        counterVal           = self.hwCrystal.getTickCount()-self.tickLastReset
         
         # respond
         return counterVal
@@ -97,7 +97,7 @@ class BspRadiotimer(BspModule.BspModule):
             self.log.debug('cmd_setPeriod period='+str(self.period))
         
         # how many ticks since last reset
-        ticksSinceReset      = self.hwCrystal.getTicksSince(self.timeLastReset)
+        ticksSinceReset      = self.hwCrystal.getTickCount()-self.tickLastReset
         
         # calculate time at overflow event (in 'period' ticks)
         if ticksSinceReset<self.period:
@@ -134,7 +134,7 @@ class BspRadiotimer(BspModule.BspModule):
             self.log.debug('cmd_schedule offset='+str(offset))
         
         # get current counter value
-        counterVal           = self.hwCrystal.getTicksSince(self.timeLastReset)
+        counterVal           = self.hwCrystal.getTickCount()-self.tickLastReset
         
         # how many ticks until compare event
         if counterVal<offset:
@@ -178,7 +178,7 @@ class BspRadiotimer(BspModule.BspModule):
         raise NotImplementedError()
     
     def getCounterVal(self):
-        return self.hwCrystal.getTicksSince(self.timeLastReset)
+        return self.hwCrystal.getTickCount()-self.tickLastReset
     
     #======================== interrupts ======================================
     
@@ -216,7 +216,7 @@ class BspRadiotimer(BspModule.BspModule):
             self.log.debug('intr_overflow')
         
         # remember the time of this reset; needed internally to schedule further events
-        self.timeLastReset   = self.hwCrystal.getTimeLastTick()
+        self.tickLastReset   = self.hwCrystal.getTickCount()
         
         # reschedule the next overflow event
         # Note: the intr_overflow fires every self.period
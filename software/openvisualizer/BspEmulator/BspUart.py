@@ -10,9 +10,10 @@ class BspUart(BspModule.BspModule):
     \brief Emulates the 'uart' BSP module
     '''
     
-    INTR_TX   = 'uart.tx'
-    INTR_RX   = 'uart.rx'
-    BAUDRATE  = 115200
+    INTR_TX        = 'uart.tx'
+    INTR_RX        = 'uart.rx'
+    BAUDRATE       = 115200
+    RXBUFFER_SIZE  = 4096  # bytes the mote can write before it blocks
     
     def __init__(self,engine,motehandler):
         
@@ -25,15 +26,13 @@ class BspUart(BspModule.BspModule):
         self.interruptsEnabled    = False
         self.txInterruptFlag      = False
         self.rxInterruptFlag      = False
-        self.uartRxBuffer         = []
-        self.uartRxBufferSem      = threading.Semaphore()
-        self.uartRxBufferSem.acquire()
-        self.uartRxBufferLock     = threading.Lock()
-        self.uartTxBuffer         = []                # the bytes to be sent over UART
+        self.uartRxBuffer         = bytearray(self.RXBUFFER_SIZE) # ring buffer of bytes written by the mote
+        self.uartRxHead           = 0                 # index of the oldest byte in uartRxBuffer
+        self.uartRxCount          = 0                 # number of bytes in uartRxBuffer
+        self.uartRxCond           = threading.Condition()
+        self.uartTxBuffer         = bytearray()       # the bytes to be sent over UART
         self.uartTxNext           = None              # the byte that was just signaled to mote
         self.uartTxBufferLock     = threading.Lock()
-        self.waitForDoneReading   = threading.Lock()
-        self.waitForDoneReading.acquire()
         
         # initialize the parent
         BspModule.BspModule.__init__(self,'BspUart')
@@ -44,21 +43,36 @@ class BspUart(BspModule.BspModule):
     
     def read(self,numBytesToRead):
         '''
-        \brief Read a byte from the mote.
-        '''
-        assert numBytesToRead==1
+        \brief Read bytes from the mote.
         
-        # wait for something to appear in the RX buffer
-        self.uartRxBufferSem.acquire()
+        Blocks until that many bytes were written by the mote.
+        '''
+        assert 0<numBytesToRead<=self.RXBUFFER_SIZE
         
-        # pop the first element
-        with self.uartRxBufferLock:
-            assert len(self.uartRxBuffer)>0
-            returnVal = chr(self.uartRxBuffer.pop(0))
+        with self.uartRxCond:
+            
+            # wait for enough bytes to appear in the RX buffer
+            while self.uartRxCount<numBytesToRead:
+                self.uartRxCond.wait()
+            
+            # pop them
+            returnVal = str(self._getRxBytes(numBytesToRead))
+            self.uartRxHead   = (self.uartRxHead+numBytesToRead)%self.RXBUFFER_SIZE
+            self.uartRxCount -= numBytesToRead
+            
+            # the mote may be waiting for room in the RX buffer
+            self.uartRxCond.notify_all()
         
-        # return that element
+        # return those bytes
         return returnVal
     
+    def read_available(self):
+        '''
+        \brief Number of bytes which can be read without blocking.
+        '''
+        with self.uartRxCond:
+            return self.uartRxCount
+    
     def write(self,bytesToWrite):
         '''
         \brief Write a string of bytes to the mote.
@@ -67,14 +81,39 @@ class BspUart(BspModule.BspModule):
         assert len(bytesToWrite)
         
         with self.uartTxBufferLock:
-            self.uartTxBuffer     = [ord(b) for b in bytesToWrite]
+            self.uartTxBuffer    += bytesToWrite
         
-        self.engine.pause()
-        self._scheduleNextTx()
-        self.engine.resume()
+        # schedule the delivery from the timeline thread, the engine keeps running
+        self.timeline.callFromTimeline(self._scheduleNextTx)
     
-    def doneReading(self):
-        self.waitForDoneReading.release()
+    #=== checkpointing
+    
+    def getState(self):
+        state = BspModule.BspModule.getState(self)
+        
+        # the bytes in the RX buffer, oldest first
+        with self.uartRxCond:
+            state['uartRxBuffer'] = list(self._getRxBytes(self.uartRxCount))
+        
+        # the bytes not delivered to the mote yet
+        with self.uartTxBufferLock:
+            state['uartTxBuffer'] = list(self.uartTxBuffer)
+        
+        return state
+    
+    def setState(self,state):
+        state   = dict(state)
+        pending = state.pop('uartRxBuffer')
+        with self.uartTxBufferLock:
+            self.uartTxBuffer     = bytearray(state.pop('uartTxBuffer'))
+        BspModule.BspModule.setState(self,state)
+        
+        # bytes restored in the RX buffer are available for reading
+        with self.uartRxCond:
+            self.uartRxBuffer[:len(pending)] = bytearray(pending)
+            self.uartRxHead   = 0
+            self.uartRxCount  = len(pending)
+            self.uartRxCond.notify_all()
     
     #=== commands
     
@@ -139,7 +178,7 @@ class BspUart(BspModule.BspModule):
         
         # log the activity
         if self.log.isEnabledFor(logging.DEBUG):
-            self.log.debug('cmd_writeByte byteToWrite='+str(self.byteToWrite))
+            self.log.debug('cmd_writeByte byteToWrite='+str(byteToWrite))
         
         # set tx interrupt flag
         self.txInterruptFlag      = True
@@ -155,15 +194,18 @@ class BspUart(BspModule.BspModule):
             self.INTR_TX
         )
         
-        # add to receive buffer
-        with self.uartRxBufferLock:
-            self.uartRxBuffer    += [byteToWrite]
-        
-        # release the semaphore indicating there is something in RX buffer
-        self.uartRxBufferSem.release()
-        
-        # wait for the moteProbe to be done reading
-        self.waitForDoneReading.acquire()
+        with self.uartRxCond:
+            
+            # wait for the moteProbe to make room in the receive buffer
+            while self.uartRxCount==self.RXBUFFER_SIZE:
+                self.uartRxCond.wait()
+            
+            # add to receive buffer
+            self.uartRxBuffer[(self.uartRxHead+self.uartRxCount)%self.RXBUFFER_SIZE] = byteToWrite
+            self.uartRxCount     += 1
+            
+            # signal there is something in RX buffer
+            self.uartRxCond.notify_all()
     
     def cmd_readByte(self):
         '''emulates
@@ -196,7 +238,10 @@ class BspUart(BspModule.BspModule):
     
     def intr_rx(self):
         '''
-        \brief Interrupt to indicate to mote it received a byte from the UART.
+        \brief Interrupt to indicate to mote it received bytes from the UART.
+        
+        All the bytes which arrived since the last call are delivered at once,
+        calling the mote's RX ISR once per byte.
         '''
         
         # log the activity
@@ -208,32 +253,48 @@ class BspUart(BspModule.BspModule):
             # make sure there is a byte to TX
             assert len(self.uartTxBuffer)
             
-            # get the byte that is being transmitted
-            self.uartTxNext  = self.uartTxBuffer.pop(0)
-            
-            # schedule the next interrupt, if any bytes left
-            if len(self.uartTxBuffer):
-                self._scheduleNextTx()
+            # get the bytes that were transmitted
+            received             = self.uartTxBuffer
+            self.uartTxBuffer    = bytearray()
         
-        # send RX interrupt to mote
-        self.motehandler.mote.uart_isr_rx()
+        # send an RX interrupt to mote for each byte
+        for byte in received:
+            self.uartTxNext      = byte
+            self.motehandler.mote.uart_isr_rx()
         
         # do *not* kick the scheduler
         return False
     
     #======================== private =========================================
     
+    def _getRxBytes(self,numBytes):
+        '''
+        \brief Return the oldest bytes of the RX buffer, without removing them.
+        
+        Must be called holding uartRxCond.
+        '''
+        end = self.uartRxHead+numBytes
+        if end<=self.RXBUFFER_SIZE:
+            return self.uartRxBuffer[self.uartRxHead:end]
+        else:
+            return self.uartRxBuffer[self.uartRxHead:]+self.uartRxBuffer[:end-self.RXBUFFER_SIZE]
+    
     def _scheduleNextTx(self):
         
-        # calculate time at which byte will get out
-        timeNextTx           = self.timeline.getCurrentTime()+float(1.0/float(self.BAUDRATE))
+        with self.uartTxBufferLock:
+            numBytes         = len(self.uartTxBuffer)
         
-        # schedule that event
+        # those bytes were already delivered along with earlier ones
+        if not numBytes:
+            return
+        
+        # calculate time at which the last byte will get out
+        timeNextTx           = self.timeline.getCurrentTime()+numBytes*float(1.0/float(self.BAUDRATE))
+        
+        # schedule that event, replacing the one for bytes written earlier
         self.timeline.scheduleEvent(
             timeNextTx,
             self.motehandler.getId(),
             self.intr_rx,
             self.INTR_RX
         )
-    
-    
\ No newline at end of file
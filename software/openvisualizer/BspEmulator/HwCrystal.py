@@ -13,6 +13,7 @@ class HwCrystal(HwModule.HwModule):
     
     FREQUENCY = 32768
     MAXDRIFT  = 0
+    ROUNDING  = 1e-6 # fraction of a tick under which a time is considered on that tick
     
     def __init__(self,engine,motehandler):
         
@@ -28,7 +29,9 @@ class HwCrystal(HwModule.HwModule):
         # local variables
         self.drift           = float(random.uniform(-self.maxDrift,
                                                     +self.maxDrift))
-        self.tsTick          = self.timeline.getCurrentTime()
+        self.period          = self._getPeriod() # the drift never changes
+        self.invPeriod       = 1.0/self.period
+        self.tsStart         = self.timeline.getCurrentTime()
         
         # initialize the parent
         HwModule.HwModule.__init__(self,'HwCrystal')
@@ -40,29 +43,45 @@ class HwCrystal(HwModule.HwModule):
         \brief Start the crystal.
         '''
         
-        self.tsTick          = self.timeline.getCurrentTime()
+        self.tsStart         = self.timeline.getCurrentTime()
         
         # log
         if self.log.isEnabledFor(logging.DEBUG):
-            self.log.debug('crystal starts at '+str(self.tsTick))
+            self.log.debug('crystal starts at '+str(self.tsStart))
     
-    def getTimeLastTick(self):
+    def getTickCount(self):
         '''
-        \brief Return the timestamp of the last tick.
+        \brief Return the number of ticks since the crystal started.
         
-        \returns The timestamp of the last tick.
+        Time is accounted for in whole ticks since the start, rather than
+        by accumulating periods, so rounding errors do not build up.
+        
+        \returns The index of the last tick.
         '''
         
         currentTime          = self.timeline.getCurrentTime()
-        timeSinceLast        = currentTime-self.tsTick
-        period               = self._getPeriod()
         
-        numTicksSinceLast    = math.floor(float(timeSinceLast)/float(period))
-        timeLastTick         = self.tsTick+numTicksSinceLast*period
+        return int(math.floor((currentTime-self.tsStart)*self.invPeriod+self.ROUNDING))
+    
+    def getTimeOfTick(self,tick):
+        '''
+        \brief Return the timestamp of a tick.
+        
+        \param tick The index of the tick, as returned by getTickCount().
         
-        self.tsTick          = timeLastTick
+        \returns The timestamp of that tick.
+        '''
         
-        return timeLastTick
+        return self.tsStart+tick*self.period
+    
+    def getTimeLastTick(self):
+        '''
+        \brief Return the timestamp of the last tick.
+        
+        \returns The timestamp of the last tick.
+        '''
+        
+        return self.getTimeOfTick(self.getTickCount())
     
     def getTimeIn(self,numticks):
         '''
@@ -73,10 +92,7 @@ class HwCrystal(HwModule.HwModule):
         \returns The time it will be in a given number of ticks.
         '''
         
-        timeLastTick         = self.getTimeLastTick()
-        period               = self._getPeriod()
-        
-        return timeLastTick+numticks*period
+        return self.getTimeOfTick(self.getTickCount()+numticks)
     
     def getTicksSince(self,eventTime):
         '''
@@ -87,21 +103,14 @@ class HwCrystal(HwModule.HwModule):
         \returns The number of ticks since the time passed.
         '''
         
-        # get the current time
-        currentTime          = self.timeline.getCurrentTime()
-        
         # make sure that eventTime passed is in the past
-        assert(eventTime<=currentTime)
+        assert(eventTime<=self.timeline.getCurrentTime())
         
-        # get the time of the last tick
-        timeLastTick         = self.getTimeLastTick()
+        # the first tick at or after eventTime
+        eventTick            = int(math.ceil((eventTime-self.tsStart)*self.invPeriod-self.ROUNDING))
         
         # return the number of ticks
-        if eventTime>timeLastTick:
-            return 0
-        else:
-            period           = self._getPeriod()
-            return int(math.floor(float(timeLastTick-eventTime)/float(period)))
+        return max(self.getTickCount()-eventTick,0)
     
     #======================== private =========================================
     
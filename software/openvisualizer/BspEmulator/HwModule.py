@@ -2,6 +2,8 @@
 
 import logging
 
+import BspModule
+
 class NullLogHandler(logging.Handler):
     def emit(self, record):
         pass
@@ -25,5 +27,13 @@ class HwModule(object):
     
     #======================== public ==========================================
     
+    #=== checkpointing
+    
+    def getState(self):
+        return BspModule.getModuleState(self)
+    
+    def setState(self,state):
+        BspModule.setModuleState(self,state)
+    
     #======================== private =========================================
     
\ No newline at end of file
@@ -10,6 +10,7 @@ class HwSupply(HwModule.HwModule):
     '''
     
     INTR_SWITCHON  = 'hw_supply.switchOn'
+    INTR_RESUME    = 'hw_supply.resume'
     
     def __init__(self,engine,motehandler):
         
@@ -44,6 +45,26 @@ class HwSupply(HwModule.HwModule):
         # send command to mote
         self.motehandler.mote.supply_on()
     
+    def resume(self):
+        '''
+        \brief Restart a mote restored from a checkpoint.
+        
+        Unlike switchOn, this neither restarts the crystal nor initializes
+        the mote; the mote's state was loaded beforehand, and the firmware
+        picks up from it through OpenMote.supply_resume().
+        '''
+        
+        # log the activity
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug('resume')
+        
+        # filter error
+        if not self.moteOn:
+            raise RuntimeError('mote was not on')
+        
+        # send command to mote
+        self.motehandler.mote.supply_resume()
+    
     def switchOff(self):
         
         # log the activity
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                                   # BspEmulator/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import pytest
+
+import BspRadio
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_BspRadio.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_BspRadio')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_BspRadio',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ helpers =========================================
+
+class Timeline(object):
+    def __init__(self):
+        self.currentTime = 0
+        self.trace       = None
+    def getCurrentTime(self):
+        return self.currentTime
+    def scheduleEvent(self,atTime,moteId,cb,desc):
+        pass
+
+class Propagation(object):
+    def indicateTxScheduled(self,moteId,txBuf,frequency,startTime,endTime):
+        pass
+
+class Engine(object):
+    def __init__(self):
+        self.timeline    = Timeline()
+        self.propagation = Propagation()
+
+class MoteHandler(object):
+    def __init__(self,moteId):
+        self.id            = moteId
+        self.bspRadiotimer = None
+    def getId(self):
+        return self.id
+
+#============================ tests ===========================================
+
+def test_stats():
+
+    log.debug("\n---------- test_stats")
+    
+    engine   = Engine()
+    timeline = engine.timeline
+    sender   = BspRadio.BspRadio(engine,MoteHandler(1))
+    receiver = BspRadio.BspRadio(engine,MoteHandler(2))
+    sender.cmd_init()
+    receiver.cmd_init()
+    
+    # the receiver listens from t=1
+    timeline.currentTime = 1
+    receiver.cmd_setFrequency(11)
+    receiver.cmd_rxEnable()
+    
+    # the sender transmits at t=1.5
+    timeline.currentTime = 1.5
+    sender.cmd_setFrequency(11)
+    sender.cmd_loadPacket([1,2,3])
+    sender.cmd_txEnable()
+    sender.cmd_txNow()
+    
+    # the receiver hears it from t=1.6 to t=1.7, along with another frame
+    timeline.currentTime = 1.6
+    receiver._indicateTxStart(None,None,(1,sender.txBuf,11))
+    timeline.currentTime = 1.65
+    receiver._indicateTxStart(None,None,(3,[1,4,5],11))
+    timeline.currentTime = 1.7
+    receiver._indicateTxEnd(None,None,1)
+    
+    # then switches off at t=2
+    timeline.currentTime = 2
+    receiver.cmd_rfOff()
+    
+    timeline.currentTime = 3
+    stats = receiver.getStats()
+    
+    assert stats['timeIn']['off']==2
+    assert abs(stats['timeIn']['listen']-0.6)<1e-9
+    assert abs(stats['timeIn']['rx']-0.1)<1e-9
+    assert abs(stats['timeIn']['idle']-0.3)<1e-9
+    assert stats['timeIn']['tx']==0
+    assert abs(stats['dutyCycle']-1.0/3)<1e-9
+    assert abs(stats['energy']-sum([stats['timeIn'][a]*receiver.POWER[a] for a in receiver.POWER]))<1e-12
+    assert stats['numFramesReceived']==1
+    assert stats['numCollisions']==1
+    
+    stats = sender.getStats()
+    assert stats['numFramesSent']==1
+    assert stats['numBytesSent']==4
+    assert stats['timeIn']['tx']==1.5
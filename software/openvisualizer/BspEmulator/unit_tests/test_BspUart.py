@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..'))                                   # BspEmulator/
+
+import threading
+
+import pytest
+
+import BspUart
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_BspUart.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_BspUart')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_BspUart',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ helpers =========================================
+
+class Timeline(object):
+    def __init__(self):
+        self.currentTime  = 0
+        self.events       = {}
+        self.pendingCalls = []
+    def getCurrentTime(self):
+        return self.currentTime
+    def scheduleEvent(self,atTime,moteId,cb,desc):
+        self.events[desc] = (atTime,cb)
+    def callFromTimeline(self,func):
+        self.pendingCalls.append(func)
+
+class Engine(object):
+    def __init__(self):
+        self.timeline = Timeline()
+
+class Mote(object):
+    def __init__(self):
+        self.received = ''
+    def uart_isr_rx(self):
+        self.received += chr(self.uart.cmd_readByte())
+
+class MoteHandler(object):
+    def __init__(self):
+        self.mote = Mote()
+    def getId(self):
+        return 1
+
+@pytest.fixture
+def uart(monkeypatch):
+    monkeypatch.setattr(BspUart.BspUart,'RXBUFFER_SIZE',8)
+    uart = BspUart.BspUart(Engine(),MoteHandler())
+    uart.motehandler.mote.uart = uart
+    return uart
+
+def writeBytes(uart,data):
+    for b in data:
+        uart.cmd_writeByte(ord(b))
+
+#============================ tests ===========================================
+
+def test_readMultipleBytes(uart):
+
+    log.debug("\n---------- test_readMultipleBytes")
+    
+    writeBytes(uart,'abcde')
+    assert uart.read_available()==5
+    assert uart.read(3)=='abc'
+    assert uart.read_available()==2
+    assert uart.read(2)=='de'
+    assert uart.read_available()==0
+
+def test_wrapAround(uart):
+
+    log.debug("\n---------- test_wrapAround")
+    
+    # go around the 8-byte ring buffer a few times
+    for chunk in ['abcdef','ghijkl','mnopqr']:
+        writeBytes(uart,chunk)
+        assert uart.read(len(chunk))==chunk
+
+def test_backpressure(uart):
+
+    log.debug("\n---------- test_backpressure")
+    
+    # the mote writes more than fits in the buffer
+    writer = threading.Thread(target=writeBytes,args=(uart,'0123456789abcdef'))
+    writer.daemon = True
+    writer.start()
+    
+    received = ''
+    while len(received)<16:
+        received += uart.read(max(uart.read_available(),1))
+    
+    writer.join(1)
+    assert not writer.isAlive()
+    assert received=='0123456789abcdef'
+
+def test_checkpoint(uart):
+
+    log.debug("\n---------- test_checkpoint")
+    
+    writeBytes(uart,'abcdef')
+    uart.read(4)
+    writeBytes(uart,'ghij')
+    
+    restored = BspUart.BspUart(Engine(),MoteHandler())
+    restored.setState(uart.getState())
+    
+    assert restored.read_available()==6
+    assert restored.read(6)=='efghij'
+
+def test_writeChunk(uart):
+
+    log.debug("\n---------- test_writeChunk")
+    
+    timeline = uart.timeline
+    mote     = uart.motehandler.mote
+    
+    # two frames written by the moteProbe before the timeline gets to them
+    uart.write('abc')
+    uart.write('de')
+    for func in timeline.pendingCalls:
+        func()
+    
+    # a single event delivers all the bytes
+    (atTime,cb) = timeline.events[uart.INTR_RX]
+    assert atTime==5*(1.0/uart.BAUDRATE)
+    cb()
+    assert mote.received=='abcde'
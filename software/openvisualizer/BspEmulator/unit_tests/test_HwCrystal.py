@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..'))                                   # BspEmulator/
+
+import pytest
+
+import HwCrystal
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_HwCrystal.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_HwCrystal')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_HwCrystal',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ helpers =========================================
+
+class Timeline(object):
+    def __init__(self):
+        self.currentTime = 0
+    def getCurrentTime(self):
+        return self.currentTime
+
+class Engine(object):
+    def __init__(self):
+        self.timeline = Timeline()
+
+class MoteHandler(object):
+    def __init__(self,moteId):
+        self.id = moteId
+    def getId(self):
+        return self.id
+
+def createCrystals(numCrystals,startTime=0):
+    engine = Engine()
+    engine.timeline.currentTime = startTime
+    return [HwCrystal.HwCrystal(engine,MoteHandler(i+1)) for i in range(numCrystals)]
+
+#============================ tests ===========================================
+
+def test_ticks():
+
+    log.debug("\n---------- test_ticks")
+    
+    crystal  = createCrystals(1,startTime=0.5)[0]
+    timeline = crystal.timeline
+    period   = 1.0/crystal.FREQUENCY
+    
+    assert crystal.getTickCount()==0
+    assert crystal.getTimeLastTick()==0.5
+    
+    # in between ticks
+    timeline.currentTime = 0.5+10.5*period
+    assert crystal.getTickCount()==10
+    assert crystal.getTicksSince(0.5)==10
+    assert crystal.getTicksSince(0.5+0.5*period)==9
+    assert crystal.getTicksSince(timeline.currentTime)==0
+    assert crystal.getTimeIn(5)==crystal.getTimeOfTick(15)
+
+def test_noDrift():
+
+    log.debug("\n---------- test_noDrift")
+    
+    crystal  = createCrystals(1,startTime=0.1)[0]
+    timeline = crystal.timeline
+    
+    # jump from event to event, as a timer firing every tick would
+    for tick in range(1,100001):
+        timeline.currentTime = crystal.getTimeIn(1)
+        assert crystal.getTickCount()==tick
+    
+    # no error accumulated along the way
+    assert timeline.currentTime==crystal.getTimeOfTick(100000)
+    assert abs(timeline.currentTime-(0.1+100000.0/crystal.FREQUENCY))<1e-12
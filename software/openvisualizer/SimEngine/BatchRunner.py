@@ -0,0 +1,232 @@
+#!/usr/bin/python
+
+import copy
+import json
+import time
+import random
+import logging
+import itertools
+import multiprocessing
+
+import SimEngine
+import LocationManager
+
+class NullLogHandler(logging.Handler):
+    def emit(self, record):
+        pass
+
+log = logging.getLogger('BatchRunner')
+log.setLevel(logging.INFO)
+log.addHandler(NullLogHandler())
+
+#============================ defines =========================================
+
+DEFAULT_SCENARIO = {
+    'numMotes':          10,      # number of emulated motes
+    'duration':          60,      # simulated time, in s
+    'seed':              0,       # seeds the random generator, e.g. for random locations
+    'layout':            None,    # {'type': name, param: value...}, see LocationManager.LAYOUTS
+    'locations':         None,    # [[x,y,z],...], one per mote
+}
+
+class ScenarioException(Exception):
+    pass
+
+#============================ scenarios =======================================
+
+def loadScenario(filename):
+    '''
+    \brief Read a scenario from a JSON file.
+    
+    The file holds an object with any of the keys of DEFAULT_SCENARIO; the
+    missing ones take their default value.
+    
+    \param filename The scenario file.
+    
+    \returns The scenario, as a dictionary.
+    '''
+    with open(filename) as f:
+        try:
+            scenario = json.load(f)
+        except ValueError as err:
+            raise ScenarioException('{0}: {1}'.format(filename,err))
+    return makeScenario(scenario)
+
+def makeScenario(overrides={}):
+    '''
+    \brief Build a complete scenario.
+    
+    \param overrides A dictionary with the keys which differ from
+        DEFAULT_SCENARIO.
+    
+    \returns The scenario, as a dictionary.
+    '''
+    unknown = [k for k in overrides if k not in DEFAULT_SCENARIO]
+    if unknown:
+        raise ScenarioException('unknown scenario keys {0}'.format(sorted(unknown)))
+    
+    scenario = copy.deepcopy(DEFAULT_SCENARIO)
+    scenario.update(copy.deepcopy(overrides))
+    
+    if scenario['numMotes']<1:
+        raise ScenarioException('numMotes must be at least 1')
+    if scenario['duration']<=0:
+        raise ScenarioException('duration must be positive')
+    if scenario['locations']!=None and len(scenario['locations'])!=scenario['numMotes']:
+        raise ScenarioException('{0} locations for {1} motes'.format(
+                len(scenario['locations']),
+                scenario['numMotes'],
+            )
+        )
+    if scenario['locations']!=None and scenario['layout']!=None:
+        raise ScenarioException('give either a layout or the locations')
+    try:
+        makeLayout(scenario)
+    except LocationManager.LocationException as err:
+        raise ScenarioException(str(err))
+    
+    return scenario
+
+def makeLayout(scenario):
+    '''
+    \brief Create the layout which places the motes of a scenario.
+    
+    Without layout nor locations, motes are placed at random, using the seed
+    of the scenario.
+    '''
+    if scenario['locations']!=None:
+        return LocationManager.ListLayout(scenario['locations'])
+    if scenario['layout']!=None:
+        params = dict([(str(k),v) for (k,v) in scenario['layout'].items()])
+        if 'type' not in params:
+            raise LocationManager.LocationException('layout has no type')
+        return LocationManager.makeLayout(params.pop('type'),**params)
+    return LocationManager.RandomLayout(seed=scenario['seed'])
+
+def expandSweep(scenario,sweep):
+    '''
+    \brief Build one scenario per combination of parameter values.
+    
+    \param scenario The scenario the parameters are applied to.
+    \param sweep    A dictionary {key: [value,...]}.
+    
+    \returns A list of scenarios, the last key of the sweep (in alphabetical
+        order) varying fastest.
+    '''
+    keys      = sorted(sweep.keys())
+    returnVal = []
+    for values in itertools.product(*[sweep[k] for k in keys]):
+        overrides = dict([(k,v) for (k,v) in scenario.items() if k in DEFAULT_SCENARIO])
+        overrides.update(dict(zip(keys,values)))
+        returnVal.append(makeScenario(overrides))
+    return returnVal
+
+#============================ running =========================================
+
+def runScenario(headerPath,scenario):
+    '''
+    \brief Run a scenario to completion, at full speed.
+    
+    The motes are emulated by a cooperative SimEngine driven from the calling
+    thread; no TUN interface, RPL or user interface is created. The serial
+    output of each mote is consumed by a moteProbe and published on the
+    eventBus as usual.
+    
+    \param headerPath Path to openwsnmodule_obj.h.
+    \param scenario   The scenario, see makeScenario().
+    
+    \returns A dictionary with the statistics of the run.
+    '''
+    
+    # imported here, so the caller does not need the firmware
+    import oos_openwsn
+    import MoteHandler
+    from moteProbe import moteProbe
+    
+    MoteHandler.readNotifIds(headerPath)
+    random.seed(scenario['seed'])
+    
+    # create the engine
+    engine                   = SimEngine.SimEngine(cooperative=True,layout=makeLayout(scenario))
+    
+    # create the motes, each booted at time 0
+    moteProbes               = []
+    for _ in range(scenario['numMotes']):
+        moteHandler          = MoteHandler.MoteHandler(engine,oos_openwsn.OpenMote())
+        engine.indicateNewMote(moteHandler)
+        moteProbes          += [moteProbe.moteProbe(emulatedMote=moteHandler)]
+        engine.timeline.scheduleEvent(
+            0,
+            moteHandler.getId(),
+            moteHandler.hwSupply.switchOn,
+            moteHandler.hwSupply.INTR_SWITCHON,
+        )
+    
+    # run
+    startTime                = time.time()
+    engine.timeline.runUntil(scenario['duration'])
+    wallTime                 = time.time()-startTime
+    
+    for mp in moteProbes:
+        mp.close()
+    
+    # collect statistics
+    numEvents                = engine.timeline.getStats().getNumEvents()
+    moteStats                = engine.getStats().getMoteStats()
+    returnVal                = {
+        'scenario':          scenario,
+        'numMotes':          engine.getNumMotes(),
+        'simulatedTime':     engine.timeline.getCurrentTime(),
+        'wallTime':          wallTime,
+        'numEvents':         numEvents,
+        'eventsPerSecond':   numEvents/wallTime if wallTime else None,
+        'energy':            sum([s['energy']            for s in moteStats.values()]),
+        'dutyCycle':         sum([s['dutyCycle']         for s in moteStats.values()])/len(moteStats),
+        'numFramesSent':     sum([s['numFramesSent']     for s in moteStats.values()]),
+        'numFramesReceived': sum([s['numFramesReceived'] for s in moteStats.values()]),
+        'numCollisions':     sum([s['numCollisions']     for s in moteStats.values()]),
+        'moteStats':         moteStats,
+    }
+    
+    # log
+    log.info('ran {0} motes for {1}s in {2:.1f}s ({3} events)'.format(
+            scenario['numMotes'],
+            scenario['duration'],
+            wallTime,
+            numEvents,
+        )
+    )
+    
+    return returnVal
+
+def runSweep(headerPath,scenarios,numWorkers=None):
+    '''
+    \brief Run several scenarios over a pool of processes.
+    
+    Each worker process runs a single scenario, so that no state (eventBus
+    connections, notification IDs, random generator) is shared between
+    simulations.
+    
+    \param headerPath Path to openwsnmodule_obj.h.
+    \param scenarios  A list of scenarios, see expandSweep().
+    \param numWorkers The number of processes, defaults to the number of CPUs.
+    
+    \returns The statistics of each scenario, in the order of scenarios.
+    '''
+    if numWorkers==None:
+        numWorkers = multiprocessing.cpu_count()
+    numWorkers     = max(1,min(numWorkers,len(scenarios)))
+    
+    pool = multiprocessing.Pool(numWorkers,maxtasksperchild=1)
+    try:
+        returnVal = pool.map(_runWorker,[(headerPath,s) for s in scenarios],chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return returnVal
+
+#============================ helpers =========================================
+
+def _runWorker(args):
+    (headerPath,scenario) = args
+    return runScenario(headerPath,scenario)
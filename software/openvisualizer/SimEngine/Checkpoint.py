@@ -0,0 +1,227 @@
+#!/usr/bin/python
+
+import logging
+import cPickle as pickle
+
+import MoteHandler
+
+class NullLogHandler(logging.Handler):
+    def emit(self, record):
+        pass
+
+log = logging.getLogger('Checkpoint')
+log.setLevel(logging.INFO)
+log.addHandler(NullLogHandler())
+
+#============================ defines =========================================
+
+MAGIC               = 'OpenSimCheckpoint'
+VERSION             = 1
+EVENTS_PER_RECORD   = 1000
+PAUSE_TIMEOUT       = 10 # s, longest to wait for the event being executed
+
+REC_HEADER          = 'header'
+REC_MOTE            = 'mote'
+REC_EVENTS          = 'events'
+REC_END             = 'end'
+
+class CheckpointException(Exception):
+    pass
+
+#============================ public ==========================================
+
+def save(engine,f):
+    '''
+    \brief Write a snapshot of a paused engine.
+    
+    The snapshot is a stream of pickled records: a header, one record per
+    mote, the timeline events by chunks of EVENTS_PER_RECORD, and an end
+    marker. Records are written one at a time, so the snapshot is never
+    held in memory as a whole. Pass a gzip file object to compress it.
+    
+    The firmware must let the state of each mote be read, through
+    OpenMote.get_state(). The snapshot is taken once the timeline is done
+    with the event it was executing when paused, and has called the
+    functions passed to callFromTimeline, which cannot be written.
+    
+    \param engine The SimEngine to checkpoint. It must be paused.
+    \param f      A file-like object opened for writing, in binary mode.
+    '''
+    
+    if not engine.waitBetweenEvents(PAUSE_TIMEOUT):
+        raise CheckpointException('engine must be paused to be checkpointed')
+    
+    writer = _RecordWriter(f)
+    
+    writer.write(REC_HEADER,{
+        'magic':             MAGIC,
+        'version':           VERSION,
+        'currentTime':       engine.timeline.getCurrentTime(),
+        'numEvents':         engine.timeline.getStats().getNumEvents(),
+        'nextId':            engine.idmanager.currentId+1,
+        'numMotes':          engine.getNumMotes(),
+    })
+    
+    for moteHandler in engine.moteHandlers:
+        writer.write(REC_MOTE,_moteToRecord(moteHandler))
+    
+    events = engine.timeline.timeline[:]
+    for i in range(0,len(events),EVENTS_PER_RECORD):
+        writer.write(REC_EVENTS,[_eventToRecord(engine,e) for e in events[i:i+EVENTS_PER_RECORD]])
+    
+    writer.write(REC_END,None)
+    
+    # log
+    log.info('checkpointed {0} motes, {1} events at {2}'.format(
+            engine.getNumMotes(),
+            len(events),
+            engine.timeline.getCurrentTime(),
+        )
+    )
+
+def load(engine,f,createMote):
+    '''
+    \brief Rebuild the motes and timeline of a snapshot into a new engine.
+    
+    Motes which were booted are resumed, without going through their
+    initialization, as soon as the timeline starts. The firmware must then
+    be able to run from a loaded state, through OpenMote.supply_resume().
+    
+    \param engine     A SimEngine with no motes, not started yet.
+    \param f          A file-like object opened for reading, in binary mode.
+    \param createMote Function returning a new OpenMote, e.g.
+                      oos_openwsn.OpenMote.
+    '''
+    
+    if engine.getNumMotes():
+        raise CheckpointException('can only restore into an empty engine')
+    
+    reader = _RecordReader(f)
+    
+    (recType,header) = reader.read()
+    if recType!=REC_HEADER or header.get('magic')!=MAGIC:
+        raise CheckpointException('not a simulation checkpoint')
+    if header['version']!=VERSION:
+        raise CheckpointException('unsupported checkpoint version {0}'.format(header['version']))
+    
+    # restore the time
+    engine.timeline.currentTime        = header['currentTime']
+    engine.timeline.stats.numEvents    = header['numEvents']
+    
+    toResume = []
+    events   = []
+    while True:
+        (recType,data) = reader.read()
+        
+        if   recType==REC_MOTE:
+            moteHandler = _moteFromRecord(engine,data,createMote)
+            if data['booted']:
+                toResume += [moteHandler]
+        
+        elif recType==REC_EVENTS:
+            events += data
+        
+        elif recType==REC_END:
+            break
+        
+        else:
+            raise CheckpointException('unexpected record {0}'.format(recType))
+    
+    # an event goes ahead of those scheduled at the same time, so reschedule
+    # them last to first to keep their order
+    for (atTime,moteId,desc,moduleName,cbName) in reversed(events):
+        moteHandler = engine.getMoteHandlerById(moteId)
+        engine.timeline.scheduleEvent(
+            atTime,
+            moteId,
+            getattr(moteHandler.getModule(moduleName),cbName),
+            desc,
+        )
+    
+    # restart the motes which were running, ahead of any other event
+    for moteHandler in toResume:
+        engine.timeline.scheduleEvent(
+            engine.timeline.getCurrentTime(),
+            moteHandler.getId(),
+            moteHandler.hwSupply.resume,
+            moteHandler.hwSupply.INTR_RESUME,
+        )
+    
+    engine.idmanager.setNextId(header['nextId'])
+    
+    # log
+    log.info('restored {0} motes at {1}'.format(
+            engine.getNumMotes(),
+            engine.timeline.getCurrentTime(),
+        )
+    )
+
+#============================ private =========================================
+
+def _moteToRecord(moteHandler):
+
+    if not hasattr(moteHandler.mote,'get_state'):
+        raise CheckpointException('firmware does not support checkpointing')
+    
+    return {
+        'id':                moteHandler.getId(),
+        'location':          moteHandler.getLocation(),
+        'booted':            moteHandler.booted,
+        'modules':           dict(
+            [(name,moteHandler.getModule(name).getState()) for name in moteHandler.MODULES]
+        ),
+        'moteState':         moteHandler.mote.get_state(),
+    }
+
+def _moteFromRecord(engine,record,createMote):
+
+    mote = createMote()
+    if not hasattr(mote,'set_state'):
+        raise CheckpointException('firmware does not support checkpointing')
+    if record['booted'] and not hasattr(mote,'supply_resume'):
+        # booting it again would throw away the state it is restored to
+        raise CheckpointException('firmware cannot resume a booted mote')
+    
+    engine.idmanager.setNextId(record['id'])
+    engine.locationmanager.setNextLocation(record['location'])
+    moteHandler          = MoteHandler.MoteHandler(engine,mote)
+    
+    for name in moteHandler.MODULES:
+        moteHandler.getModule(name).setState(record['modules'][name])
+    mote.set_state(record['moteState'])
+    
+    engine.indicateNewMote(moteHandler)
+    
+    return moteHandler
+
+def _eventToRecord(engine,event):
+
+    # events call a method of one of the modules of their mote
+    moteHandler = engine.getMoteHandlerById(event.moteId)
+    module      = getattr(event.cb,'im_self',None)
+    for name in moteHandler.MODULES:
+        if moteHandler.getModule(name) is module:
+            return (event.atTime,event.moteId,event.desc,name,event.cb.__name__)
+    
+    raise CheckpointException('cannot checkpoint event {0}'.format(event))
+
+class _RecordWriter(object):
+
+    def __init__(self,f):
+        self.pickler = pickle.Pickler(f,pickle.HIGHEST_PROTOCOL)
+    
+    def write(self,recType,data):
+        self.pickler.dump((recType,data))
+        # records do not share objects; forget them so memory stays bounded
+        self.pickler.clear_memo()
+
+class _RecordReader(object):
+
+    def __init__(self,f):
+        self.unpickler = pickle.Unpickler(f)
+    
+    def read(self):
+        try:
+            return self.unpickler.load()
+        except EOFError:
+            raise CheckpointException('truncated checkpoint')
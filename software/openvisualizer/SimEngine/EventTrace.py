@@ -0,0 +1,212 @@
+#!/usr/bin/python
+
+import mmap
+import struct
+import zlib
+import itertools
+import logging
+
+class NullLogHandler(logging.Handler):
+    def emit(self, record):
+        pass
+
+log = logging.getLogger('EventTrace')
+log.setLevel(logging.INFO)
+log.addHandler(NullLogHandler())
+
+#============================ defines =========================================
+
+MAGIC           = 'OSIMTRC1'
+GROW_SIZE       = 1<<20                # the file grows by this many bytes at a time
+
+FRAME_DESC      = 'radio.frame'        # description of the records of frames
+FRAME_HASHED    = 0xffff               # length of a frame recorded as its CRC32
+
+# record types; 0 is the unwritten end of the file
+REC_DESC        = 1                    # interned description: descId, length, string
+REC_EVENT       = 2                    # executed event: time, moteId, descId
+REC_FRAME       = 3                    # transmitted frame: time, moteId, length, bytes
+
+_TYPE           = struct.Struct('<B')
+_DESC           = struct.Struct('<BHH')
+_EVENT          = struct.Struct('<BdHH')
+_FRAME          = struct.Struct('<BdHH')
+_CRC            = struct.Struct('<I')
+
+#============================ writer ==========================================
+
+class TraceWriter(object):
+    '''
+    \brief Records the events executed by the timeline into a binary file.
+    
+    Records are appended, with a fixed binary layout, to a memory-mapped
+    file. Event descriptions are interned: each description is written
+    once, then referred to by a number. Frames are recorded as their CRC32,
+    or as a whole when framePayloads is set.
+    
+    Since the file is grown ahead of writing and zero-filled, a trace left
+    by a simulation which crashed is readable up to its last record.
+    '''
+    
+    def __init__(self,filename,framePayloads=False):
+        
+        # store params
+        self.filename        = filename
+        self.framePayloads   = framePayloads
+        
+        # local variables
+        self.descIds         = {}
+        self.numRecords      = 0
+        self.file            = open(self.filename,'w+b')
+        self.file.write(MAGIC)
+        self.file.truncate(GROW_SIZE)
+        self.file.flush()
+        self.size            = GROW_SIZE
+        self.map             = mmap.mmap(self.file.fileno(),self.size)
+        self.offset          = len(MAGIC)
+    
+    #======================== public ==========================================
+    
+    def recordEvent(self,atTime,moteId,desc):
+        
+        descId = self.descIds.get(desc)
+        if descId is None:
+            descId = self._intern(desc)
+        
+        if self.offset+_EVENT.size>self.size:
+            self._grow()
+        
+        _EVENT.pack_into(self.map,self.offset,REC_EVENT,atTime,moteId,descId)
+        self.offset         += _EVENT.size
+        self.numRecords     += 1
+    
+    def recordFrame(self,atTime,moteId,frame):
+        
+        frame = str(bytearray(frame))
+        if self.framePayloads:
+            length           = len(frame)
+            data             = frame
+        else:
+            length           = FRAME_HASHED
+            data             = _CRC.pack(zlib.crc32(frame) & 0xffffffff)
+        
+        end = self.offset+_FRAME.size+len(data)
+        while end>self.size:
+            self._grow()
+        
+        _FRAME.pack_into(self.map,self.offset,REC_FRAME,atTime,moteId,length)
+        self.map[self.offset+_FRAME.size:end] = data
+        self.offset          = end
+        self.numRecords     += 1
+    
+    def getNumRecords(self):
+        return self.numRecords
+    
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.truncate(self.offset)
+        self.file.close()
+        
+        # log
+        log.info('wrote {0} records, {1} bytes to {2}'.format(
+                self.numRecords,
+                self.offset,
+                self.filename,
+            )
+        )
+    
+    #======================== private =========================================
+    
+    def _intern(self,desc):
+        descId               = len(self.descIds)
+        self.descIds[desc]   = descId
+        
+        end = self.offset+_DESC.size+len(desc)
+        while end>self.size:
+            self._grow()
+        
+        _DESC.pack_into(self.map,self.offset,REC_DESC,descId,len(desc))
+        self.map[self.offset+_DESC.size:end] = desc
+        self.offset          = end
+        
+        return descId
+    
+    def _grow(self):
+        self.size           += GROW_SIZE
+        self.map.resize(self.size)
+
+#============================ reader ==========================================
+
+class TraceReader(object):
+    '''
+    \brief Iterates over the records of a trace.
+    
+    Each record is a tuple (atTime,moteId,desc,payload). For events, payload
+    is None. For frames, desc is FRAME_DESC and payload is either the frame
+    itself (a string) or its CRC32 (an int).
+    '''
+    
+    def __init__(self,filename):
+        
+        # store params
+        self.filename        = filename
+        
+        # local variables
+        with open(self.filename,'rb') as f:
+            if f.read(len(MAGIC))!=MAGIC:
+                raise ValueError('{0} is not an event trace'.format(self.filename))
+            self.data        = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+    
+    def __iter__(self):
+        
+        data                 = self.data
+        descs                = {}
+        offset               = len(MAGIC)
+        
+        while offset<len(data):
+            
+            (recType,)       = _TYPE.unpack_from(data,offset)
+            
+            if   recType==REC_EVENT:
+                (_,atTime,moteId,descId) = _EVENT.unpack_from(data,offset)
+                offset      += _EVENT.size
+                yield (atTime,moteId,descs[descId],None)
+            
+            elif recType==REC_FRAME:
+                (_,atTime,moteId,length) = _FRAME.unpack_from(data,offset)
+                offset      += _FRAME.size
+                if length==FRAME_HASHED:
+                    (payload,) = _CRC.unpack_from(data,offset)
+                    offset  += _CRC.size
+                else:
+                    payload  = data[offset:offset+length]
+                    offset  += length
+                yield (atTime,moteId,FRAME_DESC,payload)
+            
+            elif recType==REC_DESC:
+                (_,descId,length) = _DESC.unpack_from(data,offset)
+                offset      += _DESC.size
+                descs[descId] = data[offset:offset+length]
+                offset      += length
+            
+            else:
+                # unwritten end of a trace which was not closed
+                break
+
+#============================ diff ============================================
+
+def findDivergence(tracePathA,tracePathB):
+    '''
+    \brief Find where two runs of a simulation started behaving differently.
+    
+    \returns None if both traces hold the same records. Otherwise, a tuple
+        (index,recordA,recordB) with the first records which differ; one of
+        them is None if the other trace is longer.
+    '''
+    
+    pairs = itertools.izip_longest(TraceReader(tracePathA),TraceReader(tracePathB))
+    for (index,(recordA,recordB)) in enumerate(pairs):
+        if recordA!=recordB:
+            return (index,recordA,recordB)
+    return None
@@ -38,6 +38,12 @@ class IdManager(object):
         
         return self.currentId
     
+    def setNextId(self,nextId):
+        '''
+        \brief Force the ID assigned by the next call to getId().
+        '''
+        self.currentId = nextId-1
+    
     #======================== private =========================================
     
     #======================== helpers =========================================
@@ -1,37 +1,167 @@
 #!/usr/bin/python
 
+import csv
 import random
 import logging
 
+try:
+    import numpy
+except ImportError:
+    # positions and distances are returned as lists
+    numpy = None
+
 class NullLogHandler(logging.Handler):
     def emit(self, record):
         pass
+
+class LocationException(Exception):
+    pass
+
+#============================ layouts =========================================
+
+class RandomLayout(object):
+    '''
+    \brief Motes at random integer coordinates in a square.
+    '''
+    
+    def __init__(self,seed=None,size=100):
+        self.rng                  = random.Random(seed)
+        self.size                 = size
+    
+    def getLocation(self,index):
+        x = self.rng.randint(0,self.size)
+        y = self.rng.randint(0,self.size)
+        return (x,y,0)
+
+class GridLayout(object):
+    '''
+    \brief Motes on a grid, filled row by row.
+    '''
+    
+    def __init__(self,spacing=10,numColumns=10):
+        self.spacing              = spacing
+        self.numColumns           = numColumns
+    
+    def getLocation(self,index):
+        (row,column) = divmod(index,self.numColumns)
+        return (column*self.spacing,row*self.spacing,0)
+
+class LineLayout(object):
+    '''
+    \brief Motes along the x axis.
+    '''
+    
+    def __init__(self,spacing=10):
+        self.spacing              = spacing
+    
+    def getLocation(self,index):
+        return (index*self.spacing,0,0)
+
+class ListLayout(object):
+    '''
+    \brief Motes at given locations.
+    '''
+    
+    def __init__(self,locations):
+        self.locations            = [self._toLocation(l) for l in locations]
     
+    def getLocation(self,index):
+        if index>=len(self.locations):
+            raise LocationException('no location for mote #{0}, only {1} listed'.format(
+                    index+1,
+                    len(self.locations),
+                )
+            )
+        return self.locations[index]
+    
+    def _toLocation(self,l):
+        if len(l) not in [2,3]:
+            raise LocationException('invalid location {0}'.format(l))
+        l = tuple(l)
+        if len(l)==2:
+            l += (0,)
+        return l
+
+class CsvLayout(ListLayout):
+    '''
+    \brief Motes at the locations read from a CSV file.
+    
+    Each row holds the x, y and, optionally, z coordinates of a mote. Rows
+    which do not start with a number, e.g. a header, are skipped.
+    '''
+    
+    def __init__(self,filename):
+        locations = []
+        with open(filename,'rb') as f:
+            for row in csv.reader(f):
+                try:
+                    locations += [[float(v) for v in row if v.strip()]]
+                except ValueError:
+                    continue
+        ListLayout.__init__(self,[l for l in locations if l])
+
+LAYOUTS = {
+    'random':    RandomLayout,
+    'grid':      GridLayout,
+    'line':      LineLayout,
+    'list':      ListLayout,
+    'csv':       CsvLayout,
+}
+
+def makeLayout(name,**params):
+    '''
+    \brief Create a layout from its name in LAYOUTS and its parameters.
+    '''
+    if name not in LAYOUTS:
+        raise LocationException('unknown layout "{0}", expected one of {1}'.format(
+                name,
+                sorted(LAYOUTS.keys()),
+            )
+        )
+    try:
+        return LAYOUTS[name](**params)
+    except TypeError as err:
+        raise LocationException('invalid parameters for layout "{0}": {1}'.format(name,err))
+
+#============================ location manager ================================
+
 class LocationManager(object):
     '''
     \brief The module which assigns locations to the motes.
+    
+    Locations come from a layout, and are handed out in the order the motes
+    are created.
     '''
     
-    def __init__(self,engine):
+    def __init__(self,engine,layout=None):
         
         # store params
         self.engine               = engine
+        self.layout               = layout or RandomLayout()
         
         # local variables
+        self.locations            = []   # locations handed out so far
+        self.nextLocation         = None
+        self.positions            = None # the same, as an array, built on demand
         
         # logging
         self.log                  = logging.getLogger('LocationManager')
         self.log.setLevel(logging.DEBUG)
         self.log.addHandler(NullLogHandler())
-        
+    
     
     #======================== public ==========================================
     
     def getLocation(self):
         
-        x = random.randint(0,100)
-        y = random.randint(0,100)
-        z = 0
+        if self.nextLocation!=None:
+            (x,y,z)               = self.nextLocation
+            self.nextLocation     = None
+        else:
+            (x,y,z)               = self.layout.getLocation(len(self.locations))
+        
+        self.locations.append((x,y,z))
+        self.positions            = None
         
         # debug
         if self.log.isEnabledFor(logging.DEBUG):
@@ -39,7 +169,40 @@ class LocationManager(object):
         
         return (x,y,z)
     
+    def setNextLocation(self,location):
+        '''
+        \brief Force the location of the next mote, e.g. when restoring it.
+        '''
+        self.nextLocation         = tuple(location)
+    
+    def getPositions(self):
+        '''
+        \brief The locations handed out so far, in order.
+        
+        \returns An N-by-3 NumPy array of floats, or a list of (x,y,z) tuples
+            when NumPy is not installed.
+        '''
+        if numpy is None:
+            return self.locations[:]
+        if self.positions is None:
+            self.positions        = numpy.array(self.locations,dtype=float).reshape(-1,3)
+        return self.positions
+    
+    def getDistances(self):
+        '''
+        \brief The distance between each pair of locations handed out so far.
+        
+        \returns An N-by-N NumPy array, or a list of lists when NumPy is not
+            installed.
+        '''
+        positions                 = self.getPositions()
+        if numpy is None:
+            return [
+                [sum([(a-b)**2 for (a,b) in zip(p,q)])**0.5 for q in positions] for p in positions
+            ]
+        delta                     = positions[:,numpy.newaxis,:]-positions[numpy.newaxis,:,:]
+        return numpy.sqrt((delta**2).sum(axis=-1))
+    
     #======================== private =========================================
     
     #======================== helpers =========================================
-    
\ No newline at end of file
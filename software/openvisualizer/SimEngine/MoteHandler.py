@@ -4,9 +4,18 @@ import threading
 import socket
 import logging
 import os
+import re
+import json
 import time
+import hashlib
 import binascii
 
+try:
+    import greenlet
+except ImportError:
+    # cooperative mode is unavailable, motes run in their own thread
+    greenlet = None
+
 from BspEmulator import BspBoard
 from BspEmulator import BspBsp_timer
 from BspEmulator import BspDebugpins
@@ -20,32 +29,202 @@ from BspEmulator import HwCrystal
 
 #============================ get notification IDs ============================
 # Contains the list of notifIds used in the following functions.
-notifString = []
+notifString   = []
+# The same, as a dictionary {name: notifId}.
+notifIds      = {}
+# (path,mtime,size) of the header notifString was read from.
+notifSource   = None
+# The callbacks each mote installs, see getCallbackTable().
+callbackTable = None
+
+NOTIF_CACHE_SUFFIX = '.notifids'
 
-def readNotifIds(headerPath):
+def readNotifIds(headerPath,cachePath=None):
     '''
     Contextual parent must call this method before other use of mote handler.
     
     ``headerPath`` Path to openwsnmodule_obj.h, containing notifIds
     
+    ``cachePath`` File the notifIds are cached in, defaults to the header
+    path followed by NOTIF_CACHE_SUFFIX. The cache is used as long as the
+    header keeps the same modification time and size, or the same content.
+    
     Required since this module cannot know where to find the header file.
     '''
-    import re
+    
+    global notifString, notifIds, notifSource, callbackTable
+    
+    if cachePath==None:
+        cachePath = headerPath+NOTIF_CACHE_SUFFIX
+    
+    st     = os.stat(headerPath)
+    source = (os.path.abspath(headerPath),st.st_mtime,st.st_size)
+    
+    # already read
+    if source==notifSource:
+        return
+    
+    cache  = _readNotifCache(cachePath)
+    
+    if cache and (cache['mtime'],cache['size'])==(st.st_mtime,st.st_size):
+        names  = cache['names']
+    else:
+        f      = open(headerPath)
+        header = f.read()
+        f.close()
+        digest = hashlib.sha1(header).hexdigest()
+        
+        if cache and cache['sha1']==digest:
+            # header touched, but not modified
+            names  = cache['names']
+        else:
+            names  = []
+            for name in re.findall(r'MOTE_NOTIF_(\w+)',header):
+                if name not in names:
+                    names += [name]
+        
+        _writeNotifCache(cachePath,{
+            'mtime':  st.st_mtime,
+            'size':   st.st_size,
+            'sha1':   digest,
+            'names':  names,
+        })
+    
+    # keep the notifIds read so far, new ones are numbered after them
+    for name in names:
+        if name not in notifIds:
+            notifIds[name] = len(notifString)
+            notifString   += [name]
+    notifSource   = source
+    callbackTable = None
+
+def notifId(s):
+    assert s in notifIds
+    return notifIds[s]
+
+def getCallbackTable():
+    '''
+    Returns the callbacks to install in each mote, as a list of
+    (notifId,moduleName,methodName), computed on first use.
+    '''
+    global callbackTable
+    if callbackTable==None:
+        callbackTable = [
+            (notifId(name),moduleName,methodName) for (name,moduleName,methodName) in CALLBACKS
+        ]
+    return callbackTable
 
-    f     = open(headerPath)
-    lines = f.readlines()
-    f.close()
+def _readNotifCache(cachePath):
+    try:
+        with open(cachePath) as f:
+            cache = json.load(f)
+        for key in ['mtime','size','sha1','names']:
+            assert key in cache
+        cache['names'] = [str(n) for n in cache['names']]
+        return cache
+    except (IOError,ValueError,AssertionError):
+        return None
 
-    global notifString
-    for line in lines:
-        m = re.search('MOTE_NOTIF_(\w+)',line)
-        if m:
-            if m.group(1) not in notifString:
-                notifString += [m.group(1)]
+def _writeNotifCache(cachePath,cache):
+    try:
+        with open(cachePath,'w') as f:
+            json.dump(cache,f)
+    except IOError as err:
+        # the cache only saves time
+        log.warning('could not write notifId cache {0}: {1}'.format(cachePath,err))
 
-def notifId(s):
-    assert s in notifString
-    return notifString.index(s)
+#============================ callbacks =======================================
+# (notifId name, module of the MoteHandler, method of that module)
+
+CALLBACKS = [
+    # board
+    ('board_init',                 'bspBoard',       'cmd_init'),
+    ('board_sleep',                'bspBoard',       'cmd_sleep'),
+    # bsp_timer
+    ('bsp_timer_init',             'bspBsp_timer',   'cmd_init'),
+    ('bsp_timer_reset',            'bspBsp_timer',   'cmd_reset'),
+    ('bsp_timer_scheduleIn',       'bspBsp_timer',   'cmd_scheduleIn'),
+    ('bsp_timer_cancel_schedule',  'bspBsp_timer',   'cmd_cancel_schedule'),
+    ('bsp_timer_get_currentValue', 'bspBsp_timer',   'cmd_get_currentValue'),
+    # debugpins
+    ('debugpins_init',             'bspDebugpins',   'cmd_init'),
+    ('debugpins_frame_toggle',     'bspDebugpins',   'cmd_frame_toggle'),
+    ('debugpins_frame_clr',        'bspDebugpins',   'cmd_frame_clr'),
+    ('debugpins_frame_set',        'bspDebugpins',   'cmd_frame_set'),
+    ('debugpins_slot_toggle',      'bspDebugpins',   'cmd_slot_toggle'),
+    ('debugpins_slot_clr',         'bspDebugpins',   'cmd_slot_clr'),
+    ('debugpins_slot_set',         'bspDebugpins',   'cmd_slot_set'),
+    ('debugpins_fsm_toggle',       'bspDebugpins',   'cmd_fsm_toggle'),
+    ('debugpins_fsm_clr',          'bspDebugpins',   'cmd_fsm_clr'),
+    ('debugpins_fsm_set',          'bspDebugpins',   'cmd_fsm_set'),
+    ('debugpins_task_toggle',      'bspDebugpins',   'cmd_task_toggle'),
+    ('debugpins_task_clr',         'bspDebugpins',   'cmd_task_clr'),
+    ('debugpins_task_set',         'bspDebugpins',   'cmd_task_set'),
+    ('debugpins_isr_toggle',       'bspDebugpins',   'cmd_isr_toggle'),
+    ('debugpins_isr_clr',          'bspDebugpins',   'cmd_isr_clr'),
+    ('debugpins_isr_set',          'bspDebugpins',   'cmd_isr_set'),
+    ('debugpins_radio_toggle',     'bspDebugpins',   'cmd_radio_toggle'),
+    ('debugpins_radio_clr',        'bspDebugpins',   'cmd_radio_clr'),
+    ('debugpins_radio_set',        'bspDebugpins',   'cmd_radio_set'),
+    # eui64
+    ('eui64_get',                  'bspEui64',       'cmd_get'),
+    # leds
+    ('leds_init',                  'bspLeds',        'cmd_init'),
+    ('leds_error_on',              'bspLeds',        'cmd_error_on'),
+    ('leds_error_off',             'bspLeds',        'cmd_error_off'),
+    ('leds_error_toggle',          'bspLeds',        'cmd_error_toggle'),
+    ('leds_error_isOn',            'bspLeds',        'cmd_error_isOn'),
+    ('leds_radio_on',              'bspLeds',        'cmd_radio_on'),
+    ('leds_radio_off',             'bspLeds',        'cmd_radio_off'),
+    ('leds_radio_toggle',          'bspLeds',        'cmd_radio_toggle'),
+    ('leds_radio_isOn',            'bspLeds',        'cmd_radio_isOn'),
+    ('leds_sync_on',               'bspLeds',        'cmd_sync_on'),
+    ('leds_sync_off',              'bspLeds',        'cmd_sync_off'),
+    ('leds_sync_toggle',           'bspLeds',        'cmd_sync_toggle'),
+    ('leds_sync_isOn',             'bspLeds',        'cmd_sync_isOn'),
+    ('leds_debug_on',              'bspLeds',        'cmd_debug_on'),
+    ('leds_debug_off',             'bspLeds',        'cmd_debug_off'),
+    ('leds_debug_toggle',          'bspLeds',        'cmd_debug_toggle'),
+    ('leds_debug_isOn',            'bspLeds',        'cmd_debug_isOn'),
+    ('leds_all_on',                'bspLeds',        'cmd_all_on'),
+    ('leds_all_off',               'bspLeds',        'cmd_all_off'),
+    ('leds_all_toggle',            'bspLeds',        'cmd_all_toggle'),
+    ('leds_circular_shift',        'bspLeds',        'cmd_circular_shift'),
+    ('leds_increment',             'bspLeds',        'cmd_increment'),
+    # radio
+    ('radio_init',                 'bspRadio',       'cmd_init'),
+    ('radio_reset',                'bspRadio',       'cmd_reset'),
+    ('radio_startTimer',           'bspRadio',       'cmd_startTimer'),
+    ('radio_getTimerValue',        'bspRadio',       'cmd_getTimerValue'),
+    ('radio_setTimerPeriod',       'bspRadio',       'cmd_setTimerPeriod'),
+    ('radio_getTimerPeriod',       'bspRadio',       'cmd_getTimerPeriod'),
+    ('radio_setFrequency',         'bspRadio',       'cmd_setFrequency'),
+    ('radio_rfOn',                 'bspRadio',       'cmd_rfOn'),
+    ('radio_rfOff',                'bspRadio',       'cmd_rfOff'),
+    ('radio_loadPacket',           'bspRadio',       'cmd_loadPacket'),
+    ('radio_txEnable',             'bspRadio',       'cmd_txEnable'),
+    ('radio_txNow',                'bspRadio',       'cmd_txNow'),
+    ('radio_rxEnable',             'bspRadio',       'cmd_rxEnable'),
+    ('radio_rxNow',                'bspRadio',       'cmd_rxNow'),
+    ('radio_getReceivedFrame',     'bspRadio',       'cmd_getReceivedFrame'),
+    # radiotimer
+    ('radiotimer_init',            'bspRadiotimer',  'cmd_init'),
+    ('radiotimer_start',           'bspRadiotimer',  'cmd_start'),
+    ('radiotimer_getValue',        'bspRadiotimer',  'cmd_getValue'),
+    ('radiotimer_setPeriod',       'bspRadiotimer',  'cmd_setPeriod'),
+    ('radiotimer_getPeriod',       'bspRadiotimer',  'cmd_getPeriod'),
+    ('radiotimer_schedule',        'bspRadiotimer',  'cmd_schedule'),
+    ('radiotimer_cancel',          'bspRadiotimer',  'cmd_cancel'),
+    ('radiotimer_getCapturedTime', 'bspRadiotimer',  'cmd_getCapturedTime'),
+    # uart
+    ('uart_init',                  'bspUart',        'cmd_init'),
+    ('uart_enableInterrupts',      'bspUart',        'cmd_enableInterrupts'),
+    ('uart_disableInterrupts',     'bspUart',        'cmd_disableInterrupts'),
+    ('uart_clearRxInterrupts',     'bspUart',        'cmd_clearRxInterrupts'),
+    ('uart_clearTxInterrupts',     'bspUart',        'cmd_clearTxInterrupts'),
+    ('uart_writeByte',             'bspUart',        'cmd_writeByte'),
+    ('uart_readByte',              'bspUart',        'cmd_readByte'),
+]
 
 #============================ classes =========================================
 
@@ -53,7 +232,37 @@ class NullLogHandler(logging.Handler):
     def emit(self, record):
         pass
 
+log = logging.getLogger('MoteHandler')
+log.setLevel(logging.INFO)
+log.addHandler(NullLogHandler())
+
 class MoteHandler(threading.Thread):
+    '''
+    \brief Runs one emulated mote.
+    
+    The mote's C code alternates between ISR mode, when the timeline calls
+    one of its interrupts, and task mode, when its scheduler runs until it
+    calls board_sleep().
+    
+    By default, task mode runs in a thread of its own, handed the CPU through
+    the cpuRunning/cpuDone locks. When the engine is cooperative and the
+    greenlet module is available, task mode instead runs in a greenlet the
+    timeline switches into directly, without any thread or lock.
+    '''
+    
+    # emulated hardware and BSP modules, in the order they are created
+    MODULES = [
+        'hwSupply',
+        'hwCrystal',
+        'bspBoard',
+        'bspBsp_timer',
+        'bspDebugpins',
+        'bspEui64',
+        'bspLeds',
+        'bspRadiotimer',
+        'bspRadio',
+        'bspUart',
+    ]
     
     def __init__(self,engine,mote):
         
@@ -84,99 +293,20 @@ class MoteHandler(threading.Thread):
         self.bspUart         = BspUart.BspUart(self.engine,self)
         # status
         self.booted          = False
-        self.cpuRunning      = threading.Lock()
-        self.cpuRunning.acquire()
-        self.cpuDone         = threading.Lock()
-        self.cpuDone.acquire()
+        self.bootFunction    = None
+        self.cooperative     = self.engine.cooperative and (greenlet is not None)
+        if self.cooperative:
+            self.cpu         = None    # greenlet running the mote in task mode
+            self.caller      = None    # greenlet to return to when the mote sleeps
+        else:
+            self.cpuRunning  = threading.Lock()
+            self.cpuRunning.acquire()
+            self.cpuDone     = threading.Lock()
+            self.cpuDone.acquire()
         
         #=== install callbacks
-        # board
-        mote.set_callback(notifId('board_init'),                self.bspBoard.cmd_init)
-        mote.set_callback(notifId('board_sleep'),               self.bspBoard.cmd_sleep)
-        # bsp_timer
-        mote.set_callback(notifId('bsp_timer_init'),            self.bspBsp_timer.cmd_init)
-        mote.set_callback(notifId('bsp_timer_reset'),           self.bspBsp_timer.cmd_reset)
-        mote.set_callback(notifId('bsp_timer_scheduleIn'),      self.bspBsp_timer.cmd_scheduleIn)
-        mote.set_callback(notifId('bsp_timer_cancel_schedule'), self.bspBsp_timer.cmd_cancel_schedule)
-        mote.set_callback(notifId('bsp_timer_get_currentValue'),self.bspBsp_timer.cmd_get_currentValue)
-        # debugpins
-        mote.set_callback(notifId('debugpins_init'),            self.bspDebugpins.cmd_init)
-        mote.set_callback(notifId('debugpins_frame_toggle'),    self.bspDebugpins.cmd_frame_toggle)
-        mote.set_callback(notifId('debugpins_frame_clr'),       self.bspDebugpins.cmd_frame_clr)
-        mote.set_callback(notifId('debugpins_frame_set'),       self.bspDebugpins.cmd_frame_set)
-        mote.set_callback(notifId('debugpins_slot_toggle'),     self.bspDebugpins.cmd_slot_toggle)
-        mote.set_callback(notifId('debugpins_slot_clr'),        self.bspDebugpins.cmd_slot_clr)
-        mote.set_callback(notifId('debugpins_slot_set'),        self.bspDebugpins.cmd_slot_set)
-        mote.set_callback(notifId('debugpins_fsm_toggle'),      self.bspDebugpins.cmd_fsm_toggle)
-        mote.set_callback(notifId('debugpins_fsm_clr'),         self.bspDebugpins.cmd_fsm_clr)
-        mote.set_callback(notifId('debugpins_fsm_set'),         self.bspDebugpins.cmd_fsm_set)
-        mote.set_callback(notifId('debugpins_task_toggle'),     self.bspDebugpins.cmd_task_toggle)
-        mote.set_callback(notifId('debugpins_task_clr'),        self.bspDebugpins.cmd_task_clr)
-        mote.set_callback(notifId('debugpins_task_set'),        self.bspDebugpins.cmd_task_set)
-        mote.set_callback(notifId('debugpins_isr_toggle'),      self.bspDebugpins.cmd_isr_toggle)
-        mote.set_callback(notifId('debugpins_isr_clr'),         self.bspDebugpins.cmd_isr_clr)
-        mote.set_callback(notifId('debugpins_isr_set'),         self.bspDebugpins.cmd_isr_set)
-        mote.set_callback(notifId('debugpins_radio_toggle'),    self.bspDebugpins.cmd_radio_toggle)
-        mote.set_callback(notifId('debugpins_radio_clr'),       self.bspDebugpins.cmd_radio_clr)
-        mote.set_callback(notifId('debugpins_radio_set'),       self.bspDebugpins.cmd_radio_set)
-        # eui64
-        mote.set_callback(notifId('eui64_get'),                 self.bspEui64.cmd_get)
-        # leds
-        mote.set_callback(notifId('leds_init'),                 self.bspLeds.cmd_init)
-        mote.set_callback(notifId('leds_error_on'),             self.bspLeds.cmd_error_on)
-        mote.set_callback(notifId('leds_error_off'),            self.bspLeds.cmd_error_off)
-        mote.set_callback(notifId('leds_error_toggle'),         self.bspLeds.cmd_error_toggle)
-        mote.set_callback(notifId('leds_error_isOn'),           self.bspLeds.cmd_error_isOn)
-        mote.set_callback(notifId('leds_radio_on'),             self.bspLeds.cmd_radio_on)
-        mote.set_callback(notifId('leds_radio_off'),            self.bspLeds.cmd_radio_off)
-        mote.set_callback(notifId('leds_radio_toggle'),         self.bspLeds.cmd_radio_toggle)
-        mote.set_callback(notifId('leds_radio_isOn'),           self.bspLeds.cmd_radio_isOn)
-        mote.set_callback(notifId('leds_sync_on'),              self.bspLeds.cmd_sync_on)
-        mote.set_callback(notifId('leds_sync_off'),             self.bspLeds.cmd_sync_off)
-        mote.set_callback(notifId('leds_sync_toggle'),          self.bspLeds.cmd_sync_toggle)
-        mote.set_callback(notifId('leds_sync_isOn'),            self.bspLeds.cmd_sync_isOn)
-        mote.set_callback(notifId('leds_debug_on'),             self.bspLeds.cmd_debug_on)
-        mote.set_callback(notifId('leds_debug_off'),            self.bspLeds.cmd_debug_off)
-        mote.set_callback(notifId('leds_debug_toggle'),         self.bspLeds.cmd_debug_toggle)
-        mote.set_callback(notifId('leds_debug_isOn'),           self.bspLeds.cmd_debug_isOn)
-        mote.set_callback(notifId('leds_all_on'),               self.bspLeds.cmd_all_on)
-        mote.set_callback(notifId('leds_all_off'),              self.bspLeds.cmd_all_off)
-        mote.set_callback(notifId('leds_all_toggle'),           self.bspLeds.cmd_all_toggle)
-        mote.set_callback(notifId('leds_circular_shift'),       self.bspLeds.cmd_circular_shift)
-        mote.set_callback(notifId('leds_increment'),            self.bspLeds.cmd_increment)
-        # radio
-        mote.set_callback(notifId('radio_init'),                self.bspRadio.cmd_init)
-        mote.set_callback(notifId('radio_reset'),               self.bspRadio.cmd_reset)
-        mote.set_callback(notifId('radio_startTimer'),          self.bspRadio.cmd_startTimer)
-        mote.set_callback(notifId('radio_getTimerValue'),       self.bspRadio.cmd_getTimerValue)
-        mote.set_callback(notifId('radio_setTimerPeriod'),      self.bspRadio.cmd_setTimerPeriod)
-        mote.set_callback(notifId('radio_getTimerPeriod'),      self.bspRadio.cmd_getTimerPeriod)
-        mote.set_callback(notifId('radio_setFrequency'),        self.bspRadio.cmd_setFrequency)
-        mote.set_callback(notifId('radio_rfOn'),                self.bspRadio.cmd_rfOn)
-        mote.set_callback(notifId('radio_rfOff'),               self.bspRadio.cmd_rfOff)
-        mote.set_callback(notifId('radio_loadPacket'),          self.bspRadio.cmd_loadPacket)
-        mote.set_callback(notifId('radio_txEnable'),            self.bspRadio.cmd_txEnable)
-        mote.set_callback(notifId('radio_txNow'),               self.bspRadio.cmd_txNow)
-        mote.set_callback(notifId('radio_rxEnable'),            self.bspRadio.cmd_rxEnable)
-        mote.set_callback(notifId('radio_rxNow'),               self.bspRadio.cmd_rxNow)
-        mote.set_callback(notifId('radio_getReceivedFrame'),    self.bspRadio.cmd_getReceivedFrame)
-        # radiotimer
-        mote.set_callback(notifId('radiotimer_init'),           self.bspRadiotimer.cmd_init)
-        mote.set_callback(notifId('radiotimer_start'),          self.bspRadiotimer.cmd_start)
-        mote.set_callback(notifId('radiotimer_getValue'),       self.bspRadiotimer.cmd_getValue)
-        mote.set_callback(notifId('radiotimer_setPeriod'),      self.bspRadiotimer.cmd_setPeriod)
-        mote.set_callback(notifId('radiotimer_getPeriod'),      self.bspRadiotimer.cmd_getPeriod)
-        mote.set_callback(notifId('radiotimer_schedule'),       self.bspRadiotimer.cmd_schedule)
-        mote.set_callback(notifId('radiotimer_cancel'),         self.bspRadiotimer.cmd_cancel)
-        mote.set_callback(notifId('radiotimer_getCapturedTime'),self.bspRadiotimer.cmd_getCapturedTime)
-        # uart
-        mote.set_callback(notifId('uart_init'),                 self.bspUart.cmd_init)
-        mote.set_callback(notifId('uart_enableInterrupts'),     self.bspUart.cmd_enableInterrupts)
-        mote.set_callback(notifId('uart_disableInterrupts'),    self.bspUart.cmd_disableInterrupts)
-        mote.set_callback(notifId('uart_clearRxInterrupts'),    self.bspUart.cmd_clearRxInterrupts)
-        mote.set_callback(notifId('uart_clearTxInterrupts'),    self.bspUart.cmd_clearTxInterrupts)
-        mote.set_callback(notifId('uart_writeByte'),            self.bspUart.cmd_writeByte)
-        mote.set_callback(notifId('uart_readByte'),             self.bspUart.cmd_readByte)
+        for (nid,moduleName,methodName) in getCallbackTable():
+            mote.set_callback(nid,getattr(getattr(self,moduleName),methodName))
         
         # logging this module
         self.log             = logging.getLogger('MoteHandler_'+str(self.id))
@@ -213,6 +343,8 @@ class MoteHandler(threading.Thread):
         self.setDaemon(True)
         
         # log
+        if self.engine.cooperative and not self.cooperative:
+            self.log.warning('greenlet not available, running mote in a thread')
         self.log.info('thread initialized')
     
     def run(self):
@@ -221,7 +353,7 @@ class MoteHandler(threading.Thread):
         self.log.info('thread starting')
         
         # switch on the mote
-        self.hwSupply.switchOn()
+        self.bootFunction()
         
         assert(0)
         
@@ -233,20 +365,30 @@ class MoteHandler(threading.Thread):
     def getLocation(self):
         return self.location
     
+    def getModule(self,name):
+        assert name in self.MODULES
+        return getattr(self,name)
+    
     def handleEvent(self,functionToCall):
         
         if not self.booted:
             
-            assert functionToCall==self.hwSupply.switchOn
+            assert functionToCall in [self.hwSupply.switchOn,self.hwSupply.resume]
             
             # I'm not booted
-            self.booted = True
-            
-            # start the thread's execution
-            self.start()
+            self.booted       = True
+            self.bootFunction = functionToCall
             
-            # wait for CPU to be done
-            self.cpuDone.acquire()
+            if self.cooperative:
+                # run the mote until it sleeps
+                self.cpu    = greenlet.greenlet(self.bootFunction)
+                self._switchToMote()
+            else:
+                # start the thread's execution
+                self.start()
+                
+                # wait for CPU to be done
+                self.cpuDone.acquire()
         
         else:
             # call the funcion (mote runs in ISR)
@@ -254,11 +396,34 @@ class MoteHandler(threading.Thread):
             assert kickScheduler in [True,False]
             
             if kickScheduler:
-                # release the mote's CPU (mote runs in task mode)
-                self.cpuRunning.release()
-                
-                # wait for CPU to be done
-                self.cpuDone.acquire()
+                if self.cooperative:
+                    # run the mote in task mode until it sleeps
+                    self._switchToMote()
+                else:
+                    # release the mote's CPU (mote runs in task mode)
+                    self.cpuRunning.release()
+                    
+                    # wait for CPU to be done
+                    self.cpuDone.acquire()
+    
+    def sleep(self):
+        '''
+        \brief Called by the mote, in task mode, when it goes to sleep.
+        
+        Returns when an interrupt kicks the mote's scheduler.
+        '''
+        if self.cooperative:
+            # return to the timeline
+            self.caller.switch()
+        else:
+            self.cpuDone.release()
+            
+            # block the mote until CPU is released by ISR
+            self.cpuRunning.acquire()
     
     #======================== private =========================================
+    
+    def _switchToMote(self):
+        self.caller = greenlet.getcurrent()
+        self.cpu.switch()
     
\ No newline at end of file
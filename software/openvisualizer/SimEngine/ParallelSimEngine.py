@@ -0,0 +1,415 @@
+#!/usr/bin/python
+
+import logging
+import functools
+import multiprocessing
+
+from pydispatch import dispatcher
+
+import SimEngine
+import IdManager
+import LocationManager
+import Propagation
+from BspEmulator import BspRadio
+
+class NullLogHandler(logging.Handler):
+    def emit(self, record):
+        pass
+
+#============================ partitioning ====================================
+
+def partitionByLocation(locations,numPartitions):
+    '''
+    \brief Split motes into spatially clustered partitions.
+    
+    Uses recursive coordinate bisection: the motes are cut in two along the
+    axis where they are the most spread out, and each half is cut again
+    until numPartitions clusters of (almost) equal size remain.
+    
+    \param locations     A dictionary {moteId: (x,y,z)}.
+    \param numPartitions The number of partitions to create.
+    
+    \returns A list of numPartitions lists of mote IDs.
+    '''
+    assert numPartitions>0
+    return _bisect(sorted(locations.keys()),locations,numPartitions)
+
+def _bisect(moteIds,locations,numPartitions):
+
+    if numPartitions==1:
+        return [moteIds]
+    
+    # find the axis along which motes are the most spread out
+    spreads = []
+    for axis in range(3):
+        values = [locations[m][axis] for m in moteIds]
+        if values:
+            spreads += [max(values)-min(values)]
+        else:
+            spreads += [0]
+    axis = spreads.index(max(spreads))
+    
+    # cut along that axis, proportionally to the number of partitions on each side
+    moteIds      = sorted(moteIds,key=lambda m: (locations[m][axis],m))
+    numLeft      = numPartitions//2
+    cut          = len(moteIds)*numLeft//numPartitions
+    
+    return _bisect(moteIds[:cut],locations,numLeft)+ \
+           _bisect(moteIds[cut:],locations,numPartitions-numLeft)
+
+#============================ partition-side classes ==========================
+
+class PartitionIdManager(IdManager.IdManager):
+    '''
+    \brief Hands out the IDs the coordinator assigned to this partition.
+    '''
+    
+    def __init__(self,engine,moteIds):
+        IdManager.IdManager.__init__(self,engine)
+        self.moteIds         = list(moteIds)
+    
+    def getId(self):
+        return self.moteIds.pop(0)
+
+class PartitionLocationManager(LocationManager.LocationManager):
+    '''
+    \brief Hands out the locations the coordinator assigned to this partition.
+    '''
+    
+    def __init__(self,engine,locations):
+        LocationManager.LocationManager.__init__(self,engine,LocationManager.ListLayout(locations))
+
+class PartitionPropagation(Propagation.Propagation):
+    '''
+    \brief Propagation model which also forwards frames to the other partitions.
+    
+    Each frame is put in the queue of every other partition as soon as the
+    transmitting mote commits to sending it, i.e. at least one lookahead
+    before it starts on the air. Propagation has no notion of range, so
+    every partition gets every frame.
+    '''
+    
+    def __init__(self,engine,partitionId,queues):
+        
+        # initialize the parent
+        Propagation.Propagation.__init__(self,engine)
+        
+        # store params
+        self.partitionId     = partitionId
+        self.queues          = queues
+        
+        # local variables
+        self._resetSent()
+    
+    #======================== public ==========================================
+    
+    def indicateTxScheduled(self,moteId,txBuf,frequency,startTime,endTime):
+        frame = (startTime,endTime,moteId,txBuf[:],frequency)
+        for (i,q) in enumerate(self.queues):
+            if i==self.partitionId:
+                continue
+            q.put(frame)
+            self.numSent[i]  += 1
+        if self.minStartTime==None or startTime<self.minStartTime:
+            self.minStartTime = startTime
+    
+    def popSent(self):
+        '''
+        \returns A tuple (numSent,minStartTime) describing the frames sent to
+            other partitions since the last call.
+        '''
+        returnVal = (self.numSent,self.minStartTime)
+        self._resetSent()
+        return returnVal
+    
+    #======================== private =========================================
+    
+    def _resetSent(self):
+        self.numSent         = [0]*len(self.queues)
+        self.minStartTime    = None
+
+class RemoteMoteHandler(object):
+    '''
+    \brief Stand-in for a mote simulated in another partition.
+    
+    It only replays, on the local eventBus, the frames that mote transmits.
+    '''
+    
+    INTR_STARTOFFRAME_REMOTE = 'radio.startofframe_fromRemote'
+    INTR_ENDOFFRAME_REMOTE   = 'radio.endofframe_fromRemote'
+    
+    def __init__(self,engine,moteId):
+        
+        # store params
+        self.engine          = engine
+        self.id              = moteId
+        
+        # local variables
+        self.name            = 'RemoteMote_{0}'.format(self.id)
+    
+    #======================== public ==========================================
+    
+    def getId(self):
+        return self.id
+    
+    def handleEvent(self,functionToCall):
+        functionToCall()
+    
+    def scheduleTx(self,startTime,endTime,txBuf,frequency):
+        self.engine.timeline.scheduleEvent(
+            startTime,
+            self.id,
+            functools.partial(self._txStart,txBuf,frequency),
+            self.INTR_STARTOFFRAME_REMOTE,
+        )
+        self.engine.timeline.scheduleEvent(
+            endTime,
+            self.id,
+            self._txEnd,
+            self.INTR_ENDOFFRAME_REMOTE,
+        )
+    
+    #======================== private =========================================
+    
+    def _txStart(self,txBuf,frequency):
+        dispatcher.send(
+            sender           = self.name,
+            signal           = BspRadio.BspRadio.SIGNAL_WIRELESSTXSTART,
+            data             = (self.id,txBuf,frequency),
+        )
+    
+    def _txEnd(self):
+        dispatcher.send(
+            sender           = self.name,
+            signal           = BspRadio.BspRadio.SIGNAL_WIRELESSTXEND,
+            data             = self.id,
+        )
+
+def _partitionMain(partitionId,motes,remoteMoteIds,headerPath,createMote,queues,conn):
+    '''
+    \brief Body of a partition process.
+    
+    Builds a SimEngine holding this partition's motes, then executes the
+    windows the coordinator grants it.
+    '''
+    
+    import MoteHandler
+    from moteProbe import moteProbe
+    
+    if createMote==None:
+        # imported here, so the coordinator does not need the firmware
+        import oos_openwsn
+        createMote           = oos_openwsn.OpenMote
+    
+    MoteHandler.readNotifIds(headerPath)
+    
+    # create the engine
+    engine                   = SimEngine.SimEngine(cooperative=True)
+    engine.idmanager         = PartitionIdManager(engine,[m[0] for m in motes])
+    engine.locationmanager   = PartitionLocationManager(engine,[m[1] for m in motes])
+    engine.propagation       = PartitionPropagation(engine,partitionId,queues)
+    
+    # create the local motes, each booted at time 0
+    moteProbes               = []
+    for _ in motes:
+        moteHandler          = MoteHandler.MoteHandler(engine,createMote())
+        engine.indicateNewMote(moteHandler)
+        moteProbes          += [moteProbe.moteProbe(emulatedMote=moteHandler)]
+        engine.timeline.scheduleEvent(
+            0,
+            moteHandler.getId(),
+            moteHandler.hwSupply.switchOn,
+            moteHandler.hwSupply.INTR_SWITCHON,
+        )
+    
+    # create stand-ins for the motes of the other partitions
+    remoteMotes              = {}
+    for moteId in remoteMoteIds:
+        remoteMotes[moteId]  = RemoteMoteHandler(engine,moteId)
+        engine.indicateRemoteMote(remoteMotes[moteId])
+    
+    conn.send((engine.timeline.getNextEventTime(),engine.propagation.popSent()))
+    
+    while True:
+        cmd = conn.recv()
+        
+        if cmd[0]=='run':
+            (_,horizon,numExpected) = cmd
+            
+            # retrieve the frames the other partitions sent during the last window
+            frames = [queues[partitionId].get() for _ in range(numExpected)]
+            frames.sort(key=lambda f: (f[0],f[2]))
+            for (startTime,endTime,moteId,txBuf,frequency) in frames:
+                remoteMotes[moteId].scheduleTx(startTime,endTime,txBuf,frequency)
+            
+            # execute this window
+            engine.timeline.runUntil(horizon)
+            
+            conn.send((engine.timeline.getNextEventTime(),engine.propagation.popSent()))
+        
+        elif cmd[0]=='stop':
+            conn.send({
+                'numMotes':          engine.getNumMotes(),
+                'numEvents':         engine.timeline.getStats().getNumEvents(),
+                'currentTime':       engine.timeline.getCurrentTime(),
+                'moteStats':         engine.getStats().getMoteStats(),
+            })
+            for mp in moteProbes:
+                mp.close()
+            break
+
+#============================ coordinator =====================================
+
+class ParallelSimEngine(object):
+    '''
+    \brief Simulation engine which spreads motes over several processes.
+    
+    Motes are partitioned by location; each partition runs its own SimEngine
+    and TimeLine in a separate process. Partitions advance in lock step,
+    by windows no longer than the lookahead of the propagation model
+    (conservative synchronization, YAWNS style): no frame sent during a window
+    can start before the next one, so each partition can run its window
+    without hearing from the others. Idle periods are skipped by starting
+    each window at the earliest pending event of any partition.
+    '''
+    
+    def __init__(self,headerPath,numMotes,numPartitions,layout=None,createMote=None):
+        '''
+        \param headerPath    The firmware header listing the notification IDs.
+        \param numMotes      The number of motes to simulate.
+        \param numPartitions The number of processes to spread them over.
+        \param layout        Where to place the motes, see LocationManager.
+        \param createMote    Called without arguments in each partition, to
+            create the firmware of each mote; by default, an OpenMote.
+        '''
+        
+        # store params
+        self.headerPath           = headerPath
+        self.numMotes             = numMotes
+        self.numPartitions        = numPartitions
+        self.createMote           = createMote
+        
+        # local variables
+        self.idmanager            = IdManager.IdManager(self)
+        self.locationmanager      = LocationManager.LocationManager(self,layout)
+        self.lookahead            = Propagation.Propagation(self).getLookahead()
+        self.locations            = {}
+        self.partitions           = []
+        self.conns                = []
+        self.processes            = []
+        self.currentTime          = 0
+        self.numWindows           = 0
+        
+        # logging
+        self.log                  = logging.getLogger('ParallelSimEngine')
+        self.log.setLevel(logging.INFO)
+        self.log.addHandler(NullLogHandler())
+        
+        # assign ID and location to each mote
+        for _ in range(self.numMotes):
+            moteId                    = self.idmanager.getId()
+            self.locations[moteId]    = self.locationmanager.getLocation()
+        
+        # partition the motes
+        self.partitions           = partitionByLocation(self.locations,self.numPartitions)
+    
+    def start(self):
+        
+        # log
+        self.log.info('starting {0} partitions, lookahead {1}s'.format(
+                self.numPartitions,
+                self.lookahead,
+            )
+        )
+        
+        queues = [multiprocessing.Queue() for _ in range(self.numPartitions)]
+        
+        for (partitionId,moteIds) in enumerate(self.partitions):
+            (parentConn,childConn) = multiprocessing.Pipe()
+            remoteMoteIds = [m for m in self.locations.keys() if m not in moteIds]
+            p = multiprocessing.Process(
+                target = _partitionMain,
+                name   = 'SimPartition_{0}'.format(partitionId),
+                args   = (
+                    partitionId,
+                    [(m,self.locations[m]) for m in moteIds],
+                    remoteMoteIds,
+                    self.headerPath,
+                    self.createMote,
+                    queues,
+                    childConn,
+                ),
+            )
+            p.daemon = True
+            p.start()
+            self.conns     += [parentConn]
+            self.processes += [p]
+        
+        self._collectReplies()
+    
+    #======================== public ==========================================
+    
+    def run(self,duration):
+        '''
+        \brief Run the simulation until some simulated time.
+        
+        \param duration The simulated time to stop at, in s.
+        '''
+        
+        while True:
+            
+            # start the window at the earliest pending event of any partition
+            windowStart = self._getEarliestEventTime()
+            if windowStart==None or windowStart>=duration:
+                break
+            horizon     = min(windowStart+self.lookahead,duration)
+            
+            # grant the window to all partitions
+            for (partitionId,conn) in enumerate(self.conns):
+                conn.send(('run',horizon,self.numExpected[partitionId]))
+            self._collectReplies()
+            
+            self.currentTime  = horizon
+            self.numWindows  += 1
+    
+    def stop(self):
+        '''
+        \brief Stop all partitions.
+        
+        \returns A list with the statistics of each partition.
+        '''
+        for conn in self.conns:
+            conn.send(('stop',))
+        stats = [conn.recv() for conn in self.conns]
+        for p in self.processes:
+            p.join()
+        return stats
+    
+    def getNumMotes(self):
+        return self.numMotes
+    
+    def getPartitions(self):
+        return self.partitions
+    
+    def getCurrentTime(self):
+        return self.currentTime
+    
+    def getNumWindows(self):
+        return self.numWindows
+    
+    #======================== private =========================================
+    
+    def _collectReplies(self):
+        self.nextEventTimes  = []
+        self.numExpected     = [0]*self.numPartitions
+        for conn in self.conns:
+            (nextEventTime,(numSent,minStartTime)) = conn.recv()
+            self.nextEventTimes += [nextEventTime,minStartTime]
+            for i in range(self.numPartitions):
+                self.numExpected[i] += numSent[i]
+    
+    def _getEarliestEventTime(self):
+        times = [t for t in self.nextEventTimes if t!=None]
+        if times:
+            return min(times)
+        return None
@@ -2,6 +2,8 @@
 
 import logging
 
+from BspEmulator import BspRadio
+
 class NullLogHandler(logging.Handler):
     def emit(self, record):
         pass
@@ -11,6 +13,8 @@ class Propagation(object):
     \brief The propagation model of the engine.
     '''
     
+    MIN_PROPAGATION_DELAY     = 0 # frames currently reach all motes instantly, in s
+    
     def __init__(self,engine):
         
         # store params
@@ -25,7 +29,30 @@ class Propagation(object):
     
     #======================== public ==========================================
     
+    def getLookahead(self):
+        '''
+        \brief Minimum delay between a mote deciding to transmit and any other
+            mote being able to hear the start of that frame.
+        
+        \returns The lookahead, in s.
+        '''
+        return self.MIN_PROPAGATION_DELAY+BspRadio.BspRadio.DELAY_TX
+    
+    def indicateTxScheduled(self,moteId,txBuf,frequency,startTime,endTime):
+        '''
+        \brief A mote has committed to transmitting a frame.
+        
+        The frame itself reaches the motes of this engine through the
+        eventBus; nothing to do here.
+        
+        \param moteId    The ID of the transmitting mote.
+        \param txBuf     The frame, starting with its length byte.
+        \param frequency The frequency the frame is sent on.
+        \param startTime The time at which the frame starts on the air.
+        \param endTime   The time at which the frame ends on the air.
+        '''
+        pass
+    
     #======================== private =========================================
     
     #======================== helpers =========================================
-    
\ No newline at end of file
@@ -8,13 +8,16 @@ import TimeLine
 import Propagation
 import IdManager
 import LocationManager
+import Checkpoint
+import EventTrace
 
 class NullLogHandler(logging.Handler):
     def emit(self, record):
         pass
 
 class SimEngineStats(object):
-    def __init__(self):
+    def __init__(self,engine):
+        self.engine          = engine
         self.durationRunning = 0
         self.running = False
         self.txStart = None
@@ -33,28 +36,42 @@ class SimEngineStats(object):
             return self.durationRunning+(time.time()-self.txStart)
         else:
             return self.durationRunning
+    
+    def getMoteStats(self):
+        '''
+        \brief Return the radio statistics of each mote.
+        
+        \returns A dictionary {moteId: stats}, see BspRadio.getStats().
+        '''
+        return dict(
+            [(m.getId(),m.bspRadio.getStats()) for m in self.engine.moteHandlers]
+        )
 
 class SimEngine(object):
     '''
     \brief The main simulation engine.
     '''
     
-    def __init__(self,loghandler=NullLogHandler()):
+    def __init__(self,loghandler=NullLogHandler(),cooperative=False,layout=None):
         
         # store params
         self.loghandler           = loghandler
+        self.cooperative          = cooperative   # run motes as greenlets rather than threads
         
         # local variables
         self.moteHandlers         = []
+        self.moteHandlersById     = {}
         self.timeline             = TimeLine.TimeLine(self)
         self.propagation          = Propagation.Propagation(self)
         self.idmanager            = IdManager.IdManager(self)
-        self.locationmanager      = LocationManager.LocationManager(self) 
-        self.pauseSem             = threading.Lock()
+        self.locationmanager      = LocationManager.LocationManager(self,layout)
+        self.pauseCond            = threading.Condition()
         self.isPaused             = False
+        self.isBetweenEvents      = True  # the timeline thread is not executing an event
+        self.isParked             = False # the timeline thread waits in pauseOrDelay()
         self.stopAfterSteps       = None
         self.delay                = 0
-        self.stats                = SimEngineStats()
+        self.stats                = SimEngineStats(self)
         
         # logging this module
         self.log                  = logging.getLogger('SimEngine')
@@ -90,34 +107,91 @@ class SimEngine(object):
         self.delay = delay
     
     def pause(self):
+        '''
+        \brief Stop the timeline after the event it is executing, see
+            waitBetweenEvents().
+        '''
         if self.log.isEnabledFor(logging.DEBUG):
             self.log.debug('pause')
-        if not self.isPaused:
-            self.pauseSem.acquire()
-            self.isPaused = True
-            self.stats.indicateStop()
+        with self.pauseCond:
+            if not self.isPaused:
+                self.isPaused = True
+                self.stats.indicateStop()
     
     def step(self,numSteps):
-        self.stopAfterSteps = numSteps
-        if self.isPaused:
-            self.pauseSem.release()
-            self.isPaused = False
+        with self.pauseCond:
+            self.stopAfterSteps = numSteps
+            if self.isPaused:
+                self.isPaused = False
+                self.pauseCond.notifyAll()
     
     def resume(self):
         if self.log.isEnabledFor(logging.DEBUG):
             self.log.debug('resume')
-        self.stopAfterSteps = None
-        if self.isPaused:
-            self.pauseSem.release()
-            self.isPaused = False
-            self.stats.indicateStart()
+        with self.pauseCond:
+            self.stopAfterSteps = None
+            if self.isPaused:
+                self.isPaused = False
+                self.stats.indicateStart()
+                self.pauseCond.notifyAll()
+    
+    def waitBetweenEvents(self,timeout=None):
+        '''
+        \brief Wait until the paused timeline is done with the event it was
+            executing, and has called the functions passed to
+            callFromTimeline.
+        
+        Until resumed, nothing then changes the motes or the timeline.
+        
+        \param timeout The longest to wait, in s.
+        
+        \returns True once the timeline is stopped, False if the engine is
+            not paused, or the timeline did not stop within timeout.
+        '''
+        if timeout!=None:
+            deadline = time.time()+timeout
+        with self.pauseCond:
+            while self.isPaused:
+                if self.isBetweenEvents:
+                    if not self.isParked:
+                        # no timeline thread is running events, call them here
+                        self.timeline.runPendingCalls()
+                    if not self.timeline.pendingCalls:
+                        return True
+                if timeout==None:
+                    self.pauseCond.wait()
+                else:
+                    remaining = deadline-time.time()
+                    if remaining<=0:
+                        return False
+                    self.pauseCond.wait(remaining)
+        return False
+    
+    def indicatePendingCall(self):
+        '''
+        \brief Have a paused timeline call the functions passed to
+            callFromTimeline.
+        '''
+        with self.pauseCond:
+            self.pauseCond.notifyAll()
     
     def pauseOrDelay(self):
-        if self.isPaused:
-            if self.log.isEnabledFor(logging.DEBUG):
-                self.log.debug('pauseOrDelay: pause')
-            self.pauseSem.acquire()
-            self.pauseSem.release()
+        '''
+        \brief Called by the timeline thread between events.
+        '''
+        if self.isPaused or self.isBetweenEvents:
+            with self.pauseCond:
+                if self.isPaused and self.log.isEnabledFor(logging.DEBUG):
+                    self.log.debug('pauseOrDelay: pause')
+                while self.isPaused:
+                    # wait, still calling what other threads ask for
+                    self.timeline.runPendingCalls()
+                    self.isBetweenEvents = True
+                    self.isParked        = True
+                    self.pauseCond.notifyAll()
+                    self.pauseCond.wait()
+                self.isBetweenEvents = False
+                self.isParked        = False
         else:
             if self.log.isEnabledFor(logging.DEBUG):
                 self.log.debug('pauseOrDelay: delay {0}'.format(self.delay))
@@ -134,12 +208,60 @@ class SimEngine(object):
     def isRunning(self):
         return not self.isPaused
     
+    #=== tracing
+    
+    def startTrace(self,filename,framePayloads=False):
+        '''
+        \brief Start recording the executed events into a trace file.
+        
+        \param filename      The file to write the trace to.
+        \param framePayloads Whether to record whole frames rather than their
+                             CRC32.
+        '''
+        self.stopTrace()
+        self.timeline.trace = EventTrace.TraceWriter(filename,framePayloads)
+    
+    def stopTrace(self):
+        if self.timeline.trace:
+            trace               = self.timeline.trace
+            self.timeline.trace = None
+            trace.close()
+    
+    #=== checkpointing
+    
+    def checkpoint(self,f):
+        '''
+        \brief Save the state of the simulation, while paused.
+        
+        \param f A file-like object opened for writing, in binary mode.
+        '''
+        Checkpoint.save(self,f)
+    
+    def restore(self,f,createMote):
+        '''
+        \brief Load the state of a simulation, before starting the engine.
+        
+        \param f          A file-like object opened for reading, in binary mode.
+        \param createMote Function returning a new OpenMote.
+        '''
+        Checkpoint.load(self,f,createMote)
+    
     #=== called from the main script
     
     def indicateNewMote(self,moteHandler):
         
         # add this mote to my list of motes
         self.moteHandlers.append(moteHandler)
+        self.moteHandlersById[moteHandler.getId()] = moteHandler
+    
+    def indicateRemoteMote(self,moteHandler):
+        '''
+        \brief Make the timeline able to run events of a mote simulated
+            elsewhere.
+        
+        Such a mote is not counted in getNumMotes().
+        '''
+        self.moteHandlersById[moteHandler.getId()] = moteHandler
     
     #=== called from timeline
     
@@ -155,11 +277,7 @@ class SimEngine(object):
         return self.moteHandlers[rank]
     
     def getMoteHandlerById(self,moteId):
-        returnVal = None
-        for h in self.moteHandlers:
-            if h.getId()==moteId:
-                returnVal = h
-                break
+        returnVal = self.moteHandlersById.get(moteId)
         assert returnVal
         return returnVal
     
@@ -2,6 +2,7 @@
 
 import logging
 import threading
+import collections
 
 class NullLogHandler(logging.Handler):
     def emit(self, record):
@@ -47,6 +48,8 @@ class TimeLine(threading.Thread):
         self.firstEvent.acquire()
         self.firstEventLock       = threading.Lock()
         self.stats                = TimeLineStats()
+        self.trace                = None  # EventTrace.TraceWriter, when recording
+        self.pendingCalls         = collections.deque() # functions other threads want called
         
         # logging
         self.log                  = logging.getLogger('Timeline')
@@ -84,6 +87,9 @@ class TimeLine(threading.Thread):
         
         while True:
             
+            # call what other threads asked for
+            self.runPendingCalls()
+            
             # detect the end of the simulation
             if len(self.timeline)==0:
                 output  = ''
@@ -107,6 +113,10 @@ class TimeLine(threading.Thread):
                                                                        event.desc,
                                                                        event.moteId,))
             
+            # record the event
+            if self.trace:
+                self.trace.recordEvent(event.atTime,event.moteId,event.desc)
+            
             # call the event's callback
             self.engine.getMoteHandlerById(event.moteId).handleEvent(event.cb)
             
@@ -121,6 +131,67 @@ class TimeLine(threading.Thread):
     def getCurrentTime(self):
         return self.currentTime
     
+    def getNextEventTime(self):
+        '''
+        \brief Time of the event at the head of the timeline.
+        
+        \returns The time of the next event, or None if the timeline is empty.
+        '''
+        if self.timeline:
+            return self.timeline[0].atTime
+        return None
+    
+    def runUntil(self,horizon):
+        '''
+        \brief Execute, in the calling thread, all events scheduled strictly
+            before some time.
+        
+        This is used instead of the timeline thread when an external
+        coordinator decides how far the simulation can safely advance.
+        
+        \param horizon No event at or after this time is executed.
+        
+        \returns The number of events executed.
+        '''
+        
+        numEvents = 0
+        
+        while True:
+            
+            # call what other threads asked for
+            self.runPendingCalls()
+            
+            if not (self.timeline and self.timeline[0].atTime<horizon):
+                break
+            
+            # pop the event at the head of the timeline
+            event = self.timeline.pop(0)
+            
+            # make sure that this event is later in time than the previous
+            assert(self.currentTime<=event.atTime)
+            
+            # record the current time
+            self.currentTime = event.atTime
+            
+            # log
+            if self.log.isEnabledFor(logging.DEBUG):
+                self.log.debug('\n\nnow {0:.6f}, executing {1}@{2}'.format(event.atTime,
+                                                                       event.desc,
+                                                                       event.moteId,))
+            
+            # record the event
+            if self.trace:
+                self.trace.recordEvent(event.atTime,event.moteId,event.desc)
+            
+            # call the event's callback
+            self.engine.getMoteHandlerById(event.moteId).handleEvent(event.cb)
+            
+            # update statistics
+            self.stats.incrementEvents()
+            numEvents += 1
+        
+        return numEvents
+    
     def scheduleEvent(self,atTime,moteId,cb,desc):
         '''
         \brief Add an event into the timeline
@@ -172,6 +243,28 @@ class TimeLine(threading.Thread):
                 self.firstEventPassed = True
                 self.firstEvent.release()
         
+    def callFromTimeline(self,func):
+        '''
+        \brief Have the timeline thread call a function, before it executes
+            the next event.
+        
+        Unlike scheduleEvent, this can be called from any thread, without
+        pausing the engine.
+        
+        \param func The function to call, without arguments.
+        '''
+        self.pendingCalls.append(func)
+        self.engine.indicatePendingCall()
+    
+    def runPendingCalls(self):
+        '''
+        \brief Call the functions passed to callFromTimeline, in order.
+        
+        The timeline does so before each event, and while paused.
+        '''
+        while self.pendingCalls:
+            self.pendingCalls.popleft()()
+    
     def cancelEvent(self,moteId,desc):
         '''
         \brief Cancels all events identified by their description
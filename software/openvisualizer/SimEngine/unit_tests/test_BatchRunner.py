@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import json
+
+import pytest
+
+import BatchRunner
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_BatchRunner.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_BatchRunner')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_BatchRunner',
+                   'BatchRunner',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ tests ===========================================
+
+def test_loadScenario(tmpdir):
+
+    log.debug("\n---------- test_loadScenario")
+    
+    f = tmpdir.join('scenario.json')
+    f.write(json.dumps({'numMotes': 3, 'locations': [[0,0,0],[10,0,0],[20,0,0]]}))
+    
+    scenario = BatchRunner.loadScenario(str(f))
+    
+    assert scenario['numMotes']==3
+    assert scenario['locations']==[[0,0,0],[10,0,0],[20,0,0]]
+    assert scenario['duration']==BatchRunner.DEFAULT_SCENARIO['duration']
+    assert scenario['seed']==BatchRunner.DEFAULT_SCENARIO['seed']
+
+def test_invalidScenario(tmpdir):
+
+    log.debug("\n---------- test_invalidScenario")
+    
+    f = tmpdir.join('scenario.json')
+    f.write('{"numMotes": ')
+    with pytest.raises(BatchRunner.ScenarioException):
+        BatchRunner.loadScenario(str(f))
+    
+    for overrides in [
+            {'numMote': 3},
+            {'numMotes': 0},
+            {'duration': 0},
+            {'numMotes': 2, 'locations': [[0,0,0]]},
+        ]:
+        with pytest.raises(BatchRunner.ScenarioException):
+            BatchRunner.makeScenario(overrides)
+
+def test_expandSweep():
+
+    log.debug("\n---------- test_expandSweep")
+    
+    scenario  = BatchRunner.makeScenario({'duration': 10})
+    scenarios = BatchRunner.expandSweep(scenario,{'seed': [1,2], 'numMotes': [5,50,500]})
+    
+    assert len(scenarios)==6
+    assert [(s['numMotes'],s['seed']) for s in scenarios]==[
+        (5,1),(5,2),(50,1),(50,2),(500,1),(500,2),
+    ]
+    assert all([s['duration']==10 for s in scenarios])
+    
+    # no sweep, a single scenario
+    assert BatchRunner.expandSweep(scenario,{})==[scenario]
+
+def test_layout():
+
+    log.debug("\n---------- test_layout")
+    
+    scenario = BatchRunner.makeScenario({'layout': {'type': 'grid', 'spacing': 20}})
+    layout   = BatchRunner.makeLayout(scenario)
+    assert layout.getLocation(11)==(20,20,0)
+    
+    for overrides in [
+            {'layout': {'spacing': 20}},
+            {'layout': {'type': 'circle'}},
+            {'layout': {'type': 'grid'}, 'numMotes': 1, 'locations': [[0,0,0]]},
+        ]:
+        with pytest.raises(BatchRunner.ScenarioException):
+            BatchRunner.makeScenario(overrides)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import time
+import StringIO
+import threading
+
+import pytest
+
+import SimEngine
+import MoteHandler
+import Checkpoint
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_Checkpoint.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_Checkpoint')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_Checkpoint',
+                   'Checkpoint',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT = 2 # s
+
+#============================ helpers =========================================
+
+class CheckpointableMote(object):
+    '''
+    \brief Stands for the firmware, which only needs to keep some state.
+    '''
+    
+    def __init__(self):
+        self.state   = None
+        self.resumed = False
+    
+    def set_callback(self,notifId,cb):
+        pass
+    
+    def get_state(self):
+        return self.state
+    
+    def set_state(self,state):
+        self.state = state
+    
+    def supply_on(self):
+        raise AssertionError('booting again would lose the restored state')
+    
+    def supply_resume(self):
+        self.resumed = True
+
+class NotResumableMote(object):
+    '''
+    \brief Firmware which keeps some state, yet can only boot from scratch.
+    '''
+    
+    def set_callback(self,notifId,cb):
+        pass
+    
+    def set_state(self,state):
+        pass
+
+@pytest.fixture
+def noNotifIds(monkeypatch):
+    # no firmware header is needed to create motes
+    monkeypatch.setattr(MoteHandler,'notifId',lambda s: s)
+    monkeypatch.setattr(MoteHandler,'callbackTable',None)
+
+def createEngine(numMotes):
+    engine = SimEngine.SimEngine()
+    for i in range(numMotes):
+        moteHandler = MoteHandler.MoteHandler(engine,CheckpointableMote())
+        moteHandler.mote.state = 'firmware state {0}'.format(i)
+        engine.indicateNewMote(moteHandler)
+        moteHandler.bspBsp_timer.cmd_init()
+        moteHandler.bspBsp_timer.cmd_scheduleIn(100*(i+1))
+    engine.pause()
+    return engine
+
+#============================ tests ===========================================
+
+def test_roundTrip(noNotifIds):
+
+    log.debug("\n---------- test_roundTrip")
+    
+    engine = createEngine(3)
+    engine.getMoteHandler(1).bspLeds.cmd_error_on()
+    
+    f = StringIO.StringIO()
+    engine.checkpoint(f)
+    
+    f.seek(0)
+    restored = SimEngine.SimEngine()
+    restored.restore(f,CheckpointableMote)
+    
+    assert restored.getNumMotes()==3
+    assert restored.getMoteHandler(1).bspLeds.errorLedOn
+    assert not restored.getMoteHandler(0).bspLeds.errorLedOn
+    for i in range(3):
+        original = engine.getMoteHandler(i)
+        copy     = restored.getMoteHandler(i)
+        assert copy.getId()==original.getId()
+        assert copy.getLocation()==original.getLocation()
+        assert copy.mote.get_state()=='firmware state {0}'.format(i)
+    
+    # same events, calling the same methods of the restored motes
+    assert restored.timeline.getEvents()==engine.timeline.getEvents()
+    for event in restored.timeline.timeline:
+        assert event.cb.im_self.motehandler is restored.getMoteHandlerById(event.moteId)
+    
+    # new motes keep getting new IDs
+    assert restored.idmanager.getId()==engine.idmanager.getId()
+
+def test_resumeBootedMotes(noNotifIds):
+
+    log.debug("\n---------- test_resumeBootedMotes")
+    
+    engine = createEngine(2)
+    moteHandler = engine.getMoteHandler(0)
+    moteHandler.booted          = True
+    moteHandler.hwSupply.moteOn = True
+    
+    f = StringIO.StringIO()
+    engine.checkpoint(f)
+    
+    f.seek(0)
+    restored = SimEngine.SimEngine()
+    restored.restore(f,CheckpointableMote)
+    
+    # the booted mote is resumed before anything else happens
+    (atTime,moteId,desc) = restored.timeline.getEvents()[0]
+    assert atTime==engine.timeline.getCurrentTime()
+    assert moteId==moteHandler.getId()
+    assert desc==moteHandler.hwSupply.INTR_RESUME
+    assert len(restored.timeline.getEvents())==len(engine.timeline.getEvents())+1
+    
+    # resuming does not boot the firmware again
+    copy = restored.getMoteHandlerById(moteHandler.getId())
+    copy.hwSupply.resume()
+    assert copy.mote.resumed
+    assert copy.mote.get_state()=='firmware state 0'
+    
+    # firmware which can not resume is not restored
+    f.seek(0)
+    with pytest.raises(Checkpoint.CheckpointException):
+        SimEngine.SimEngine().restore(f,NotResumableMote)
+
+def test_pendingCalls(noNotifIds):
+
+    log.debug("\n---------- test_pendingCalls")
+    
+    engine = createEngine(1)
+    engine.timeline.callFromTimeline(engine.getMoteHandler(0).bspLeds.cmd_error_on)
+    
+    f = StringIO.StringIO()
+    engine.checkpoint(f)
+    
+    # what other threads asked for is done before the snapshot is taken
+    assert not engine.timeline.pendingCalls
+    f.seek(0)
+    restored = SimEngine.SimEngine()
+    restored.restore(f,CheckpointableMote)
+    assert restored.getMoteHandler(0).bspLeds.errorLedOn
+
+def test_pauseDuringEvent(noNotifIds):
+
+    log.debug("\n---------- test_pauseDuringEvent")
+    
+    engine      = SimEngine.SimEngine()
+    moteHandler = MoteHandler.MoteHandler(engine,CheckpointableMote())
+    engine.indicateNewMote(moteHandler)
+    moteHandler.booted = True
+    
+    # an event still changing the mote after the engine is paused
+    started = threading.Event()
+    def slowEvent():
+        started.set()
+        time.sleep(0.2)
+        moteHandler.bspLeds.cmd_error_on()
+        return False
+    engine.timeline.scheduleEvent(0,moteHandler.getId(),slowEvent,'slowEvent')
+    engine.start()
+    assert started.wait(TIMEOUT)
+    engine.pause()
+    
+    # the snapshot waits for it, and calls on the timeline thread what
+    # other threads asked for
+    threads = []
+    engine.timeline.callFromTimeline(lambda: threads.append(threading.current_thread()))
+    f = StringIO.StringIO()
+    engine.checkpoint(f)
+    assert threads==[engine.timeline]
+    
+    f.seek(0)
+    restored = SimEngine.SimEngine()
+    restored.restore(f,CheckpointableMote)
+    assert restored.getMoteHandler(0).bspLeds.errorLedOn
+
+def test_runningEngine(noNotifIds):
+
+    log.debug("\n---------- test_runningEngine")
+    
+    engine = createEngine(1)
+    engine.resume()
+    
+    with pytest.raises(Checkpoint.CheckpointException):
+        engine.checkpoint(StringIO.StringIO())
+
+def test_notACheckpoint(noNotifIds):
+
+    log.debug("\n---------- test_notACheckpoint")
+    
+    with pytest.raises(Checkpoint.CheckpointException):
+        SimEngine.SimEngine().restore(StringIO.StringIO(''),CheckpointableMote)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+
+import zlib
+
+import pytest
+
+import EventTrace
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_EventTrace.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_EventTrace')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_EventTrace',
+                   'EventTrace',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ helpers =========================================
+
+FRAME = [0x41,0x88,0x01,0xcd,0xab]
+
+def writeTrace(filename,numEvents,framePayloads=False,close=True):
+    trace = EventTrace.TraceWriter(filename,framePayloads)
+    for i in range(numEvents):
+        trace.recordEvent(i*0.001,i%5+1,'bsp_timer.compare' if i%2 else 'radio.endofframe_fromMote')
+        if i%10==0:
+            trace.recordFrame(i*0.001,i%5+1,FRAME)
+    if close:
+        trace.close()
+    return trace
+
+#============================ tests ===========================================
+
+def test_roundTrip(tmpdir):
+
+    log.debug("\n---------- test_roundTrip")
+    
+    filename = str(tmpdir.join('trace'))
+    writeTrace(filename,100)
+    
+    records  = list(EventTrace.TraceReader(filename))
+    assert len(records)==110
+    assert records[0]==(0,1,'radio.endofframe_fromMote',None)
+    assert records[1]==(0,1,EventTrace.FRAME_DESC,zlib.crc32(str(bytearray(FRAME))) & 0xffffffff)
+    assert records[2]==(0.001,2,'bsp_timer.compare',None)
+
+def test_framePayloads(tmpdir):
+
+    log.debug("\n---------- test_framePayloads")
+    
+    filename = str(tmpdir.join('trace'))
+    writeTrace(filename,1,framePayloads=True)
+    
+    records  = list(EventTrace.TraceReader(filename))
+    assert records[1]==(0,1,EventTrace.FRAME_DESC,str(bytearray(FRAME)))
+
+def test_grow(tmpdir,monkeypatch):
+
+    log.debug("\n---------- test_grow")
+    
+    monkeypatch.setattr(EventTrace,'GROW_SIZE',64)
+    
+    filename = str(tmpdir.join('trace'))
+    trace    = writeTrace(filename,1000,framePayloads=True)
+    
+    assert len(list(EventTrace.TraceReader(filename)))==trace.getNumRecords()
+
+def test_unclosed(tmpdir):
+
+    log.debug("\n---------- test_unclosed")
+    
+    # a simulation which crashed leaves the file unclosed
+    filename = str(tmpdir.join('trace'))
+    trace    = writeTrace(filename,100,close=False)
+    trace.map.flush()
+    
+    assert len(list(EventTrace.TraceReader(filename)))==110
+
+def test_divergence(tmpdir):
+
+    log.debug("\n---------- test_divergence")
+    
+    filenameA = str(tmpdir.join('traceA'))
+    filenameB = str(tmpdir.join('traceB'))
+    filenameC = str(tmpdir.join('traceC'))
+    writeTrace(filenameA,100)
+    writeTrace(filenameB,100)
+    writeTrace(filenameC,50)
+    
+    assert EventTrace.findDivergence(filenameA,filenameB) is None
+    
+    (index,recordA,recordC) = EventTrace.findDivergence(filenameA,filenameC)
+    assert index==55
+    assert recordA==(0.05,1,'radio.endofframe_fromMote',None)
+    assert recordC is None
+
+def test_notATrace(tmpdir):
+
+    log.debug("\n---------- test_notATrace")
+    
+    filename = str(tmpdir.join('trace'))
+    tmpdir.join('trace').write('not a trace')
+    
+    with pytest.raises(ValueError):
+        EventTrace.TraceReader(filename)
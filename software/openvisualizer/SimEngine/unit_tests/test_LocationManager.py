@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import pytest
+
+import LocationManager
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_LocationManager.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_LocationManager')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_LocationManager',
+                   'LocationManager',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ fixtures ========================================
+
+@pytest.fixture(params=['numpy','no numpy'])
+def withNumpy(request,monkeypatch):
+    if request.param=='no numpy':
+        monkeypatch.setattr(LocationManager,'numpy',None)
+    elif LocationManager.numpy is None:
+        pytest.skip('NumPy not installed')
+
+#============================ helpers =========================================
+
+def getLocations(layout,numMotes):
+    locationmanager = LocationManager.LocationManager(None,layout)
+    return [locationmanager.getLocation() for _ in range(numMotes)]
+
+#============================ tests ===========================================
+
+def test_layouts():
+
+    log.debug("\n---------- test_layouts")
+    
+    assert getLocations(LocationManager.GridLayout(spacing=5,numColumns=2),5)==[
+        (0,0,0),(5,0,0),(0,5,0),(5,5,0),(0,10,0),
+    ]
+    assert getLocations(LocationManager.LineLayout(spacing=3),3)==[
+        (0,0,0),(3,0,0),(6,0,0),
+    ]
+    assert getLocations(LocationManager.ListLayout([[1,2],[3,4,5]]),2)==[
+        (1,2,0),(3,4,5),
+    ]
+    with pytest.raises(LocationManager.LocationException):
+        getLocations(LocationManager.ListLayout([[1,2]]),2)
+    
+    assert isinstance(LocationManager.makeLayout('grid',spacing=2),LocationManager.GridLayout)
+    with pytest.raises(LocationManager.LocationException):
+        LocationManager.makeLayout('circle')
+    with pytest.raises(LocationManager.LocationException):
+        LocationManager.makeLayout('line',numColumns=2)
+
+def test_randomLayout():
+
+    log.debug("\n---------- test_randomLayout")
+    
+    locations = getLocations(LocationManager.RandomLayout(seed=7,size=50),20)
+    
+    # the same seed gives the same locations
+    assert locations==getLocations(LocationManager.RandomLayout(seed=7,size=50),20)
+    assert locations!=getLocations(LocationManager.RandomLayout(seed=8,size=50),20)
+    for (x,y,z) in locations:
+        assert 0<=x<=50 and 0<=y<=50 and z==0
+
+def test_csvLayout(tmpdir):
+
+    log.debug("\n---------- test_csvLayout")
+    
+    f = tmpdir.join('locations.csv')
+    f.write('x,y,z\n0,0,0\n10.5,20\n\n1,2,3\n')
+    
+    assert getLocations(LocationManager.CsvLayout(str(f)),3)==[
+        (0,0,0),(10.5,20,0),(1,2,3),
+    ]
+
+def test_positions(withNumpy):
+
+    log.debug("\n---------- test_positions")
+    
+    locationmanager = LocationManager.LocationManager(None,LocationManager.LineLayout(spacing=3))
+    for _ in range(3):
+        locationmanager.getLocation()
+    locationmanager.setNextLocation((3,4,0))
+    locationmanager.getLocation()
+    
+    positions = locationmanager.getPositions()
+    distances = locationmanager.getDistances()
+    
+    assert [tuple(p) for p in positions]==[(0,0,0),(3,0,0),(6,0,0),(3,4,0)]
+    assert len(distances)==4
+    for i in range(4):
+        assert distances[i][i]==0
+        for j in range(4):
+            assert distances[i][j]==distances[j][i]
+    assert distances[0][2]==6
+    assert distances[0][3]==5
+    assert distances[1][3]==4
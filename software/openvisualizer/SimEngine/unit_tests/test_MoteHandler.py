@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import json
+import threading
+
+import pytest
+
+import SimEngine
+import MoteHandler
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_MoteHandler.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_MoteHandler')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_MoteHandler',
+                   'MoteHandler',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ helpers =========================================
+
+class Mote(object):
+
+    def __init__(self):
+        self.callbacks = {}
+    
+    def set_callback(self,notifId,cb):
+        self.callbacks[notifId] = cb
+
+class SleepyMote(Mote):
+    '''
+    \brief Boots, then runs its scheduler each time an interrupt kicks it,
+        sleeping in between, and records where and when it runs.
+    '''
+    
+    def __init__(self,engine):
+        Mote.__init__(self)
+        self.engine      = engine
+        self.moteHandler = None
+        self.runs        = []
+    
+    def supply_on(self):
+        self.record('boot')
+        while True:
+            self.moteHandler.bspBoard.cmd_sleep()
+            self.record('task')
+    
+    def interrupt(self,kickScheduler):
+        self.record('isr')
+        return kickScheduler
+    
+    def record(self,what):
+        self.runs.append({
+            'what':     what,
+            'moteId':   self.moteHandler.getId(),
+            'time':     self.engine.timeline.getCurrentTime(),
+            'thread':   threading.current_thread(),
+            'greenlet': MoteHandler.greenlet.getcurrent() if MoteHandler.greenlet else None,
+        })
+
+def runSleepyMotes(engine):
+    '''
+    \brief Boot two motes, then have interrupts wake them up, and return
+        their handlers and the runs of both, in order.
+    '''
+    motes    = []
+    handlers = []
+    for _ in range(2):
+        mote             = SleepyMote(engine)
+        moteHandler      = MoteHandler.MoteHandler(engine,mote)
+        mote.moteHandler = moteHandler
+        engine.indicateNewMote(moteHandler)
+        engine.timeline.scheduleEvent(0,moteHandler.getId(),moteHandler.hwSupply.switchOn,moteHandler.hwSupply.INTR_SWITCHON)
+        motes           += [mote]
+        handlers        += [moteHandler]
+    for (atTime,i,kickScheduler) in [(1,0,True),(2,1,True),(3,0,True),(4,1,False)]:
+        engine.timeline.scheduleEvent(
+            atTime,
+            handlers[i].getId(),
+            lambda mote=motes[i],kickScheduler=kickScheduler: mote.interrupt(kickScheduler),
+            'interrupt{0}'.format(atTime), # one event per mote and description
+        )
+    
+    assert engine.timeline.runUntil(10)==6
+    
+    runs = sorted(motes[0].runs+motes[1].runs,key=lambda r: r['time'])
+    return (handlers,runs)
+
+def checkRuns(handlers,runs):
+    # the motes run one at a time, each until it sleeps, as the events say
+    assert [(r['what'],r['moteId'],r['time']) for r in runs]==[
+        ('boot',handlers[0].getId(),0),
+        ('boot',handlers[1].getId(),0),
+        ('isr', handlers[0].getId(),1),
+        ('task',handlers[0].getId(),1),
+        ('isr', handlers[1].getId(),2),
+        ('task',handlers[1].getId(),2),
+        ('isr', handlers[0].getId(),3),
+        ('task',handlers[0].getId(),3),
+        ('isr', handlers[1].getId(),4),
+    ]
+
+def writeHeader(tmpdir,names):
+    header = tmpdir.join('openwsnmodule_obj.h')
+    header.write(''.join(['   MOTE_NOTIF_{0},\n'.format(n) for n in names]))
+    return header
+
+def forgetNotifIds(monkeypatch):
+    # as if the module did not read any header
+    monkeypatch.setattr(MoteHandler,'notifString',[])
+    monkeypatch.setattr(MoteHandler,'notifIds',{})
+    monkeypatch.setattr(MoteHandler,'notifSource',None)
+    monkeypatch.setattr(MoteHandler,'callbackTable',None)
+
+@pytest.fixture
+def noNotifIds(monkeypatch):
+    forgetNotifIds(monkeypatch)
+
+@pytest.fixture
+def anyNotifIds(monkeypatch):
+    # no firmware header is needed to create motes
+    monkeypatch.setattr(MoteHandler,'notifId',lambda s: s)
+    monkeypatch.setattr(MoteHandler,'callbackTable',None)
+
+#============================ tests ===========================================
+
+def test_readNotifIds(tmpdir,noNotifIds):
+
+    log.debug("\n---------- test_readNotifIds")
+    
+    names  = [c[0] for c in MoteHandler.CALLBACKS]
+    header = writeHeader(tmpdir,names+names[:3])
+    
+    MoteHandler.readNotifIds(str(header))
+    
+    assert MoteHandler.notifString==names
+    for (i,name) in enumerate(names):
+        assert MoteHandler.notifId(name)==i
+    
+    # the callbacks of each mote are installed from the table
+    moteHandler = MoteHandler.MoteHandler(SimEngine.SimEngine(),Mote())
+    assert len(moteHandler.mote.callbacks)==len(names)
+    assert moteHandler.mote.callbacks[MoteHandler.notifId('uart_writeByte')]==moteHandler.bspUart.cmd_writeByte
+    assert moteHandler.mote.callbacks[MoteHandler.notifId('board_sleep')]==moteHandler.bspBoard.cmd_sleep
+
+def test_cache(tmpdir,noNotifIds,monkeypatch):
+
+    log.debug("\n---------- test_cache")
+    
+    header = writeHeader(tmpdir,['a','b'])
+    cache  = tmpdir.join('notifids')
+    
+    MoteHandler.readNotifIds(str(header),str(cache))
+    assert json.loads(cache.read())['names']==['a','b']
+    
+    # the cache is used when the header keeps the same mtime and size
+    content          = json.loads(cache.read())
+    content['names'] = ['x','y']
+    cache.write(json.dumps(content))
+    forgetNotifIds(monkeypatch)
+    MoteHandler.readNotifIds(str(header),str(cache))
+    assert MoteHandler.notifString==['x','y']
+    
+    # ... or the same content
+    header.setmtime(header.mtime()-10)
+    forgetNotifIds(monkeypatch)
+    MoteHandler.readNotifIds(str(header),str(cache))
+    assert MoteHandler.notifString==['x','y']
+    assert json.loads(cache.read())['mtime']==os.stat(str(header)).st_mtime
+    
+    # a modified header is read again
+    writeHeader(tmpdir,['a','b','c'])
+    forgetNotifIds(monkeypatch)
+    MoteHandler.readNotifIds(str(header),str(cache))
+    assert MoteHandler.notifString==['a','b','c']
+    assert json.loads(cache.read())['names']==['a','b','c']
+
+def test_cooperative(anyNotifIds):
+
+    log.debug("\n---------- test_cooperative")
+    
+    pytest.importorskip('greenlet')
+    
+    engine = SimEngine.SimEngine(cooperative=True)
+    (handlers,runs) = runSleepyMotes(engine)
+    checkRuns(handlers,runs)
+    
+    # all in the calling thread, task mode in the greenlet of each mote
+    assert not any(h.isAlive() for h in handlers)
+    for r in runs:
+        assert r['thread'] is threading.current_thread()
+        moteHandler = engine.getMoteHandlerById(r['moteId'])
+        if r['what']=='isr':
+            assert r['greenlet'] is not moteHandler.cpu
+        else:
+            assert r['greenlet'] is moteHandler.cpu
+    
+    # the motes sleep, waiting for the next interrupt
+    assert not any(h.cpu.dead for h in handlers)
+
+def test_cooperativeWithoutGreenlet(anyNotifIds,monkeypatch):
+
+    log.debug("\n---------- test_cooperativeWithoutGreenlet")
+    
+    # without greenlet, each mote falls back to a thread of its own
+    monkeypatch.setattr(MoteHandler,'greenlet',None)
+    
+    engine = SimEngine.SimEngine(cooperative=True)
+    (handlers,runs) = runSleepyMotes(engine)
+    assert not any(h.cooperative for h in handlers)
+    checkRuns(handlers,runs)
+    
+    # interrupts in the calling thread, task mode in the thread of each mote
+    for r in runs:
+        moteHandler = engine.getMoteHandlerById(r['moteId'])
+        if r['what']=='isr':
+            assert r['thread'] is threading.current_thread()
+        else:
+            assert r['thread'] is moteHandler
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                                   # SimEngine/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import random
+import json
+import functools
+import multiprocessing
+
+import pytest
+
+import ParallelSimEngine
+import LocationManager
+import MoteHandler
+from BspEmulator import BspRadio
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_ParallelSimEngine.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_ParallelSimEngine')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_ParallelSimEngine',
+                   'ParallelSimEngine',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ fixtures ========================================
+
+PARTITIONING = []
+for numMotes in [1,10,100,500]:
+    for numPartitions in [1,2,3,4,7]:
+        if numPartitions<=numMotes:
+            PARTITIONING.append(json.dumps((numMotes,numPartitions)))
+
+@pytest.fixture(params=PARTITIONING)
+def partitioning(request):
+    return request.param
+
+#============================ helpers =========================================
+
+TIMEOUT      = 2          # s
+TX_MOTE_ID   = 1
+TX_TICKS     = 3277       # when the mote transmits, in crystal ticks
+TX_FREQUENCY = 11
+TX_PAYLOAD   = [0x41,0x88,0x01,0x02,0x03]
+
+class StubMote(object):
+    '''
+    \brief Stands for the firmware in a partition: mote TX_MOTE_ID sends a
+        frame after TX_TICKS, the others listen, and all report what they
+        do to a queue.
+    '''
+    
+    def __init__(self,results):
+        self.results   = results
+        self.callbacks = {}
+    
+    def set_callback(self,notifId,cb):
+        self.callbacks[notifId] = cb
+    
+    def supply_on(self):
+        self.call('radio_init')
+        self.call('radio_setFrequency',TX_FREQUENCY)
+        if self.getId()==TX_MOTE_ID:
+            self.call('bsp_timer_init')
+            self.call('bsp_timer_scheduleIn',TX_TICKS)
+        else:
+            self.call('radio_rxEnable')
+            self.call('radio_rxNow')
+        while True:
+            self.call('board_sleep')
+    
+    def bsp_timer_isr(self):
+        self.call('radio_loadPacket',TX_PAYLOAD)
+        self.call('radio_txEnable')
+        self.call('radio_txNow')
+        self.report('tx')
+    
+    def radio_isr_startFrame(self,counterVal):
+        if self.getId()!=TX_MOTE_ID:
+            self.report('rxStart')
+    
+    def radio_isr_endFrame(self,counterVal):
+        if self.getId()!=TX_MOTE_ID:
+            self.report('rxEnd',self.call('radio_getReceivedFrame')[0])
+    
+    def call(self,name,*args):
+        return self.callbacks[MoteHandler.notifId(name)](*args)
+    
+    def getId(self):
+        return self.callbacks[MoteHandler.notifId('radio_init')].im_self.motehandler.getId()
+    
+    def report(self,what,data=None):
+        timeline = self.callbacks[MoteHandler.notifId('radio_init')].im_self.timeline
+        self.results.put((what,self.getId(),timeline.getCurrentTime(),data))
+
+def randomLocations(numMotes):
+    rng = random.Random(numMotes)
+    return dict(
+        (moteId,(rng.randint(0,100),rng.randint(0,100),0)) for moteId in range(1,numMotes+1)
+    )
+
+def writeHeader(tmpdir):
+    header = tmpdir.join('openwsnmodule_obj.h')
+    header.write(''.join(['   MOTE_NOTIF_{0},\n'.format(c[0]) for c in MoteHandler.CALLBACKS]))
+    return str(header)
+
+#============================ tests ===========================================
+
+def test_partitionBalanced(partitioning):
+
+    (numMotes,numPartitions) = json.loads(partitioning)
+    
+    log.debug("\n---------- test_partitionBalanced {0} motes, {1} partitions".format(numMotes,numPartitions))
+    
+    locations  = randomLocations(numMotes)
+    partitions = ParallelSimEngine.partitionByLocation(locations,numPartitions)
+    log.debug("partition sizes: {0}".format([len(p) for p in partitions]))
+    
+    # each mote is in exactly one partition
+    assert len(partitions)==numPartitions
+    assert sorted(sum(partitions,[]))==sorted(locations.keys())
+    
+    # partitions have (almost) the same size
+    sizes = [len(p) for p in partitions]
+    assert max(sizes)-min(sizes)<=numPartitions
+
+def test_partitionClustered():
+
+    log.debug("\n---------- test_partitionClustered")
+    
+    # two clusters, far apart along the x axis
+    locations  = {}
+    for moteId in range(1,11):
+        locations[moteId]    = (moteId,    moteId%3,0)
+        locations[moteId+10] = (1000+moteId,moteId%3,0)
+    
+    partitions = ParallelSimEngine.partitionByLocation(locations,2)
+    
+    assert sorted(partitions[0])==range(1,11)
+    assert sorted(partitions[1])==range(11,21)
+
+def test_crossPartition(tmpdir):
+
+    log.debug("\n---------- test_crossPartition")
+    
+    # motes 1 and 2 in one partition, 3 and 4 in the other
+    results = multiprocessing.Queue()
+    engine  = ParallelSimEngine.ParallelSimEngine(
+        writeHeader(tmpdir),
+        4,
+        2,
+        layout     = LocationManager.ListLayout([(0,0),(1,0),(1000,0),(1001,0)]),
+        createMote = functools.partial(StubMote,results),
+    )
+    assert engine.getPartitions()==[[1,2],[3,4]]
+    
+    engine.start()
+    engine.run(0.2)
+    stats = engine.stop()
+    
+    # one transmission, the start and end of three receptions
+    reports = {}
+    for _ in range(7):
+        (what,moteId,atTime,data) = results.get(timeout=TIMEOUT)
+        reports[(what,moteId)] = (atTime,data)
+    assert results.empty()
+    
+    # the frame is heard when it starts on the air, one lookahead after the
+    # mote decided to send it, in its partition and in the other one
+    (txTime,_) = reports[('tx',TX_MOTE_ID)]
+    startTime  = txTime+BspRadio.BspRadio.DELAY_TX
+    endTime    = startTime+(len(TX_PAYLOAD)+1)*8/250000.0
+    for moteId in [2,3,4]:
+        assert reports[('rxStart',moteId)]==(startTime,None)
+        assert reports[('rxEnd',moteId)]==(endTime,TX_PAYLOAD)
+    
+    # idle time is skipped: booting, sending and receiving take a window each
+    assert engine.getNumWindows()==3
+    assert [s['numMotes'] for s in stats]==[2,2]
+    for moteId in [2,3,4]:
+        assert stats[(moteId-1)//2]['moteStats'][moteId]['numFramesReceived']==1
+    assert stats[0]['moteStats'][TX_MOTE_ID]['numFramesSent']==1
@@ -0,0 +1,149 @@
+#!/usr/bin/python
+
+import os
+import sys
+
+if __name__=='__main__':
+    here = sys.path[0]
+    # PyDispatcher-2.0.3/
+    sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))
+    # openvisualizer/
+    sys.path.insert(0, os.path.join(here, '..', '..'))
+
+import time
+import threading
+from argparse import ArgumentParser
+
+from openTun  import openTun
+from openTun  import openTunSocket
+from openLbr  import openLbr
+from eventBus import eventBusClient
+
+#============================ defines =========================================
+
+MOTE        = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x02]
+DAGROOT     = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01]
+HOST_ADDR   = [0x20,0x01,0x0d,0xb8]+[0x00]*11+[0x01]
+
+#============================ helpers =========================================
+
+class MeshSink(eventBusClient.eventBusClient):
+    '''
+    \brief Stands for RPL and the DAGroot: answers source route requests with
+        a one-hop route, and counts what goes to the mesh.
+    '''
+    
+    def __init__(self):
+        self.dataLock             = threading.Lock()
+        self.numToMesh            = 0
+        self.lastToMesh           = None
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name                  = 'MeshSink',
+            registrations         = [
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'getSourceRoute',
+                    'callback'    : self._getSourceRoute_notif,
+                },
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'bytesToMesh',
+                    'callback'    : self._bytesToMesh_notif,
+                },
+            ]
+        )
+    
+    def _getSourceRoute_notif(self,sender,signal,data):
+        return [data,DAGROOT]
+    
+    def _bytesToMesh_notif(self,sender,signal,data):
+        with self.dataLock:
+            self.numToMesh       += 1
+            self.lastToMesh       = time.time()
+
+def makePackets(numPackets,size):
+    '''
+    \brief Build UDP packets from the Internet to a mote.
+    '''
+    payload = [0x00]*max(0,size-40)
+    return [
+        [0x60,0,0,0,len(payload)>>8,len(payload)&0xff,17,64]+HOST_ADDR+openTun.IPV6PREFIX+MOTE+payload
+    ]*numPackets
+
+#============================ main ============================================
+
+def main():
+
+    parser = ArgumentParser(
+        description = 'Measure how fast IPv6 packets cross the TUN interface and the LBR, without root.'
+    )
+    parser.add_argument('-r',
+        dest       = 'pcap',
+        default    = None,
+        help       = 'capture file (pcap) to replay, instead of synthetic packets'
+    )
+    parser.add_argument('-n',
+        dest       = 'numPackets',
+        type       = int,
+        default    = 10000,
+        help       = 'number of synthetic packets'
+    )
+    parser.add_argument('-s',
+        dest       = 'size',
+        type       = int,
+        default    = 100,
+        help       = 'size of the synthetic packets, in bytes'
+    )
+    parser.add_argument('--speed',
+        dest       = 'speed',
+        type       = float,
+        default    = None,
+        help       = 'replay the capture this much faster than captured; as fast as possible by default'
+    )
+    parser.add_argument('-o',
+        dest       = 'output',
+        default    = None,
+        help       = 'capture file (pcap) to record the packets written back to the interface to'
+    )
+    argspace = parser.parse_args()
+    
+    # build the pipeline
+    tun      = openTunSocket.OpenTunSocket()
+    lbr      = openLbr.OpenLbr()
+    lbr._setPrefix_notif(None,'networkPrefix',openTun.IPV6PREFIX)
+    sink     = MeshSink()
+    if argspace.output:
+        tun.startRecording(argspace.output)
+    
+    # inject
+    startTime = time.time()
+    if argspace.pcap:
+        numPackets = tun.replayPcap(argspace.pcap,argspace.speed)
+    else:
+        numPackets = argspace.numPackets
+        for p in makePackets(numPackets,argspace.size):
+            tun.inject(p)
+    
+    # wait for the last packets to cross the LBR
+    while True:
+        with sink.dataLock:
+            numToMesh = sink.numToMesh
+            lastTime  = sink.lastToMesh
+        if numToMesh>=numPackets or (time.time()-(lastTime or startTime))>1:
+            break
+        time.sleep(0.01)
+    duration = (lastTime or time.time())-startTime
+    
+    tun.close()
+    
+    print '{0} packets injected, {1} sent to the mesh, {2} written back, in {3:.2f}s: {4:.0f} packets/s'.format(
+        numPackets,
+        numToMesh,
+        tun.getStats()['numReceived'],
+        duration,
+        numToMesh/duration if duration else 0,
+    )
+
+if __name__=="__main__":
+    main()
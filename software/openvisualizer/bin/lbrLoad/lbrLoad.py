@@ -0,0 +1,268 @@
+#!/usr/bin/python
+
+import os
+import sys
+
+if __name__=='__main__':
+    here = sys.path[0]
+    # PyDispatcher-2.0.3/
+    sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))
+    # openvisualizer/
+    sys.path.insert(0, os.path.join(here, '..', '..'))
+
+import time
+import errno
+import heapq
+import socket
+import struct
+import threading
+from argparse import ArgumentParser
+
+from lbrClient import lbrClient
+from lbrClient import lbrServer
+from openTun   import IoLoop
+
+#============================ defines =========================================
+
+PAYLOAD_HEADER = struct.Struct('>IId') # client, sequence number, time sent
+DRAIN_PERIOD   = 0.001                 # s, how often to check for the last replies
+
+#============================ helpers =========================================
+
+class LoadClient(object):
+    '''
+    \brief One simulated client: connects and authenticates like lbrClient,
+        then sends packets at a fixed rate.
+    
+    Packets are sent from the main thread; replies are read, and backlogs
+    written, from an IoLoop shared by all the clients.
+    '''
+    
+    def __init__(self,index,lbrAddr,lbrPort,size,ioLoop):
+        self.index                = index
+        self.eui64                = [0x14,0x15,0x92,0x00,(index>>16)&0xff,(index>>8)&0xff,index&0xff,0x01]
+        self.padding              = [0x00]*max(0,size-PAYLOAD_HEADER.size)
+        self.ioLoop               = ioLoop
+        self.dataLock             = threading.Lock()
+        self.reader               = lbrClient.FrameReader()
+        self.txBuf                = bytearray()
+        self.waitingWrite         = False
+        self.numSent              = 0
+        self.latencies            = []    # s, of each packet received back
+        self.error                = None
+        
+        # connect and authenticate
+        self.sock                 = socket.create_connection((lbrAddr,lbrPort))
+        self.sock.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+        self.sock.sendall(lbrClient.formatFrame('S',chr(0))+lbrClient.formatFrame('N','lbrLoad'))
+        frames = []
+        while len(frames)<3:
+            received = self.reader.recvFrames(self.sock)
+            if received==None:
+                raise lbrClient.LbrClientException('LBR closed the connection during the handshake')
+            frames += received
+        if frames[0]!=bytearray('S'+chr(0)) or not frames[2].startswith('P'):
+            raise lbrClient.LbrClientException('Invalid handshake from LBR')
+        self.sock.setblocking(False)
+        self.fd                   = self.sock.fileno()
+        self.ioLoop.register(self.fd,self._readable)
+    
+    #======================== public ==========================================
+    
+    def send(self):
+        with self.dataLock:
+            if self.error:
+                raise self.error
+            payload       = PAYLOAD_HEADER.pack(self.index,self.numSent,time.time())
+            self.txBuf   += lbrClient.formatFrame(self.eui64,payload,self.padding)
+            self.numSent += 1
+            self._flush()
+    
+    def getNumReceived(self):
+        with self.dataLock:
+            if self.error:
+                raise self.error
+            return len(self.latencies)
+    
+    def close(self):
+        self.ioLoop.unregister(self.fd)
+        self.sock.close()
+    
+    #======================== private =========================================
+    
+    def _flush(self):
+        '''
+        \brief Write what the socket takes; called with dataLock held.
+        '''
+        try:
+            numBytes = self.sock.send(self.txBuf)
+        except socket.error as err:
+            if err.errno not in [errno.EAGAIN,errno.EWOULDBLOCK]:
+                raise
+            numBytes = 0
+        del self.txBuf[:numBytes]
+        
+        # only wait for the socket to be writable while there is a backlog
+        if bool(self.txBuf)!=self.waitingWrite:
+            self.waitingWrite = bool(self.txBuf)
+            self.ioLoop.register(
+                self.fd,
+                self._readable,
+                self._writable if self.waitingWrite else None,
+            )
+    
+    def _writable(self,fd):
+        with self.dataLock:
+            try:
+                self._flush()
+            except socket.error as err:
+                self._fail(err)
+    
+    def _readable(self,fd):
+        try:
+            frames = self.reader.recvFrames(self.sock)
+        except socket.error as err:
+            if err.errno in [errno.EAGAIN,errno.EWOULDBLOCK]:
+                return
+            with self.dataLock:
+                self._fail(err)
+            return
+        now = time.time()
+        with self.dataLock:
+            if frames==None:
+                self._fail(lbrClient.LbrClientException('LBR closed the connection'))
+                return
+            self.latencies += [now-PAYLOAD_HEADER.unpack_from(str(f),8)[2] for f in frames]
+    
+    def _fail(self,error):
+        '''
+        \brief Stop reading, and have the main thread raise the error; called
+            with dataLock held.
+        '''
+        self.error = error
+        self.ioLoop.unregister(self.fd)
+
+def percentile(sortedValues,p):
+    if not sortedValues:
+        return float('nan')
+    return sortedValues[min(len(sortedValues)-1,int(len(sortedValues)*p/100.0))]
+
+#============================ main ============================================
+
+def main():
+    
+    parser = ArgumentParser(
+        description = 'Load an LBR with packets from many simulated lbrClients, and measure throughput and latency.'
+    )
+    parser.add_argument('--lbr',
+        dest       = 'lbr',
+        default    = None,
+        help       = 'address:port of the LBR; by default, a local lbrServer is started'
+    )
+    parser.add_argument('--mode',
+        dest       = 'mode',
+        choices    = [lbrServer.LbrServer.MODE_ECHO,lbrServer.LbrServer.MODE_SINK],
+        default    = lbrServer.LbrServer.MODE_ECHO,
+        help       = 'whether the local lbrServer echoes the packets, needed for latency, or drops them'
+    )
+    parser.add_argument('-c',
+        dest       = 'numClients',
+        type       = int,
+        default    = 10,
+        help       = 'number of clients'
+    )
+    parser.add_argument('-r',
+        dest       = 'rate',
+        type       = float,
+        default    = 100,
+        help       = 'packets per second sent by each client'
+    )
+    parser.add_argument('-s',
+        dest       = 'size',
+        type       = int,
+        default    = 80,
+        help       = 'size of the 6LoWPAN packets, in bytes'
+    )
+    parser.add_argument('-t',
+        dest       = 'duration',
+        type       = float,
+        default    = 5,
+        help       = 'duration of the test, in seconds'
+    )
+    argspace = parser.parse_args()
+    
+    # the LBR
+    server   = None
+    if argspace.lbr:
+        (lbrAddr,lbrPort) = argspace.lbr.rsplit(':',1)
+        lbrPort  = int(lbrPort)
+    else:
+        server   = lbrServer.LbrServer(mode=argspace.mode)
+        (lbrAddr,lbrPort) = ('127.0.0.1',server.getPort())
+    
+    # the clients, sending in turn, reading from a single IoLoop
+    ioLoop   = IoLoop.IoLoop(name='lbrLoad')
+    clients  = [LoadClient(i,lbrAddr,lbrPort,argspace.size,ioLoop) for i in range(argspace.numClients)]
+    period   = 1.0/argspace.rate
+    start    = time.time()
+    schedule = [(start+period*i/len(clients),i) for i in range(len(clients))]
+    heapq.heapify(schedule)
+    
+    endTime   = start+argspace.duration
+    drainTime = endTime+1.0
+    while True:
+        now = time.time()
+        
+        # send what is due
+        while schedule and schedule[0][0]<=now:
+            (due,i) = heapq.heappop(schedule)
+            clients[i].send()
+            if due+period<endTime:
+                heapq.heappush(schedule,(due+period,i))
+        
+        if schedule:
+            # wait for the next packet to send
+            time.sleep(max(0,schedule[0][0]-time.time()))
+            continue
+        
+        # wait for the replies
+        numSent     = sum(c.numSent for c in clients)
+        if argspace.mode==lbrServer.LbrServer.MODE_SINK or now>drainTime:
+            break
+        if sum(c.getNumReceived() for c in clients)>=numSent:
+            break
+        time.sleep(DRAIN_PERIOD)
+    duration = time.time()-start
+    
+    # let a local sink count what is still on its way
+    if server and argspace.mode==lbrServer.LbrServer.MODE_SINK:
+        while server.getStats()['receivedPackets']<numSent and time.time()<drainTime:
+            time.sleep(0.01)
+        numReceived = server.getStats()['receivedPackets']
+    else:
+        numReceived = sum(c.getNumReceived() for c in clients)
+    
+    for c in clients:
+        c.close()
+    ioLoop.close()
+    ioLoop.join()
+    if server:
+        server.close()
+    
+    # report
+    latencies = sorted(l for c in clients for l in c.latencies)
+    print '{0} clients, {1} packets sent, {2} received, in {3:.2f}s: {4:.0f} packets/s, {5:.2f} Mbit/s'.format(
+        len(clients),
+        numSent,
+        numReceived,
+        duration,
+        numReceived/duration,
+        numReceived*(8+argspace.size)*8/duration/1e6,
+    )
+    if latencies:
+        print 'latency (ms): p50 {0:.2f}, p90 {1:.2f}, p99 {2:.2f}, max {3:.2f}'.format(
+            *[1000*percentile(latencies,p) for p in [50,90,99,100]]
+        )
+
+if __name__=="__main__":
+    main()
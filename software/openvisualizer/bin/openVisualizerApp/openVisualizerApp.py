@@ -30,12 +30,15 @@ top-level UI module.  See main() for startup use.
 import sys
 import os
 import logging
+import threading
 log = logging.getLogger('openVisualizerApp')
 
 from eventBus      import eventBusMonitor
 from moteProbe     import moteProbe
+from moteProbe     import PortWatcher
 from moteConnector import moteConnector
 from moteState     import moteState
+from moteState     import NetworkState
 from RPL           import RPL
 from openLbr       import openLbr
 from openTun       import openTun
@@ -50,7 +53,9 @@ class OpenVisualizerApp(object):
     OpenVisualizerApp provides a single location for common functionality.
     """
     
-    def __init__(self,appDir,fwDir,simulatorMode,numMotes,trace):
+    STARTUP_TIMEOUT = 10 # s, longest to wait for the motes plugged in at start
+    
+    def __init__(self,appDir,fwDir,simulatorMode,numMotes,trace,pcapng=None,pcapngSize=None):
         
         # store params
         self.appDir               = appDir
@@ -58,12 +63,17 @@ class OpenVisualizerApp(object):
         self.simulatorMode        = simulatorMode
         self.numMotes             = numMotes
         self.trace                = trace 
+        self.pcapng               = pcapng
+        self.pcapngSize           = pcapngSize
         
         # local variables
         self.eventBusMonitor      = eventBusMonitor.eventBusMonitor()
+        if self.pcapng:
+            self.eventBusMonitor.startMeshDebugCapture(self.pcapng,self.pcapngSize)
         self.openLbr              = openLbr.OpenLbr()
         self.rpl                  = RPL.RPL()
         self.topology             = topology.topology()
+        self.networkState         = NetworkState.NetworkState()
         self.udpLatency           = UDPLatency.UDPLatency()
         self.openTun              = openTun.create() # call last since indicates prefix
         if self.simulatorMode:
@@ -73,12 +83,24 @@ class OpenVisualizerApp(object):
             self.simengine.start()
         
         # create a moteProbe for each mote
+        self.serialIoLoop         = None
+        self.portWatcher          = None
+        self.motesLock            = threading.Lock()
         if not self.simulatorMode:
             # in "hardware" mode, motes are connected to the serial port
             
-            self.moteProbes       = [
-                moteProbe.moteProbe(serialport=sp) for sp in moteProbe.findSerialPorts()
-            ]
+            if os.name=='posix':
+                # a single thread reads all serial ports
+                from openTun import IoLoop
+                self.serialIoLoop = IoLoop.IoLoop(name='serialIoLoop')
+            
+            # motes are added and removed as they are plugged in and out
+            self.moteProbes       = []
+            self.moteConnectors   = []
+            self.moteStates       = []
+            self.portWatcher      = PortWatcher.PortWatcher(self._addMote,self._removeMote)
+            if not self.portWatcher.waitReady(self.STARTUP_TIMEOUT):
+                log.warning('serial ports still opening, their motes will show up later')
         else:
             # in "simulator" mode, motes are emulated
             import oos_openwsn
@@ -90,16 +112,16 @@ class OpenVisualizerApp(object):
                 moteHandler       = MoteHandler.MoteHandler(self.simengine,oos_openwsn.OpenMote())
                 self.simengine.indicateNewMote(moteHandler)
                 self.moteProbes  += [moteProbe.moteProbe(emulatedMote=moteHandler)]
-        
-        # create a moteConnector for each moteProbe
-        self.moteConnectors       = [
-            moteConnector.moteConnector(mp.getSerialPortName()) for mp in self.moteProbes
-        ]
-        
-        # create a moteState for each moteConnector
-        self.moteStates           = [
-            moteState.moteState(mc) for mc in self.moteConnectors
-        ]
+            
+            # create a moteConnector for each moteProbe
+            self.moteConnectors   = [
+                moteConnector.moteConnector(mp.getSerialPortName()) for mp in self.moteProbes
+            ]
+            
+            # create a moteState for each moteConnector
+            self.moteStates       = [
+                moteState.moteState(mc) for mc in self.moteConnectors
+            ]
         
         # boot all emulated motes, if applicable
         if self.simulatorMode:
@@ -129,10 +151,55 @@ class OpenVisualizerApp(object):
         log.info('Closing OpenVisualizer')
         self.openTun.close()
         self.rpl.close()
-        for probe in self.moteProbes:
+        self.eventBusMonitor.stopMeshDebugCapture()
+        if self.portWatcher:
+            self.portWatcher.close()
+        with self.motesLock:
+            probes = self.moteProbes[:]
+        for probe in probes:
             probe.close()
+        if self.serialIoLoop:
+            self.serialIoLoop.close()
     
        
+    #======================== private =========================================
+    
+    def _addMote(self,serialport):
+        """
+        Creates the moteProbe, moteConnector and moteState of a mote plugged
+        in. The lists are extended in place, so the GUI and the web server,
+        which hold them, see the new mote.
+        """
+        
+        probe     = moteProbe.moteProbe(serialport=serialport,ioLoop=self.serialIoLoop)
+        connector = moteConnector.moteConnector(probe.getSerialPortName())
+        state     = moteState.moteState(connector)
+        with self.motesLock:
+            self.moteProbes.append(probe)
+            self.moteConnectors.append(connector)
+            self.moteStates.append(state)
+    
+    def _removeMote(self,serialport):
+        """
+        Closes and forgets the moteProbe of a mote unplugged, and its
+        moteConnector and moteState, so that none of them stays subscribed to
+        the event bus, and removes the mote from the network state.
+        """
+        
+        with self.motesLock:
+            for (i,probe) in enumerate(self.moteProbes):
+                if probe.getSerialPortName()==serialport[0]:
+                    connector = self.moteConnectors.pop(i)
+                    state     = self.moteStates.pop(i)
+                    del self.moteProbes[i]
+                    break
+            else:
+                return
+        probe.close()
+        connector.close()
+        state.close()
+        self.networkState.removeMote(serialport[0])
+    
     #======================== GUI callbacks ===================================
 
 #============================ main ============================================
@@ -167,7 +234,8 @@ def main():
                          'fwDir    = {0}'.format(argspace.fwDir),
                          'sim      = {0}'.format(argspace.simulatorMode),
                          'simCount = {0}'.format(argspace.numMotes),
-                         'trace    = {0}'.format(argspace.trace)],
+                         'trace    = {0}'.format(argspace.trace),
+                         'pcapng   = {0}'.format(argspace.pcapng)],
             )))
         
     return OpenVisualizerApp(
@@ -175,7 +243,9 @@ def main():
         argspace.fwDir,
         argspace.simulatorMode,
         argspace.numMotes,
-        argspace.trace
+        argspace.trace,
+        argspace.pcapng,
+        argspace.pcapngSize*1024*1024 if argspace.pcapngSize else None,
     )    
 
 def _createCliParser():
@@ -219,4 +289,18 @@ def _createCliParser():
         help       = 'enables memory debugging'
     )
     
+    parser.add_argument( '--pcapng',
+        dest       = 'pcapng',
+        default    = None,
+        action     = 'store',
+        help       = 'capture mesh packets to this pcapng file or named pipe'
+    )
+    
+    parser.add_argument( '--pcapngSize',
+        dest       = 'pcapngSize',
+        type       = int,
+        default    = None,
+        help       = 'start a new capture file every so many MB'
+    )
+    
     return parser
@@ -99,6 +99,28 @@ class OpenVisualizerCli(Cmd):
                 except ValueError as err:
                     self.stdout.write(err)
                 
+    def do_serial(self, arg):
+        """
+        Prints the health of the serial links, of all motes or of one.
+        Usage: serial [serial-port]
+        """
+        for mp in self.app.moteProbes[:]:
+            stats = mp.getLinkStats()
+            if arg and stats['serialPort']!=arg:
+                continue
+            output  = ['{0}:'.format(stats['serialPort'])]
+            output += ['  in     {0} bytes, {1:.0f} bytes/s'.format(stats['numBytesIn'],stats['bytesInPerSec'])]
+            output += ['  out    {0} bytes, {1:.0f} bytes/s'.format(stats['numBytesOut'],stats['bytesOutPerSec'])]
+            output += ['  frames {0} ok, {1} CRC errors, {2} escape errors, {3} oversize'.format(
+                stats['numFramesOk'],
+                stats['numCrcErrors'],
+                stats['numEscapeErrors'],
+                stats['numOversizeFrames'],
+            )]
+            output += ['  gaps   {0}, longest {1:.1f}s'.format(stats['numFrameGaps'],stats['maxFrameGap'])]
+            self.stdout.write('\n'.join(output))
+            self.stdout.write('\n')
+    
     def help_all(self):
         """Lists first line of help for all documented commands"""
         names = self.get_names()
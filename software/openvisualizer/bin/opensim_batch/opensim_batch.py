@@ -0,0 +1,125 @@
+#!/usr/bin/python
+
+import os
+import sys
+
+if __name__=='__main__':
+    here = sys.path[0]
+    # PyDispatcher-2.0.3/
+    sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))
+    # software/
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))
+    # openvisualizer/
+    sys.path.insert(0, os.path.join(here, '..', '..'))
+    # location of openwsn module
+    sys.path.insert(0, os.path.join(here, '..', '..', '..', '..', '..', 'openwsn-fw', 'firmware','openos','projects','common'))
+
+import json
+import multiprocessing
+from argparse import ArgumentParser
+
+from SimEngine import BatchRunner
+
+#============================ helpers =========================================
+
+def parseValue(s):
+    '''
+    \brief Parse a value given on the command line, as JSON if possible.
+    '''
+    try:
+        return json.loads(s)
+    except ValueError:
+        return s
+
+def parseAssignment(s):
+    if '=' not in s:
+        raise ValueError('expected key=value, got "{0}"'.format(s))
+    (key,value) = s.split('=',1)
+    return (key,value)
+
+#============================ main ============================================
+
+def main():
+
+    parser = ArgumentParser(
+        description = 'Run simulations without TUN interface or user interface, and dump their statistics.'
+    )
+    parser.add_argument('-f',
+        dest       = 'fwDir',
+        default    = os.path.join('..', '..', '..', '..', '..', 'openwsn-fw'),
+        help       = 'firmware directory'
+    )
+    parser.add_argument('-s',
+        dest       = 'scenario',
+        default    = None,
+        help       = 'scenario file (JSON)'
+    )
+    parser.add_argument('--set',
+        dest       = 'overrides',
+        action     = 'append',
+        default    = [],
+        metavar    = 'KEY=VALUE',
+        help       = 'override a scenario parameter'
+    )
+    parser.add_argument('--sweep',
+        dest       = 'sweep',
+        action     = 'append',
+        default    = [],
+        metavar    = 'KEY=V1,V2,...',
+        help       = 'run the scenario once per value of a parameter; several sweeps are combined'
+    )
+    parser.add_argument('-j',
+        dest       = 'numWorkers',
+        type       = int,
+        default    = multiprocessing.cpu_count(),
+        help       = 'number of simulations to run in parallel'
+    )
+    parser.add_argument('-o',
+        dest       = 'output',
+        default    = None,
+        help       = 'file to write the statistics to (JSON)'
+    )
+    argspace = parser.parse_args()
+    
+    headerPath = os.path.join(argspace.fwDir,'firmware','openos','bsp','boards','python','openwsnmodule_obj.h')
+    
+    # build the scenarios
+    if argspace.scenario:
+        scenario = BatchRunner.loadScenario(argspace.scenario)
+    else:
+        scenario = BatchRunner.makeScenario()
+    overrides = {}
+    for (key,value) in [parseAssignment(s) for s in argspace.overrides]:
+        overrides[key] = parseValue(value)
+    scenario.update(overrides)
+    scenario  = BatchRunner.makeScenario(scenario)
+    sweep     = {}
+    for (key,values) in [parseAssignment(s) for s in argspace.sweep]:
+        sweep[key] = [parseValue(v) for v in values.split(',')]
+    scenarios = BatchRunner.expandSweep(scenario,sweep)
+    
+    # run them
+    if len(scenarios)==1:
+        results = [BatchRunner.runScenario(headerPath,scenarios[0])]
+    else:
+        results = BatchRunner.runSweep(headerPath,scenarios,argspace.numWorkers)
+    
+    # dump the statistics
+    for r in results:
+        print '{0} motes, {1}s simulated in {2:.1f}s: {3} events, {4} frames sent, {5} received, {6} collisions, {7:.3f}J {8}'.format(
+            r['numMotes'],
+            r['simulatedTime'],
+            r['wallTime'],
+            r['numEvents'],
+            r['numFramesSent'],
+            r['numFramesReceived'],
+            r['numCollisions'],
+            r['energy'],
+            ' '.join(['{0}={1}'.format(k,json.dumps(r['scenario'][k])) for k in sorted(sweep.keys())]),
+        ).rstrip()
+    if argspace.output:
+        with open(argspace.output,'w') as f:
+            json.dump(results,f,indent=4,sort_keys=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+
+import os
+import sys
+
+if __name__=='__main__':
+    here = sys.path[0]
+    # PyDispatcher-2.0.3/
+    sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))
+    # software/
+    sys.path.insert(0, os.path.join(here, '..', '..', '..'))
+    # openvisualizer/
+    sys.path.insert(0, os.path.join(here, '..', '..'))
+    # location of openwsn module
+    sys.path.insert(0, os.path.join(here, '..', '..', '..', '..', '..', 'openwsn-fw', 'firmware','openos','projects','common'))
+
+import time
+import multiprocessing
+from argparse import ArgumentParser
+
+from SimEngine import ParallelSimEngine
+
+#============================ main ============================================
+
+def main():
+
+    parser = ArgumentParser()
+    parser.add_argument('-f',
+        dest       = 'fwDir',
+        default    = os.path.join('..', '..', '..', '..', '..', 'openwsn-fw'),
+        help       = 'firmware directory'
+    )
+    parser.add_argument('-n',
+        dest       = 'numMotes',
+        type       = int,
+        default    = 10,
+        help       = 'number of motes'
+    )
+    parser.add_argument('-p',
+        dest       = 'numPartitions',
+        type       = int,
+        default    = multiprocessing.cpu_count(),
+        help       = 'number of partitions (processes)'
+    )
+    parser.add_argument('-t',
+        dest       = 'duration',
+        type       = float,
+        default    = 60,
+        help       = 'simulated time, in s'
+    )
+    argspace = parser.parse_args()
+    
+    engine = ParallelSimEngine.ParallelSimEngine(
+        os.path.join(argspace.fwDir,'firmware','openos','bsp','boards','python','openwsnmodule_obj.h'),
+        argspace.numMotes,
+        argspace.numPartitions,
+    )
+    
+    startTime = time.time()
+    engine.start()
+    engine.run(argspace.duration)
+    stats     = engine.stop()
+    
+    print 'simulated {0}s with {1} motes in {2} partitions in {3:.1f}s ({4} windows)'.format(
+        argspace.duration,
+        argspace.numMotes,
+        argspace.numPartitions,
+        time.time()-startTime,
+        engine.getNumWindows(),
+    )
+    for (partitionId,s) in enumerate(stats):
+        print ' - partition {0}: {1} motes, {2} events'.format(
+            partitionId,
+            s['numMotes'],
+            s['numEvents'],
+        )
+
+if __name__ == "__main__":
+    main()
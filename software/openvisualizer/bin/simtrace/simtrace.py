@@ -0,0 +1,109 @@
+#!/usr/bin/python
+
+import os
+import sys
+
+if __name__=='__main__':
+    here = sys.path[0]
+    # openvisualizer/
+    sys.path.insert(0, os.path.join(here, '..', '..'))
+
+import binascii
+from argparse import ArgumentParser
+
+from SimEngine import EventTrace
+
+#============================ helpers =========================================
+
+def formatRecord(record):
+    if record is None:
+        return '(end of trace)'
+    (atTime,moteId,desc,payload) = record
+    output = '{0:.6f} {1}: {2}'.format(atTime,moteId,desc)
+    if   isinstance(payload,str):
+        output += ' '+binascii.hexlify(payload)
+    elif payload is not None:
+        output += ' crc={0:08x}'.format(payload)
+    return output
+
+#============================ commands ========================================
+
+def dump(argspace):
+    for record in EventTrace.TraceReader(argspace.trace):
+        (atTime,moteId,_,_) = record
+        if argspace.moteId is not None and moteId!=argspace.moteId:
+            continue
+        if argspace.start is not None and atTime<argspace.start:
+            continue
+        if argspace.end is not None and atTime>argspace.end:
+            break
+        print formatRecord(record)
+
+def diff(argspace):
+    divergence = EventTrace.findDivergence(argspace.traceA,argspace.traceB)
+    if divergence is None:
+        print 'traces are identical'
+        return 0
+    
+    (index,recordA,recordB) = divergence
+    
+    # print the records leading to the divergence
+    print 'traces diverge at record {0}'.format(index)
+    for (i,record) in enumerate(EventTrace.TraceReader(argspace.traceA)):
+        if i>=index:
+            break
+        if i>=index-argspace.context:
+            print '  '+formatRecord(record)
+    print '< '+formatRecord(recordA)
+    print '> '+formatRecord(recordB)
+    return 1
+
+#============================ main ============================================
+
+def main():
+
+    parser     = ArgumentParser(description='Inspect simulation event traces.')
+    subparsers = parser.add_subparsers()
+    
+    dumpParser = subparsers.add_parser('dump',
+        help       = 'print the records of a trace'
+    )
+    dumpParser.add_argument('trace')
+    dumpParser.add_argument('-m',
+        dest       = 'moteId',
+        type       = int,
+        default    = None,
+        help       = 'only print the records of this mote'
+    )
+    dumpParser.add_argument('-s',
+        dest       = 'start',
+        type       = float,
+        default    = None,
+        help       = 'simulated time to start printing at, in s'
+    )
+    dumpParser.add_argument('-e',
+        dest       = 'end',
+        type       = float,
+        default    = None,
+        help       = 'simulated time to stop printing at, in s'
+    )
+    dumpParser.set_defaults(func=dump)
+    
+    diffParser = subparsers.add_parser('diff',
+        help       = 'find where two runs diverge'
+    )
+    diffParser.add_argument('traceA')
+    diffParser.add_argument('traceB')
+    diffParser.add_argument('-c',
+        dest       = 'context',
+        type       = int,
+        default    = 10,
+        help       = 'number of common records to print before the divergence'
+    )
+    diffParser.set_defaults(func=diff)
+    
+    argspace = parser.parse_args()
+    return argspace.func(argspace)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,6 +10,7 @@ import threading
 import Queue
 
 from pydispatch import dispatcher
+from pydispatch import errors
 
 class eventBusClient(object):
     
@@ -81,12 +82,30 @@ class eventBusClient(object):
         with self.dataLock:
             rem = None
             for s in self.registrations:
-                if self._signalsEquivalent(s, signal):
+                if (
+                        s['sender']==sender and
+                        s['signal']==signal and
+                        s['callback']==callback
+                    ):
                     rem=s
                     break
             if (rem!=None):
                 self.registrations.remove(rem) 
     
+    def unregisterAll(self):
+        '''
+        \brief Stop receiving any event, before this client is discarded.
+        '''
+        with self.dataLock:
+            self.registrations = []
+        try:
+            dispatcher.disconnect(
+                receiver = self._eventBusNotification,
+            )
+        except errors.DispatcherKeyError:
+            # already disconnected
+            pass
+    
     #======================== private =========================================
     
     def _eventBusNotification(self,signal,sender,data):
@@ -6,6 +6,7 @@ log = logging.getLogger('eventBusMonitor')
 log.setLevel(logging.ERROR)
 log.addHandler(NullHandler())
 
+import time
 import threading
 import copy
 import json
@@ -15,9 +16,13 @@ import openvisualizer_utils as u
 
 from pydispatch import dispatcher
 from openTun    import openTun
+from openTun    import pcapFile
 
 class eventBusMonitor(object):
     
+    CAPTURE_FLUSH_PERIOD = 1.0       # s, longest a captured frame waits in memory
+    CAPTURE_FLUSH_SIZE   = 64*1024   # bytes buffered which trigger a flush at once
+    
     def __init__(self):
         
         # log
@@ -29,6 +34,9 @@ class eventBusMonitor(object):
         self.dataLock             = threading.Lock()
         self.stats                = {}
         self.meshDebugEnabled     = False
+        self.meshDebugCapture     = None
+        self.captureFlusher       = None
+        self.captureEvent         = threading.Event()
         self.dagRootEui64         = [0x00]*8
         
         # give this instance a name
@@ -71,6 +79,52 @@ class eventBusMonitor(object):
         log.info('%s export of ZEP mesh debug packets to Internet',
                 'Enabled' if self.meshDebugEnabled else 'Disabled')
     
+    def startMeshDebugCapture(self,filename,maxFileSize=None):
+        '''
+        Starts writing a copy of mesh-bound messages, as 802.15.4 frames, to
+        a pcapng capture file or to a named pipe, e.g. one Wireshark reads.
+        Unlike the ZEP export, this does not go through the Internet
+        interface, and the frames are written in batches by a separate
+        thread, so the capture can be left on.
+        
+        \param filename    The capture file, or a named pipe.
+        \param maxFileSize The size, in bytes, above which the capture
+            continues in a new file; None to never rotate.
+        '''
+        self.stopMeshDebugCapture()
+        capture = pcapFile.PcapngWriter(
+            filename,
+            pcapFile.LINKTYPE_IEEE802_15_4_NOFCS,
+            maxFileSize = maxFileSize,
+        )
+        with self.dataLock:
+            self.captureEvent.clear()
+            self.meshDebugCapture = capture
+            self.captureFlusher   = threading.Thread(
+                target            = self._flushMeshDebugCapture,
+                args              = (capture,),
+                name              = 'eventBusMonitor_captureFlusher',
+            )
+            self.captureFlusher.setDaemon(True)
+            self.captureFlusher.start()
+        log.info('Started capture of mesh debug packets to %s',filename)
+    
+    def stopMeshDebugCapture(self):
+        '''
+        Stops the capture started by startMeshDebugCapture(), writing what
+        remains buffered.
+        '''
+        with self.dataLock:
+            (capture,flusher)     = (self.meshDebugCapture,self.captureFlusher)
+            self.meshDebugCapture = None
+            self.captureFlusher   = None
+        if not capture:
+            return
+        self.captureEvent.set()
+        flusher.join()
+        capture.close()
+        log.info('Stopped capture of mesh debug packets: %s',capture.getStats())
+    
     #======================== private =========================================
     
     def _eventBusNotification(self,signal,sender,data):
@@ -87,31 +141,80 @@ class eventBusMonitor(object):
         if signal=='infoDagRoot':
             self.dagRootEui64 = data['eui64'][:]
         
-        if signal=='fromMote.data' and self.meshDebugEnabled:
+        if signal=='fromMote.data' and (self.meshDebugEnabled or self.meshDebugCapture):
             (previousHop,lowpan) = data
             
+            self._exportMeshDebugPacket(previousHop, self.dagRootEui64, lowpan)
             
-            zep = self._wrapZepHeaders(previousHop, self.dagRootEui64, lowpan)
-            self._dispatchMeshDebugPacket(zep)
-            
-        if signal=='bytesToMesh' and self.meshDebugEnabled:
+        if signal=='bytesToMesh' and (self.meshDebugEnabled or self.meshDebugCapture):
             # Forwards a copy of the 6LoWPAN packet destined for the mesh 
-            # to the Internet interface for debugging.
+            # to the Internet interface, or to the capture, for debugging.
             (nextHop,lowpan) = data
             
-            zep = self._wrapZepHeaders(self.dagRootEui64,nextHop,lowpan)
-            self._dispatchMeshDebugPacket(zep)
+            self._exportMeshDebugPacket(self.dagRootEui64, nextHop, lowpan)
             
-    def _wrapZepHeaders(self, previousHop, nextHop, lowpan):
+    def _exportMeshDebugPacket(self, previousHop, nextHop, lowpan):
         '''
-        Returns Exegin ZEP protocol header and dummy 802.15.4 header 
-        wrapped around outgoing 6LoWPAN layer packet.
+        Sends a copy of a mesh packet to wherever mesh debug is enabled.
         '''
         
-        phop   = previousHop[:]
-        phop.reverse()
-        nhop   = nextHop[:]
-        nhop.reverse()
+        mac     = self._buildMacFrame(previousHop, nextHop, lowpan)
+        
+        capture = self.meshDebugCapture
+        if capture:
+            capture.write(mac, time.time())
+            if capture.getBuffered()>=self.CAPTURE_FLUSH_SIZE:
+                self.captureEvent.set()
+        
+        if self.meshDebugEnabled:
+            zep = self._wrapZepHeaders(mac, lowpan)
+            self._dispatchMeshDebugPacket(zep)
+    
+    def _flushMeshDebugCapture(self, capture):
+        '''
+        Writes the capture to file in batches, until it is stopped.
+        '''
+        
+        while True:
+            self.captureEvent.wait(self.CAPTURE_FLUSH_PERIOD)
+            self.captureEvent.clear()
+            if self.meshDebugCapture is not capture:
+                return
+            try:
+                capture.flush()
+            except (IOError,OSError) as err:
+                log.error('Stopping capture of mesh debug packets: %s',err)
+                with self.dataLock:
+                    if self.meshDebugCapture is capture:
+                        self.meshDebugCapture = None
+                        self.captureFlusher   = None
+                try:
+                    capture.close()
+                except (IOError,OSError):
+                    pass
+                return
+    
+    def _buildMacFrame(self, previousHop, nextHop, lowpan):
+        '''
+        Returns a dummy 802.15.4 data frame, without FCS, carrying the
+        6LoWPAN layer packet.
+        '''
+        
+        # IEEE802.15.4                 (data frame with dummy values)
+        mac    = [0x41,0xcc]           # frame control
+        mac   += [0x66]                # sequence number
+        mac   += [0xca,0xfe]           # destination PAN ID
+        mac   += nextHop[::-1]         # destination address
+        mac   += previousHop[::-1]     # source address
+        mac   += lowpan
+        
+        return mac
+    
+    def _wrapZepHeaders(self, mac, lowpan):
+        '''
+        Returns Exegin ZEP protocol header wrapped around the dummy 802.15.4
+        frame, with FCS, of an outgoing 6LoWPAN layer packet.
+        '''
         
         # ZEP
         zep    = [ord('E'),ord('X')]   # Protocol ID String
@@ -126,15 +229,8 @@ class eventBusMonitor(object):
         zep   += [0x00]*10             # reserved
         zep   += [21+len(lowpan)+2]    # length
         
-        # IEEE802.15.4                 (data frame with dummy values)
-        mac    = [0x41,0xcc]           # frame control
-        mac   += [0x66]                # sequence number
-        mac   += [0xca,0xfe]           # destination PAN ID
-        mac   += nhop                  # destination address
-        mac   += phop                  # source address
-        mac   += lowpan
         # CRC
-        mac   += u.calculateFCS(mac)
+        mac    = mac+u.calculateFCS(mac)
         
         return zep+mac
         
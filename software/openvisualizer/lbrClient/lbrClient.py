@@ -1,3 +1,21 @@
+'''
+\brief Client of a remote Low-power Border Router (LBR), reached over TCP.
+
+Every message, in both directions, is a frame: the length of its body, on 2
+bytes in network order, followed by the body. After connecting, the client
+and the LBR exchange:
+
+- ---S---> security capability, 'S' followed by a null byte,
+- <---S--- the same security capability,
+- ---N---> 'N' followed by the name of the network to join,
+- <---N--- 'N' followed by the name of the network joined,
+- <---P--- 'P' followed by the 8 bytes of the network prefix.
+
+From then on, each frame carries an EUI64 followed by a 6LoWPAN packet: to the
+LBR, the previous hop of a packet received from the mesh; from the LBR, the
+next hop of a packet to send to the mesh.
+'''
+
 import logging
 class NullHandler(logging.Handler):
     def emit(self, record):
@@ -7,28 +25,112 @@ log.setLevel(logging.DEBUG)
 log.addHandler(NullHandler())
 
 import copy
+import time
+import struct
 import socket
 import threading
-import traceback
-import sys
-import openvisualizer_utils as u
+import collections
 
-from pydispatch import dispatcher
 from eventBus import eventBusClient
 
+#============================ defines =========================================
+
+FRAME_HEADER     = struct.Struct('>H')
+MAX_FRAME_LENGTH = 0xffff
+
+class LbrClientException(Exception):
+    pass
+
+#============================ framing =========================================
+
+def formatFrame(*parts):
+    '''
+    \brief Build a frame.
+    
+    \param parts The body of the frame, in parts, each a string, a bytearray
+        or a list of bytes.
+    
+    \returns The frame, as a bytearray.
+    '''
+    frame  = bytearray(FRAME_HEADER.size)
+    for p in parts:
+        frame.extend(p)
+    length = len(frame)-FRAME_HEADER.size
+    if length>MAX_FRAME_LENGTH:
+        raise ValueError('frame too long ({0} bytes)'.format(length))
+    FRAME_HEADER.pack_into(frame,0,length)
+    return frame
+
+class FrameReader(object):
+    '''
+    \brief Split the byte stream received on a socket into frames.
+    
+    Data is received straight into a fixed buffer, which only keeps the start
+    of an incomplete frame between two receptions; all the frames completed
+    by a reception are returned at once.
+    '''
+    
+    BUFFER_SIZE          = 2*(FRAME_HEADER.size+MAX_FRAME_LENGTH)
+    
+    def __init__(self):
+        self.buffer               = bytearray(self.BUFFER_SIZE)
+        self.view                 = memoryview(self.buffer)
+        self.length               = 0
+    
+    def recvFrames(self,sock):
+        '''
+        \brief Receive what the socket has, waiting for data if needed.
+        
+        \returns The list of frames completed, each body as a bytearray; None
+            if the connection is closed.
+        '''
+        numBytes = sock.recv_into(self.view[self.length:])
+        if not numBytes:
+            return None
+        self.length += numBytes
+        
+        frames = []
+        start  = 0
+        while self.length-start>=FRAME_HEADER.size:
+            (length,) = FRAME_HEADER.unpack_from(self.buffer,start)
+            end       = start+FRAME_HEADER.size+length
+            if end>self.length:
+                break
+            frames   += [self.buffer[start+FRAME_HEADER.size:end]]
+            start     = end
+        
+        # keep the incomplete frame, if any, at the start of the buffer
+        if start:
+            self.buffer[:self.length-start] = self.buffer[start:self.length]
+            self.length -= start
+        
+        return frames
+
+#============================ main class ======================================
 
-class lbrClient(threading.Thread):
+class lbrClient(eventBusClient.eventBusClient):
+    '''
+    \brief Forwards the packets received from the mesh to a remote LBR, and
+        the packets received from it to the mesh.
+    
+    An I/O thread connects to the LBR, reconnects with an increasing delay
+    when the connection fails or drops, and receives from it. Packets to the
+    LBR are queued, and a sending thread writes everything queued in one go.
+    '''
     
     STATUS_DISCONNECTED      = 'disconnected'
     STATUS_CONNECTING        = 'connecting'
     STATUS_AUTHENTICATING    = 'authenticating'
     STATUS_CONNECTED         = 'connected'
     
-    AUTHTIMEOUT              = 5.0
+    AUTHTIMEOUT              = 5.0          # s
+    BACKOFF_MIN              = 1.0          # s, first delay before reconnecting
+    BACKOFF_MAX              = 60.0         # s
+    STABLE_PERIOD            = 60.0         # s connected before past failures are forgotten
+    TX_QUEUE_SIZE            = 1024*1024    # bytes queued at most
+    TX_BATCH_SIZE            = 64*1024      # bytes written at most at once
     
     def __init__(self):
-    
-        # store params
         
         # log
         log.debug("creating instance")
@@ -36,300 +138,396 @@ class lbrClient(threading.Thread):
         # local variables
         self.statsLock            = threading.Lock()
         self.stats                = {}
-        self.connectSem           = threading.Lock()
-        self.eventBusClient       = eventBusClient.eventBusClient(
-            name          = 'lbrClient',
-            signal        = 'fromMote.data.internet',
-            sender        = dispatcher.Any,
-            notifCallback = self.send,
-        )
+        self.connectCond          = threading.Condition()
+        self.connectParams        = None
+        self.connectGen           = 0
+        self.socket               = None
+        self.txCond               = threading.Condition()
+        self.txQueue              = collections.deque()
+        self.txQueueBytes         = 0
         
         # reset the statistics
         self._resetStats()
         
-        # acquire the connectSem, so the thread doesn't start listening
-        self.connectSem.acquire()
-        
         # initialize parent class
-        threading.Thread.__init__(self)
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name                  = 'lbrClient',
+            registrations         = [
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'fromMote.data',
+                    'callback'    : self._fromMoteData_notif,
+                },
+            ]
+        )
         
-        # give this thread a name
-        self.name            = 'lbrClient'
+        # start the threads
+        self.ioThread             = threading.Thread(
+            target                = self._ioRun,
+            name                  = 'lbrClient',
+        )
+        self.ioThread.setDaemon(True)
+        self.ioThread.start()
+        self.txThread             = threading.Thread(
+            target                = self._txRun,
+            name                  = 'lbrClient_tx',
+        )
+        self.txThread.setDaemon(True)
+        self.txThread.start()
     
-    def run(self):
-        try:
-            # log
-            log.debug("starting to run")
-            
-            #start the eventBusClient
-            self.eventBusClient.start()
-            
-            while True:
-                # reset the statistics
-                self._resetStats()
-                
-                # wait to be connected
-                self.connectSem.acquire()
-                self.connectSem.release()
-                
-                # log
-                log.debug("starting to listen for data")
-                
-                try:
-                    while True:
-                        
-                        # wait for some data
-                        input = self.socket.recv(4096)
-                        
-                        # disconnect if needed
-                        if not input:
-                            if self._isConnected():
-                                self.disconnect("No input.")
-                            break
-                        
-                        # increment statistics
-                        self._incrementStats('receivedPackets')
-                        self._incrementStats('receivedBytes', step=len(input))
-                        
-                        # handle received data
-                        # the data received from the LBR should be:
-                        # - first 8 bytes: EUI64 of the final destination
-                        # - remainder: 6LoWPAN packet and above
-                        if len(input)<8:
-                            log.error("received packet from LBR which is too short ({0} bytes)".format(len(input)))
-                            continue
-                        
-                        # dispatch the packet to network state to figure out source route.
-                        dispatcher.send(
-                            sender        = 'lbrClient',
-                            signal        = 'lowpanToMesh',
-                            data          = input,
-                        )
-                
-                except socket.error as err:
-                   
-                   # disconnect
-                   self.disconnect("socket error while listening: {0}".format(err))
-        except Exception as err:
-            errMsg=u.formatCrashMessage(self.name,err)
-            print errMsg
-            log.critical(errMsg)
-            sys.exit(1)
-            
-                    
-            
-            
     #======================== public ==========================================
     
     def connect(self,lbrAddr,lbrPort,netname):
+        '''
+        \brief Connect to an LBR, and stay connected until disconnect().
+        
+        This returns at once; getStats() tells how the connection goes.
+        '''
         
         # log
         log.debug("connecting to {2}@{0}:{1}".format(lbrAddr,lbrPort,netname))
         
-        #test source routing:
-        #self.timer = threading.Timer(20,self._testSourceRouting)
-        #self.timer.start()
-        
         # store connection params
         self._updateConnectParams(lbrAddr,lbrPort,netname)
         
-        # update status
-        self._updateStatus(self.STATUS_CONNECTING)
-        
-        # create TCP socket to connect to LBR
-        try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((self._getConnectParam('lbrAddr'),
-                                 self._getConnectParam('lbrPort')))
-        except socket.error:
-            
-            # disconnect
-            self.disconnect('Could not open socket to LBR@{0}:{1}'.format(
-                self._getConnectParam('lbrAddr'),
-                self._getConnectParam('lbrPort')))
-            
-            # abort connection
-            return
+        with self.connectCond:
+            self.connectParams    = (lbrAddr,lbrPort,netname)
+            self._newConnectGen()
+    
+    def disconnect(self,reason):
         
-        # update status
-        self._updateStatus(self.STATUS_AUTHENTICATING)
+        # log
+        log.info('disconnecting: {0}'.format(reason))
         
-        self.socket.settimeout(self.AUTHTIMEOUT) # listen for at most AUTHTIMEOUT seconds
+        with self.connectCond:
+            self.connectParams    = None
+            self._newConnectGen()
+            self._setDisconnected(reason)
+    
+    def send(self,lowpan,previousHop=[0]*8):
+        '''
+        \brief Queue a packet for the LBR.
+        
+        \param lowpan      The 6LoWPAN packet, as a list of bytes.
+        \param previousHop The EUI64 of the mote it comes from.
+        '''
+        numBytes = len(previousHop)+len(lowpan)
+        if self._isConnected():
+            frame = formatFrame(previousHop,lowpan)
+            with self.txCond:
+                if self.txQueueBytes+len(frame)<=self.TX_QUEUE_SIZE:
+                    self.txQueue.append(frame)
+                    self.txQueueBytes += len(frame)
+                    self.txCond.notify()
+                    return
+        
+        # increment statistics
+        self._incrementStats('packetsSentFailed')
+        self._incrementStats('bytesSentFailed', step=numBytes)
+    
+    def getStats(self):
+        with self.statsLock:
+            returnVal = copy.deepcopy(self.stats)
+        with self.txCond:
+            returnVal['txQueueBytes'] = self.txQueueBytes
         
-        # ---S---> send security capability
-        self.socket.send('S'+chr(0))
+        return returnVal
+    
+    def getPrefix(self):
+        with self.statsLock:
+            return self.stats['prefix']
+    
+    def close(self):
+        '''
+        \brief Disconnect, and stop the threads.
+        '''
+        self.disconnect('closed')
+        with self.connectCond:
+            self.goOn             = False
+            self.connectCond.notifyAll()
+        with self.txCond:
+            self.txCond.notifyAll()
+        self.ioThread.join()
+        self.txThread.join()
+    
+    #======================== private =========================================
+    
+    #===== eventBus
+    
+    def _fromMoteData_notif(self,sender,signal,data):
+        (previousHop,lowpan) = data
+        self.send(lowpan,previousHop)
+    
+    #===== I/O thread
+    
+    def _ioRun(self):
         
-        # <---S--- listen for (same) security capability
-        try:
-            input = self.socket.recv(4096)
-        except socket.timeout:
+        # log
+        log.debug("starting to run")
         
-            # disconnect
-            self.disconnect('Waited too long for security reply')
+        numFailures = 0
+        while True:
             
-            # abort connection
-            return
-        
-        if (len(input)!=2   or
-            input[0]  !='S' or
-            input[1]  !=chr(0)):
+            # wait to be asked to connect
+            with self.connectCond:
+                while self.goOn and not self.connectParams:
+                    self.connectCond.wait()
+                if not self.goOn:
+                    return
+                params     = self.connectParams
+                gen        = self.connectGen
             
-            # disconnect
-            self.disconnect('Incorrect security reply from LBR')
+            try:
+                (sock,reader,frames,prefix) = self._connect(params)
+            except LbrClientException as err:
+                with self.connectCond:
+                    if self.connectGen!=gen:
+                        # asked to disconnect or to connect elsewhere meanwhile
+                        self._updateStatus(self.STATUS_DISCONNECTED)
+                        continue
+                    
+                    # try again later, or at once if asked to connect elsewhere
+                    self._incrementStats('numConnectFailures')
+                    self._setDisconnected(str(err))
+                    delay        = self._getBackoff(numFailures)
+                    numFailures += 1
+                    log.warning('{0}, reconnecting in {1}s'.format(err,delay))
+                    self.connectCond.wait(delay)
+                continue
             
-            # abort connection
-            return
+            # connected, unless disconnect() was called meanwhile; holding the
+            # lock, so that it cannot be called before the status is updated
+            with self.connectCond:
+                if self.connectGen!=gen:
+                    sock.close()
+                    self._updateStatus(self.STATUS_DISCONNECTED)
+                    continue
+                self.socket  = sock
+                self._incrementStats('numConnects')
+                self._storePrefix(prefix)
+                self._updateStatus(self.STATUS_CONNECTED)
+            connectedSince   = time.time()
+            
+            # log
+            log.debug("starting to listen for data")
+            
+            reason = self._listen(sock,reader,frames)
+            
+            with self.connectCond:
+                self.socket  = None
+            sock.close()
+            
+            with self.connectCond:
+                if self.connectGen!=gen:
+                    continue
+                self._setDisconnected(reason)
+                
+                # dropped by the LBR: back off as well, in case it drops every
+                # connection right after the handshake
+                if time.time()-connectedSince>=self.STABLE_PERIOD:
+                    numFailures = 0
+                delay        = self._getBackoff(numFailures)
+                numFailures += 1
+                log.warning('{0}, reconnecting in {1}s'.format(reason,delay))
+                self.connectCond.wait(delay)
+    
+    def _connect(self,params):
+        '''
+        \brief Open a connection to the LBR, and authenticate.
         
-        # ---N---> send netname
-        self.socket.send('N'+self._getConnectParam('netname'))
+        \returns A (socket,reader,frames,prefix) tuple: the connected socket,
+            its FrameReader, the frames already received after the
+            handshake, and the network prefix.
+        '''
+        (lbrAddr,lbrPort,netname) = params
         
-        # <--N---- receive netname
+        # update status
+        self._updateStatus(self.STATUS_CONNECTING)
+        
+        # create TCP socket to connect to LBR
         try:
-            input = self.socket.recv(4096)
-        except socket.timeout:
-            
-            # disconnect
-            self.disconnect('Waited too long for netname')
-            
-            # abort connection
-            return
+            sock = socket.create_connection((lbrAddr,lbrPort),self.AUTHTIMEOUT)
+        except socket.error:
+            raise LbrClientException('Could not open socket to LBR@{0}:{1}'.format(lbrAddr,lbrPort))
         
-        # <---P--- listen for prefix
         try:
-            input = self.socket.recv(4096)
-        except socket.timeout:
+            sock.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+            reader = FrameReader()
+            frames = collections.deque()
             
-            # disconnect
-            self.disconnect('Waited too long for prefix')
+            # update status
+            self._updateStatus(self.STATUS_AUTHENTICATING)
             
-            # abort connection
-            return
-        #the packet should be at least size 20 which is P+prefix 
-        if (len(input) < 20 or input[0]!='P'):
+            # ---S---> send security capability
+            sock.sendall(formatFrame('S',chr(0)))
             
-            # disconnect
-            self.disconnect('Invalid prefix information from LBR')
+            # <---S--- listen for (same) security capability
+            if self._recvFrame(sock,reader,frames,'security reply')!=bytearray('S'+chr(0)):
+                raise LbrClientException('Incorrect security reply from LBR')
             
-            # abort connection
-            return
+            # ---N---> send netname
+            sock.sendall(formatFrame('N',netname))
             
-        # no socket timeout from now on
-        self.socket.settimeout(None)
-        
-        # record prefix
-        self._storePrefix(input[1:20])
-        
-        # update status
-        self._updateStatus(self.STATUS_CONNECTED)
-        
-     
-  
-  
-    def _testSourceRouting(self):
-        pkt=[]
-        #[0, 0, 0, 0, 0, 0, 0, 233]
-        pkt=[20, 21, 146, 9, 2, 44, 0, 216] #destination address
-        
-        #pkt=[0, 0, 0, 0, 0, 0, 0, 233]
-        
-        for i in range (50):
-            pkt.append(i)
+            # <--N---- receive netname
+            if not self._recvFrame(sock,reader,frames,'netname').startswith('N'):
+                raise LbrClientException('Invalid netname from LBR')
             
-        dispatcher.send(
-            sender      = 'lbrClient',
-            signal      = 'lowpanToMesh',
-            data        = pkt,
-        )
-        #start the timer again
-        #self.timer = threading.Timer(20,self._testSourceRouting)
-        #self.timer.start()
-              
-    def disconnect(self,reason):
+            # <---P--- listen for prefix
+            input = self._recvFrame(sock,reader,frames,'prefix')
+            if len(input)!=9 or not input.startswith('P'):
+                raise LbrClientException('Invalid prefix information from LBR')
+            
+            # no socket timeout from now on
+            sock.settimeout(None)
+        except (LbrClientException,socket.error) as err:
+            sock.close()
+            if isinstance(err,socket.error):
+                err = LbrClientException('socket error while connecting: {0}'.format(err))
+            raise err
+        
+        return (sock,reader,frames,list(input[1:]))
+    
+    def _recvFrame(self,sock,reader,frames,what):
+        while not frames:
+            try:
+                received = reader.recvFrames(sock)
+            except socket.timeout:
+                raise LbrClientException('Waited too long for {0}'.format(what))
+            if received==None:
+                raise LbrClientException('LBR closed the connection while waiting for {0}'.format(what))
+            frames.extend(received)
+        return frames.popleft()
+    
+    def _listen(self,sock,reader,frames):
+        '''
+        \brief Dispatch the frames received, until the connection drops.
         
-        # log
-        log.info('disconnecting: {0}'.format(reason))
+        \returns The reason it dropped.
+        '''
+        try:
+            while True:
+                for frame in frames:
+                    self._handleFrame(frame)
+                frames = reader.recvFrames(sock)
+                if frames==None:
+                    return 'LBR closed the connection'
+        except socket.error as err:
+            return 'socket error while listening: {0}'.format(err)
+    
+    def _handleFrame(self,frame):
         
-        # acquire te connectSem so the listening stops
-        if self._isConnected():
-            self.connectSem.acquire()
+        # increment statistics
+        self._incrementStats('receivedPackets')
+        self._incrementStats('receivedBytes', step=len(frame))
         
-        # reset the statistics (includes setting to disconnected)
-        self._resetStats(disconnectReason=reason)
+        # the data received from the LBR should be:
+        # - first 8 bytes: EUI64 of the next hop
+        # - remainder: 6LoWPAN packet and above
+        if len(frame)<8:
+            log.error("received packet from LBR which is too short ({0} bytes)".format(len(frame)))
+            return
         
-        # close the TCP session
-        self.socket.shutdown(socket.SHUT_RDWR)
-        self.socket.close()
+        self.dispatch(
+            signal        = 'bytesToMesh',
+            data          = (list(frame[:8]),list(frame[8:])),
+        )
     
-    # this is the callback executed by eventBusClient
-    def send(self,lowpan):
-        try:
-            if self._isConnected():
-                
-                # add 8 bytes of 0
-                lowpan = [0]*8 + lowpan
-                
-                # convert to string
-                lowpan = ''.join([chr(b) for b in lowpan])
-                printlowpan=''.join([str(b).encode("hex") for b in lowpan])
-                # send to LBR
-                self.socket.send(lowpan)
-                log.debug('packet sent to lbr: {}'.format(printlowpan))
-                #log.debug(lowpan)
-                # increment statistics
-                self._incrementStats('packetsSentOk')
-                self._incrementStats('bytesSentOk', step=len(lowpan))
-            
-            else:
-                # increment statistics
-                self._incrementStats('packetsSentFailed')
-                self._incrementStats('bytesSentFailed', step=len(lowpan))
-                
-        except socket.error as err:
-            log.error('socket error while sending: {0}'.format(err))
+    def _getBackoff(self,numFailures):
+        return min(self.BACKOFF_MAX,self.BACKOFF_MIN*2**numFailures)
     
-    def getStats(self):
-        self.statsLock.acquire()
-        returnVal = copy.deepcopy(self.stats)
-        self.statsLock.release()
-        
-        return returnVal
+    def _newConnectGen(self):
+        '''
+        \brief Drop the current connection, if any, and wake up the I/O
+            thread. Call with connectCond held.
+        '''
+        self.connectGen          += 1
+        if self.socket:
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        self.connectCond.notifyAll()
     
-    def getPrefix(self):
-        self.statsLock.acquire()
-        prefix = self.stats['prefix']
-        self.statsLock.release()
-        return prefix
+    #===== sending thread
     
-    #======================== private =========================================
+    def _txRun(self):
+        while True:
+            
+            # take what is queued, up to TX_BATCH_SIZE bytes
+            with self.txCond:
+                while self.goOn and not self.txQueue:
+                    self.txCond.wait()
+                if not self.goOn:
+                    return
+                batch      = bytearray()
+                numPackets = 0
+                while self.txQueue and len(batch)<self.TX_BATCH_SIZE:
+                    batch      += self.txQueue.popleft()
+                    numPackets += 1
+                self.txQueueBytes -= len(batch)
+            
+            # write it at once
+            numBytes = len(batch)-numPackets*FRAME_HEADER.size
+            with self.connectCond:
+                sock = self.socket
+            try:
+                if not sock:
+                    raise socket.error('not connected')
+                sock.sendall(batch)
+            except socket.error as err:
+                log.error('socket error while sending: {0}'.format(err))
+                self._incrementStats('packetsSentFailed', step=numPackets)
+                self._incrementStats('bytesSentFailed', step=numBytes)
+            else:
+                self._incrementStats('packetsSentOk', step=numPackets)
+                self._incrementStats('bytesSentOk', step=numBytes)
+    
+    def _dropTxQueue(self):
+        with self.txCond:
+            numPackets         = len(self.txQueue)
+            numBytes           = self.txQueueBytes-numPackets*FRAME_HEADER.size
+            self.txQueue.clear()
+            self.txQueueBytes  = 0
+        if numPackets:
+            self._incrementStats('packetsSentFailed', step=numPackets)
+            self._incrementStats('bytesSentFailed', step=numBytes)
     
     #===== stats handling
     
-    def _resetStats(self,disconnectReason=None):
+    def _resetStats(self):
         
         # log
         log.debug("resetting stats")
         
-        self.statsLock.acquire()
-        self.stats['disconnectReason']      = disconnectReason
-        self.stats['status']                = self.STATUS_DISCONNECTED
-        self.stats['lbrAddr']               = None
-        self.stats['lbrPort']               = None
-        self.stats['netname']               = None
-        self.stats['prefix']                = None
-        self.stats['packetsSentOk']         = 0
-        self.stats['bytesSentOk']           = 0
-        self.stats['packetsSentFailed']     = 0
-        self.stats['bytesSentFailed']       = 0
-        self.stats['receivedPackets']       = 0
-        self.stats['receivedBytes']         = 0
-        self.statsLock.release()
+        with self.statsLock:
+            self.stats['disconnectReason']      = None
+            self.stats['status']                = self.STATUS_DISCONNECTED
+            self.stats['lbrAddr']               = None
+            self.stats['lbrPort']               = None
+            self.stats['netname']               = None
+            self.stats['prefix']                = None
+            self.stats['connectedSince']        = None
+            self.stats['numConnects']           = 0
+            self.stats['numConnectFailures']    = 0
+            self.stats['packetsSentOk']         = 0
+            self.stats['bytesSentOk']           = 0
+            self.stats['packetsSentFailed']     = 0
+            self.stats['bytesSentFailed']       = 0
+            self.stats['receivedPackets']       = 0
+            self.stats['receivedBytes']         = 0
+    
+    def _setDisconnected(self,reason):
+        with self.statsLock:
+            self.stats['disconnectReason']      = reason
+            self.stats['status']                = self.STATUS_DISCONNECTED
+            self.stats['prefix']                = None
+            self.stats['connectedSince']        = None
+        self._dropTxQueue()
     
     def _isConnected(self):
-        self.statsLock.acquire()
-        returnVal = (self.stats['status']==self.STATUS_CONNECTED)
-        self.statsLock.release()
-        
-        return returnVal
+        with self.statsLock:
+            return self.stats['status']==self.STATUS_CONNECTED
     
     def _updateStatus(self,newStatus):
         assert (newStatus in [self.STATUS_DISCONNECTED,
@@ -337,50 +535,39 @@ class lbrClient(threading.Thread):
                               self.STATUS_AUTHENTICATING,
                               self.STATUS_CONNECTED])
         
-        self.statsLock.acquire()
-        self.stats['status'] = newStatus
-        if newStatus==self.STATUS_CONNECTED:
-            self.connectSem.release()
-        self.statsLock.release()
+        with self.statsLock:
+            self.stats['status'] = newStatus
+            if newStatus==self.STATUS_CONNECTED:
+                self.stats['disconnectReason']  = None
+                self.stats['connectedSince']    = time.time()
     
     def _incrementStats(self,statsName,step=1):
-        assert (statsName in ['packetsSentOk',
+        assert (statsName in ['numConnects',
+                              'numConnectFailures',
+                              'packetsSentOk',
                               'bytesSentOk',
                               'packetsSentFailed',
                               'bytesSentFailed',
                               'receivedPackets',
                               'receivedBytes'])
         
-        self.statsLock.acquire()
-        self.stats[statsName] += step
-        self.statsLock.release()
+        with self.statsLock:
+            self.stats[statsName] += step
     
     def _updateConnectParams(self,lbrAddr,lbrPort,netname):
         
-        self.statsLock.acquire()
-        self.stats['lbrAddr'] = lbrAddr
-        self.stats['lbrPort'] = lbrPort
-        self.stats['netname'] = netname
-        self.statsLock.release()
-    
-    def _getConnectParam(self,paramName):
-        assert (paramName in ['lbrAddr','lbrPort','netname'])
-        
-        self.statsLock.acquire()
-        returnVal = self.stats[paramName]
-        self.statsLock.release()
-        
-        return returnVal
+        with self.statsLock:
+            self.stats['lbrAddr'] = lbrAddr
+            self.stats['lbrPort'] = lbrPort
+            self.stats['netname'] = netname
     
     def _storePrefix(self,prefix):
         
-        self.statsLock.acquire()
-        self.stats['prefix'] = prefix
-        self.statsLock.release()
+        with self.statsLock:
+            self.stats['prefix'] = prefix
         
         # dispatch
-        dispatcher.send(
-            sender      = 'lbrClient',
+        self.dispatch(
             signal      = 'networkPrefix',
             data        = prefix,
         )
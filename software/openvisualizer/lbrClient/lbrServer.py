@@ -0,0 +1,209 @@
+'''
+\brief Stand-in for a remote LBR, speaking the protocol of lbrClient.
+
+It answers the handshake of any client, then either echoes the packets it
+receives back to their sender, or just counts them.
+'''
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('lbrServer')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+import errno
+import socket
+import threading
+
+import lbrClient
+from openTun import IoLoop
+
+#============================ defines =========================================
+
+DEFAULT_PREFIX = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00]
+
+#============================ helpers =========================================
+
+class LbrConnection(object):
+    '''
+    \brief The state of one client.
+    '''
+    
+    STATE_SECURITY       = 'security'
+    STATE_NETNAME        = 'netname'
+    STATE_CONNECTED      = 'connected'
+    
+    def __init__(self,sock):
+        self.sock                 = sock
+        self.fd                   = sock.fileno()
+        self.reader               = lbrClient.FrameReader()
+        self.state                = self.STATE_SECURITY
+        self.netname              = None
+        self.txBuf                = bytearray()
+        self.waitingWrite         = False
+
+#============================ main class ======================================
+
+class LbrServer(object):
+    '''
+    \brief Serves any number of clients from a single thread.
+    
+    The thread is an IoLoop, which is not limited to FD_SETSIZE clients as
+    select() is.
+    '''
+    
+    MODE_ECHO            = 'echo'
+    MODE_SINK            = 'sink'
+    
+    def __init__(self,host='127.0.0.1',port=0,prefix=DEFAULT_PREFIX,mode=MODE_ECHO):
+        '''
+        \param host   The address to listen on.
+        \param port   The TCP port to listen on; 0 picks a free one, see
+            getPort().
+        \param prefix The network prefix given to clients, 8 bytes.
+        \param mode   MODE_ECHO to send every packet back to its sender,
+            MODE_SINK to drop them.
+        '''
+        assert mode in [self.MODE_ECHO,self.MODE_SINK]
+        assert len(prefix)==8
+        
+        # log
+        log.debug("create instance")
+        
+        # store params
+        self.prefix               = prefix
+        self.mode                 = mode
+        
+        # local variables
+        self.statsLock            = threading.Lock()
+        self.conns                = {}    # {fd: LbrConnection}
+        self.numConnections       = 0
+        self.receivedPackets      = 0
+        self.receivedBytes        = 0
+        self.sentPackets          = 0
+        self.listenSock           = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
+        self.listenSock.setsockopt(socket.SOL_SOCKET,socket.SO_REUSEADDR,1)
+        self.listenSock.bind((host,port))
+        self.listenSock.listen(128)
+        self.listenSock.setblocking(False)
+        
+        # serve from an IoLoop
+        self.ioLoop               = IoLoop.IoLoop(name='LbrServer')
+        self.ioLoop.register(self.listenSock.fileno(),self._accept)
+    
+    #======================== public ==========================================
+    
+    def getPort(self):
+        return self.listenSock.getsockname()[1]
+    
+    def getStats(self):
+        with self.statsLock:
+            return {
+                'numClients':        len(self.conns),
+                'numConnections':    self.numConnections,
+                'receivedPackets':   self.receivedPackets,
+                'receivedBytes':     self.receivedBytes,
+                'sentPackets':       self.sentPackets,
+            }
+    
+    def close(self):
+        self.ioLoop.close()
+        self.ioLoop.join()
+        for conn in self.conns.values():
+            conn.sock.close()
+        self.listenSock.close()
+    
+    #======================== private =========================================
+    
+    def _accept(self,fd):
+        try:
+            (sock,addr) = self.listenSock.accept()
+        except socket.error as err:
+            if err.errno in [errno.EAGAIN,errno.EWOULDBLOCK]:
+                return
+            raise
+        log.debug('new client {0}'.format(addr))
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+        conn = LbrConnection(sock)
+        with self.statsLock:
+            self.conns[conn.fd] = conn
+            self.numConnections += 1
+        self.ioLoop.register(conn.fd,self._receive)
+    
+    def _receive(self,fd):
+        conn = self.conns.get(fd)
+        if not conn:
+            return
+        try:
+            frames = conn.reader.recvFrames(conn.sock)
+        except socket.error as err:
+            if err.errno in [errno.EAGAIN,errno.EWOULDBLOCK]:
+                return
+            log.warning('socket error: {0}'.format(err))
+            frames = None
+        if frames==None:
+            self._drop(conn)
+            return
+        
+        numPackets = 0
+        numBytes   = 0
+        for frame in frames:
+            if conn.state==LbrConnection.STATE_CONNECTED:
+                numPackets += 1
+                numBytes   += len(frame)
+                if self.mode==self.MODE_ECHO:
+                    conn.txBuf += lbrClient.formatFrame(frame)
+            elif conn.state==LbrConnection.STATE_SECURITY:
+                # <---S--- security capability, same as asked
+                conn.txBuf += lbrClient.formatFrame(frame)
+                conn.state  = LbrConnection.STATE_NETNAME
+            else:
+                # <---N--- netname, <---P--- prefix
+                conn.netname = str(frame[1:])
+                conn.txBuf  += lbrClient.formatFrame(frame)
+                conn.txBuf  += lbrClient.formatFrame('P',self.prefix)
+                conn.state   = LbrConnection.STATE_CONNECTED
+        
+        with self.statsLock:
+            self.receivedPackets += numPackets
+            self.receivedBytes   += numBytes
+            if self.mode==self.MODE_ECHO:
+                self.sentPackets += numPackets
+        
+        self._flush(conn)
+    
+    def _writable(self,fd):
+        conn = self.conns.get(fd)
+        if conn:
+            self._flush(conn)
+    
+    def _flush(self,conn):
+        if conn.txBuf:
+            try:
+                numBytes = conn.sock.send(conn.txBuf)
+            except socket.error as err:
+                if err.errno not in [errno.EAGAIN,errno.EWOULDBLOCK]:
+                    log.warning('socket error: {0}'.format(err))
+                    self._drop(conn)
+                    return
+                numBytes = 0
+            del conn.txBuf[:numBytes]
+        
+        # only wait for the socket to be writable while there is a backlog
+        if bool(conn.txBuf)!=conn.waitingWrite:
+            conn.waitingWrite = bool(conn.txBuf)
+            self.ioLoop.register(
+                conn.fd,
+                self._receive,
+                self._writable if conn.waitingWrite else None,
+            )
+    
+    def _drop(self,conn):
+        log.debug('client left')
+        self.ioLoop.unregister(conn.fd)
+        with self.statsLock:
+            del self.conns[conn.fd]
+        conn.sock.close()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                                   # lbrClient/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import gc
+import time
+import Queue
+import socket
+import threading
+
+import pytest
+
+import lbrClient
+from eventBus import eventBusClient
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_lbrClient.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_lbrClient')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_lbrClient',
+                   'lbrClient',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT = 2 # s
+
+PREFIX  = [0xbb,0xbb,0x00,0x00,0x00,0x00,0x00,0x00]
+MOTE    = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x02]
+
+#============================ helpers =========================================
+
+class FakeLbr(object):
+    '''
+    \brief Accepts connections, answers the handshake, and collects the
+        frames received.
+    '''
+    def __init__(self):
+        self.listenSock = socket.socket()
+        self.listenSock.bind(('127.0.0.1',0))
+        self.listenSock.listen(5)
+        self.port       = self.listenSock.getsockname()[1]
+        self.conns      = Queue.Queue()
+        self.received   = Queue.Queue()
+        self.dropConns  = False
+        t = threading.Thread(target=self._accept)
+        t.setDaemon(True)
+        t.start()
+    def _accept(self):
+        while True:
+            try:
+                (conn,addr) = self.listenSock.accept()
+            except socket.error:
+                return
+            t = threading.Thread(target=self._serve,args=(conn,))
+            t.setDaemon(True)
+            t.start()
+    def _serve(self,conn):
+        reader = lbrClient.FrameReader()
+        frames = []
+        def nextFrame():
+            while not frames:
+                received = reader.recvFrames(conn)
+                if received==None:
+                    return None
+                frames.extend(received)
+            return frames.pop(0)
+        assert nextFrame()==bytearray('S\x00')
+        conn.sendall(lbrClient.formatFrame('S\x00'))
+        netname = nextFrame()
+        conn.sendall(lbrClient.formatFrame(netname)+lbrClient.formatFrame('P',PREFIX))
+        self.conns.put(conn)
+        if self.dropConns:
+            conn.close()
+            return
+        while True:
+            try:
+                frame = nextFrame()
+            except socket.error:
+                return
+            if frame==None:
+                return
+            self.received.put(frame)
+    def close(self):
+        # wakes up accept(), which close() alone does not
+        try:
+            self.listenSock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.listenSock.close()
+
+class MeshSink(eventBusClient.eventBusClient):
+    def __init__(self):
+        self.received = Queue.Queue()
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name                  = 'MeshSink',
+            registrations         = [
+                {
+                    'sender'      : 'lbrClient',
+                    'signal'      : self.WILDCARD,
+                    'callback'    : self._lbrClient_notif,
+                },
+            ]
+        )
+    def _lbrClient_notif(self,sender,signal,data):
+        self.received.put((signal,data))
+
+def waitFor(condition):
+    startTime = time.time()
+    while not condition():
+        if time.time()-startTime>TIMEOUT:
+            return False
+        time.sleep(0.01)
+    return True
+
+@pytest.fixture
+def client(request):
+    gc.collect()
+    returnVal = lbrClient.lbrClient()
+    request.addfinalizer(returnVal.close)
+    return returnVal
+
+@pytest.fixture
+def lbr(request):
+    returnVal = FakeLbr()
+    request.addfinalizer(returnVal.close)
+    return returnVal
+
+#============================ tests ===========================================
+
+def test_frameReader():
+
+    log.debug("\n---------- test_frameReader")
+    
+    (a,b)  = socket.socketpair()
+    reader = lbrClient.FrameReader()
+    stream = ''.join(str(lbrClient.formatFrame([i]*i)) for i in range(1,6))
+    
+    # frames split across receptions, and several frames in one
+    for chunk in [stream[:1],stream[1:4],stream[4:12],stream[12:]]:
+        b.sendall(chunk)
+        time.sleep(0.01)
+        frames = reader.recvFrames(a)
+        if   chunk==stream[:1]:
+            assert frames==[]
+        elif chunk==stream[1:4]:
+            assert frames==[bytearray([1])]
+        elif chunk==stream[4:12]:
+            assert frames==[bytearray([2,2]),bytearray([3,3,3])]
+        else:
+            assert frames==[bytearray([4]*4),bytearray([5]*5)]
+    
+    # closed connection
+    b.close()
+    assert reader.recvFrames(a)==None
+    a.close()
+
+def test_connect(client,lbr):
+
+    log.debug("\n---------- test_connect")
+    
+    sink   = MeshSink()
+    sender = eventBusClient.eventBusClient('test_connect',[])
+    
+    # handshake, then the prefix is announced
+    client.connect('127.0.0.1',lbr.port,'testnet')
+    assert sink.received.get(timeout=TIMEOUT)==('networkPrefix',PREFIX)
+    assert waitFor(lambda: client.getStats()['status']==client.STATUS_CONNECTED)
+    assert client.getPrefix()==PREFIX
+    
+    # packets from the mesh go to the LBR
+    for i in range(20):
+        sender.dispatch('fromMote.data',(MOTE,[i]*10))
+    for i in range(20):
+        assert lbr.received.get(timeout=TIMEOUT)==bytearray(MOTE+[i]*10)
+    assert waitFor(lambda: client.getStats()['packetsSentOk']==20)
+    assert client.getStats()['bytesSentOk']==20*18
+    
+    # packets from the LBR, coalesced in one write, all go to the mesh
+    conn = lbr.conns.get(timeout=TIMEOUT)
+    conn.sendall(''.join(str(lbrClient.formatFrame(MOTE,[i]*10)) for i in range(20)))
+    for i in range(20):
+        assert sink.received.get(timeout=TIMEOUT)==('bytesToMesh',(MOTE,[i]*10))
+    assert client.getStats()['receivedPackets']==20
+
+def test_reconnect(client,lbr,monkeypatch):
+
+    log.debug("\n---------- test_reconnect")
+    
+    monkeypatch.setattr(client,'BACKOFF_MIN',0.05)
+    
+    # the connection drops, and is reopened shortly
+    client.connect('127.0.0.1',lbr.port,'testnet')
+    conn = lbr.conns.get(timeout=TIMEOUT)
+    conn.shutdown(socket.SHUT_RDWR)
+    conn.close()
+    conn = lbr.conns.get(timeout=TIMEOUT)
+    assert waitFor(lambda: client.getStats()['numConnects']==2)
+    
+    # the LBR goes away: the client keeps trying, less and less often
+    lbr.close()
+    conn.shutdown(socket.SHUT_RDWR)
+    conn.close()
+    assert waitFor(lambda: client.getStats()['numConnectFailures']>=2)
+    stats = client.getStats()
+    assert stats['status']==client.STATUS_DISCONNECTED
+    assert stats['disconnectReason'].startswith('Could not open socket')
+    
+    # nothing is sent while disconnected
+    client.send([1,2,3])
+    assert client.getStats()['packetsSentFailed']==1
+    
+    # until asked to disconnect
+    client.disconnect('done')
+    numFailures = client.getStats()['numConnectFailures']
+    time.sleep(0.3)
+    assert client.getStats()['numConnectFailures']==numFailures
+    assert client.getStats()['disconnectReason']=='done'
+
+def test_dropAfterHandshake(client,lbr,monkeypatch):
+
+    log.debug("\n---------- test_dropAfterHandshake")
+    
+    monkeypatch.setattr(client,'BACKOFF_MIN',0.1)
+    
+    # an LBR dropping every connection right after the handshake is not
+    # reconnected to in a loop
+    lbr.dropConns = True
+    client.connect('127.0.0.1',lbr.port,'testnet')
+    time.sleep(0.5)
+    assert 2<=client.getStats()['numConnects']<=4
+
+def test_disconnectWhileConnecting(client,lbr,monkeypatch):
+
+    log.debug("\n---------- test_disconnectWhileConnecting")
+    
+    # disconnect() called as the connection completes wins
+    storePrefix = client._storePrefix
+    def slowStorePrefix(prefix):
+        t = threading.Thread(target=client.disconnect,args=('done',))
+        t.setDaemon(True)
+        t.start()
+        time.sleep(0.1)
+        storePrefix(prefix)
+    monkeypatch.setattr(client,'_storePrefix',slowStorePrefix)
+    client.connect('127.0.0.1',lbr.port,'testnet')
+    lbr.conns.get(timeout=TIMEOUT)
+    assert waitFor(lambda: client.getStats()['disconnectReason']=='done')
+    time.sleep(0.2)
+    stats = client.getStats()
+    assert stats['status']==client.STATUS_DISCONNECTED
+    assert stats['prefix']==None
+    assert stats['disconnectReason']=='done'
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                                   # lbrClient/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import gc
+import time
+import Queue
+import socket
+
+import pytest
+
+import lbrClient
+import lbrServer
+from eventBus import eventBusClient
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_lbrServer.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_lbrServer')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_lbrServer',
+                   'lbrServer',
+                   'lbrClient',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT = 2 # s
+
+FD_SETSIZE = 1024 # the most file descriptors select() can wait on
+
+MOTE    = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x02]
+
+#============================ helpers =========================================
+
+class MeshSink(eventBusClient.eventBusClient):
+    def __init__(self):
+        self.received = Queue.Queue()
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name                  = 'MeshSink',
+            registrations         = [
+                {
+                    'sender'      : 'lbrClient',
+                    'signal'      : 'bytesToMesh',
+                    'callback'    : self._bytesToMesh_notif,
+                },
+            ]
+        )
+    def _bytesToMesh_notif(self,sender,signal,data):
+        self.received.put(data)
+
+def waitFor(condition):
+    startTime = time.time()
+    while not condition():
+        if time.time()-startTime>TIMEOUT:
+            return False
+        time.sleep(0.01)
+    return True
+
+def makeServer(request,mode):
+    gc.collect()
+    server = lbrServer.LbrServer(mode=mode)
+    client = lbrClient.lbrClient()
+    def fin():
+        client.close()
+        server.close()
+    request.addfinalizer(fin)
+    client.connect('127.0.0.1',server.getPort(),'testnet')
+    assert waitFor(lambda: client.getStats()['status']==client.STATUS_CONNECTED)
+    return (server,client)
+
+#============================ tests ===========================================
+
+def test_echo(request):
+
+    log.debug("\n---------- test_echo")
+    
+    (server,client) = makeServer(request,lbrServer.LbrServer.MODE_ECHO)
+    sink   = MeshSink()
+    sender = eventBusClient.eventBusClient('test_echo',[])
+    
+    # the handshake gives the prefix
+    assert client.getPrefix()==lbrServer.DEFAULT_PREFIX
+    
+    # packets from the mesh come back, to the mote they came from
+    for i in range(50):
+        sender.dispatch('fromMote.data',(MOTE,[i]*(i+1)))
+    for i in range(50):
+        assert sink.received.get(timeout=TIMEOUT)==(MOTE,[i]*(i+1))
+    stats = server.getStats()
+    assert stats['receivedPackets']==stats['sentPackets']==50
+    assert stats['numClients']==1
+
+def test_sink(request):
+
+    log.debug("\n---------- test_sink")
+    
+    (server,client) = makeServer(request,lbrServer.LbrServer.MODE_SINK)
+    sink   = MeshSink()
+    
+    # packets are counted, and dropped
+    for i in range(50):
+        client.send([i]*10,MOTE)
+    assert waitFor(lambda: server.getStats()['receivedPackets']==50)
+    assert server.getStats()['receivedBytes']==50*18
+    assert sink.received.empty()
+    
+    # the server notices the client leaving
+    client.disconnect('done')
+    assert waitFor(lambda: server.getStats()['numClients']==0)
+    assert server.getStats()['numConnections']==1
+
+def test_manyClients(request):
+
+    log.debug("\n---------- test_manyClients")
+    
+    try:
+        import resource
+    except ImportError:
+        pytest.skip('no file descriptor limit to raise on this system')
+    numClients = FD_SETSIZE+100
+    (soft,hard) = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft<2*numClients+100:
+        if hard!=resource.RLIM_INFINITY and hard<2*numClients+100:
+            pytest.skip('not allowed to open {0} sockets'.format(2*numClients))
+        resource.setrlimit(resource.RLIMIT_NOFILE,(2*numClients+100,hard))
+        request.addfinalizer(lambda: resource.setrlimit(resource.RLIMIT_NOFILE,(soft,hard)))
+    
+    server  = lbrServer.LbrServer(mode=lbrServer.LbrServer.MODE_ECHO)
+    socks   = []
+    def fin():
+        for sock in socks:
+            sock.close()
+        server.close()
+    request.addfinalizer(fin)
+    
+    # more clients than select() could wait on all go through the handshake
+    handshake = lbrClient.formatFrame('S',chr(0))+lbrClient.formatFrame('N','testnet')
+    for _ in range(numClients):
+        sock = socket.create_connection(('127.0.0.1',server.getPort()))
+        sock.settimeout(TIMEOUT)
+        sock.sendall(handshake)
+        socks += [sock]
+    for sock in [socks[0],socks[-1]]:
+        reader = lbrClient.FrameReader()
+        frames = []
+        while len(frames)<3:
+            frames += reader.recvFrames(sock)
+        assert frames[2]==bytearray('P')+bytearray(lbrServer.DEFAULT_PREFIX)
+        
+        # and get their packets echoed
+        sock.sendall(lbrClient.formatFrame(MOTE,[0x01]))
+        assert reader.recvFrames(sock)==[bytearray(MOTE+[0x01])]
+    assert waitFor(lambda: server.getStats()['numClients']==numClients)
@@ -13,6 +13,7 @@ import sys
 import openvisualizer_utils as u
 
 from pydispatch import dispatcher
+from pydispatch import errors
 
 from eventBus      import eventBusClient
 from moteState     import moteState
@@ -142,8 +143,23 @@ class moteConnector(eventBusClient.eventBusClient):
             dataToSend = [OpenParser.OpenParser.SERFRAME_PC2MOTE_DATA]+nextHop+lowpan,
         )
     
+    def close(self):
+        '''
+        \brief Stop parsing the bytes of the moteProbe, and receiving any
+            event, e.g. when the mote is unplugged.
+        '''
+        try:
+            dispatcher.disconnect(
+                self._sendToParser,
+                signal = 'fromMoteProbe@'+self.serialport,
+            )
+        except errors.DispatcherKeyError:
+            # already closed
+            pass
+        self.unregisterAll()
+    
     def quit(self):
-        raise NotImplementedError()
+        self.close()
     
     #======================== private =========================================
     
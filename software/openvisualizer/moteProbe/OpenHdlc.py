@@ -17,6 +17,12 @@ import openvisualizer_utils as u
 class HdlcException(Exception):
     pass
 
+class HdlcCrcException(HdlcException):
+    pass
+
+class HdlcEscapeException(HdlcException):
+    pass
+
 class OpenHdlc(object):
     
     HDLC_FLAG              = '\x7e'
@@ -108,20 +114,28 @@ class OpenHdlc(object):
         outBuf     = outBuf[1:-1]
         log.debug("after flags:     {0}".format(u.formatStringBuf(outBuf)))
         
+        # every escape byte must start one of the two escape sequences
+        numEscapes = outBuf.count(self.HDLC_ESCAPE)
+        if numEscapes and numEscapes!=(
+                outBuf.count(self.HDLC_ESCAPE+self.HDLC_FLAG_ESCAPED)+
+                outBuf.count(self.HDLC_ESCAPE+self.HDLC_ESCAPE_ESCAPED)
+            ):
+            raise HdlcEscapeException('invalid escape sequence')
+        
         # unstuff
         outBuf     = outBuf.replace(self.HDLC_ESCAPE+self.HDLC_FLAG_ESCAPED,   self.HDLC_FLAG)
         outBuf     = outBuf.replace(self.HDLC_ESCAPE+self.HDLC_ESCAPE_ESCAPED, self.HDLC_ESCAPE)
         log.debug("after unstuff:   {0}".format(u.formatStringBuf(outBuf)))
         
         if len(outBuf)<2:
-            raise HdlcException('packet too short')
+            raise HdlcCrcException('packet too short')
         
         # check CRC
         crc        = self.HDLC_CRCINIT
         for b in outBuf:
             crc    = self._crcIteration(crc,b)
         if crc!=self.HDLC_CRCGOOD:
-           raise HdlcException('wrong CRC')
+           raise HdlcCrcException('wrong CRC')
         
         # remove CRC
         outBuf     = outBuf[:-2] # remove CRC
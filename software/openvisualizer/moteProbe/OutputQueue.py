@@ -0,0 +1,118 @@
+'''
+\brief Queue of the HDLC frames waiting to be written to a mote.
+'''
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('OutputQueue')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+import time
+import threading
+import collections
+
+class OutputQueue(object):
+    '''
+    \brief Bounded queues, one per priority, of the frames to write to a
+        mote.
+    
+    Frames are taken highest priority first, and in order within a
+    priority. A frame put in a full queue is dropped, and so is a frame
+    longer than MAX_BUDGET, which no mote could ever take.
+    '''
+    
+    PRIORITY_CONTROL     = 0
+    PRIORITY_DATA        = 1
+    PRIORITIES           = [PRIORITY_CONTROL,PRIORITY_DATA]
+    
+    MAX_QUEUED           = {
+        PRIORITY_CONTROL : 32,   # frames
+        PRIORITY_DATA    : 128,  # frames
+    }
+    NUM_SAMPLES          = 1000  # queue times kept for the percentiles
+    MAX_BUDGET           = 0xffff # bytes, the most a mote can ask for, on 2 bytes
+    
+    def __init__(self):
+        
+        # local variables
+        self.dataLock             = threading.Lock()
+        self.queues               = dict((p,collections.deque()) for p in self.PRIORITIES)
+        self.queueTimes           = collections.deque(maxlen=self.NUM_SAMPLES)
+        self.numSent              = 0
+        self.numDropped           = dict((p,0) for p in self.PRIORITIES)
+    
+    #======================== public ==========================================
+    
+    def put(self,frame,priority):
+        '''
+        \brief Queue a frame.
+        
+        \returns True if the frame was queued, False if it was dropped.
+        '''
+        if len(frame)>self.MAX_BUDGET:
+            log.warning('dropping frame of {0} bytes, longer than any budget'.format(len(frame)))
+            with self.dataLock:
+                self.numDropped[priority] += 1
+            return False
+        with self.dataLock:
+            queue = self.queues[priority]
+            if len(queue)>=self.MAX_QUEUED[priority]:
+                self.numDropped[priority] += 1
+                return False
+            queue.append((frame,time.time()))
+            return True
+    
+    def get(self,budget=None):
+        '''
+        \brief Take the frames to write now.
+        
+        \param budget The number of bytes which can be written; None for a
+            single frame.
+        
+        \returns The frames, highest priority first, as many as fit in the
+            budget; none if the next one does not fit, which then waits for
+            a larger budget.
+        '''
+        frames = []
+        size   = 0
+        now    = time.time()
+        with self.dataLock:
+            for p in self.PRIORITIES:
+                queue = self.queues[p]
+                while queue:
+                    (frame,queuedAt) = queue[0]
+                    if budget==None and frames:
+                        break
+                    if budget!=None and size+len(frame)>budget:
+                        break
+                    queue.popleft()
+                    frames   += [frame]
+                    size     += len(frame)
+                    self.queueTimes.append(now-queuedAt)
+                if queue:
+                    # the budget is used up
+                    break
+            self.numSent += len(frames)
+        return frames
+    
+    def getStats(self):
+        '''
+        \returns A dictionary with the number of frames queued, sent and
+            dropped, and percentiles of the time the last NUM_SAMPLES frames
+            sent waited, in seconds.
+        '''
+        with self.dataLock:
+            queueTimes = sorted(self.queueTimes)
+            returnVal  = {
+                'numQueued':   dict((p,len(q)) for (p,q) in self.queues.items()),
+                'numSent':     self.numSent,
+                'numDropped':  dict(self.numDropped),
+            }
+        returnVal['queueTime'] = dict(
+            ('p{0}'.format(p),queueTimes[min(len(queueTimes)-1,len(queueTimes)*p/100)] if queueTimes else None)
+            for p in [50,90,99,100]
+        )
+        return returnVal
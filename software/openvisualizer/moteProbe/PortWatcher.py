@@ -0,0 +1,159 @@
+'''
+\brief Watch for motes being plugged in and out.
+'''
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('PortWatcher')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+import os
+import select
+import threading
+
+try:
+    import pyudev
+except ImportError:
+    pyudev = None
+
+import openvisualizer_utils as u
+import moteProbe
+
+class PortWatcher(threading.Thread):
+    '''
+    \brief Thread which calls back when serial ports of motes appear or
+        disappear.
+    
+    The ports are listed with moteProbe.findSerialPorts() at start, then each
+    time udev reports a change to a tty device, when pyudev is installed, and
+    every RESCAN_PERIOD seconds in any case.
+    
+    The callbacks for the ports which appear run in parallel, each in its own
+    thread, so a port slow to open does not delay the others.
+    '''
+    
+    RESCAN_PERIOD        = 2.0 # s
+    
+    def __init__(self,portAdded_cb,portRemoved_cb,findPorts=moteProbe.findSerialPorts):
+        '''
+        \param portAdded_cb   Called with the (name,baudrate) tuple of a port
+            which appeared.
+        \param portRemoved_cb Called with the (name,baudrate) tuple of a port
+            which disappeared.
+        \param findPorts      Lists the current ports.
+        '''
+        
+        # store params
+        self.portAdded_cb         = portAdded_cb
+        self.portRemoved_cb       = portRemoved_cb
+        self.findPorts            = findPorts
+        
+        # local variables
+        self.goOn                 = True
+        self.dataLock             = threading.Lock()
+        self.ports                = set()
+        self.wakeupEvent          = threading.Event()
+        self.readyEvent           = threading.Event()
+        self.monitor              = None
+        if pyudev:
+            try:
+                self.monitor      = pyudev.Monitor.from_netlink(pyudev.Context())
+                self.monitor.filter_by('tty')
+                self.monitor.start()
+            except Exception as err:
+                log.warning('udev not available, rescanning every {0}s: {1}'.format(self.RESCAN_PERIOD,err))
+                self.monitor      = None
+        if self.monitor:
+            # close() writes to this pipe to wake up the wait for udev events
+            (self.wakeupRead,self.wakeupWrite) = os.pipe()
+        
+        # initialize parent class
+        threading.Thread.__init__(self)
+        
+        # give this thread a name
+        self.name                 = 'PortWatcher'
+        self.setDaemon(True)
+        
+        # start myself
+        self.start()
+    
+    def run(self):
+        try:
+            while self.goOn:
+                self._rescan()
+                self.readyEvent.set()
+                self._wait()
+        except Exception as err:
+            log.critical(u.formatCrashMessage(self.name,err))
+    
+    #======================== public ==========================================
+    
+    def waitReady(self,timeout=None):
+        '''
+        \brief Wait until the callbacks of the ports present at start have
+            returned, or until timeout.
+        
+        \returns True if they have.
+        '''
+        return self.readyEvent.wait(timeout)
+    
+    def getPorts(self):
+        with self.dataLock:
+            return sorted(self.ports)
+    
+    def close(self):
+        self.goOn                 = False
+        self.wakeupEvent.set()
+        if self.monitor:
+            os.write(self.wakeupWrite,'x')
+        self.join()
+        if self.monitor:
+            os.close(self.wakeupRead)
+            os.close(self.wakeupWrite)
+    
+    #======================== private =========================================
+    
+    def _wait(self):
+        if self.monitor:
+            # any tty event triggers a rescan, after reading all those queued
+            (readable,_,_) = select.select([self.monitor,self.wakeupRead],[],[],self.RESCAN_PERIOD)
+            if self.monitor in readable:
+                while self.monitor.poll(timeout=0):
+                    pass
+        else:
+            self.wakeupEvent.wait(self.RESCAN_PERIOD)
+        self.wakeupEvent.clear()
+    
+    def _rescan(self):
+        ports = set(self.findPorts())
+        with self.dataLock:
+            added         = ports-self.ports
+            removed       = self.ports-ports
+            self.ports    = ports
+        
+        for port in sorted(removed):
+            log.info('port removed: {0}'.format(port[0]))
+            self._call(self.portRemoved_cb,port)
+        
+        threads = []
+        for port in sorted(added):
+            log.info('port added: {0}'.format(port[0]))
+            t = threading.Thread(
+                target    = self._call,
+                args      = (self.portAdded_cb,port),
+                name      = 'PortWatcher@{0}'.format(port[0]),
+            )
+            t.setDaemon(True)
+            t.start()
+            threads += [t]
+        for t in threads:
+            t.join()
+    
+    def _call(self,callback,port):
+        try:
+            callback(port)
+        except Exception as err:
+            log.error('{0} failed for {1}: {2}'.format(callback.__name__,port[0],err))
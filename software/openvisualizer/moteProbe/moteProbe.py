@@ -15,10 +15,13 @@ import threading
 
 import serial
 import time
+import struct
 import sys
+import collections
 
 from   pydispatch import dispatcher
 import OpenHdlc
+import OutputQueue
 import openvisualizer_utils as u
 from   moteConnector import OpenParser
 
@@ -61,9 +64,33 @@ def findSerialPorts():
 #============================ class ===========================================
 
 class moteProbe(threading.Thread):
+    '''
+    \brief Reads HDLC frames from a mote, and writes the frames for it.
+    
+    By default, a thread per mote reads from its serial port. Given an
+    ioLoop (see openTun.IoLoop), the serial port is instead opened
+    non-blocking and read from the thread of that loop, so a single thread
+    serves all motes; this needs a POSIX system.
     
-    def __init__(self,serialport=None,emulatedMote=None):
+    When the serial port can not be opened or read, it is opened again
+    later, waiting longer after each failure.
+    
+    The health of the serial link is counted as bytes are handled, see
+    getLinkStats(); the statistics are also returned to whoever dispatches
+    the 'getLinkStats' signal.
+    '''
+    
+    READ_SIZE            = 4096 # bytes read at most at once
+    BACKOFF_MIN          = 1.0  # s, first delay before opening the serial port again
+    BACKOFF_MAX          = 30.0 # s
+    MAX_FRAME_LENGTH     = 512  # bytes, HDLC-encoded, longer frames are dropped
+    FRAME_GAP            = 1.0  # s without frame counted as a gap
+    RATE_PERIOD          = 1.0  # s between byte count samples
+    RATE_WINDOW          = 10   # s over which the byte rates are averaged
+    
+    def __init__(self,serialport=None,emulatedMote=None,ioLoop=None):
         assert bool(serialport) != bool(emulatedMote)
+        assert not (ioLoop and emulatedMote)
         
         if serialport:
             assert not emulatedMote
@@ -103,9 +130,25 @@ class moteProbe(threading.Thread):
         self.lastRxByte           = self.hdlc.HDLC_FLAG
         self.busyReceiving        = False
         self.inputBuf             = ''
-        self.outputBuf            = []
-        self.outputBufLock        = threading.RLock()
+        self.outputQueue          = OutputQueue.OutputQueue()
         self.dataLock             = threading.Lock()
+        self.ioLoop               = ioLoop
+        self.serial               = None
+        self.numFailures          = 0
+        self.reopenTimer          = None
+        self.closeEvent           = threading.Event()
+        # link statistics, only changed by the thread reading the serial port
+        self.numBytesIn           = 0
+        self.numBytesOut          = 0
+        self.numFramesOk          = 0
+        self.numCrcErrors         = 0
+        self.numEscapeErrors      = 0
+        self.numOversizeFrames    = 0
+        self.numFrameGaps         = 0
+        self.maxFrameGap          = 0
+        self.lastFrameTime        = None
+        self.rateSamples          = collections.deque(maxlen=int(self.RATE_WINDOW/self.RATE_PERIOD)+1)
+        self.rateSamples.append((time.time(),0,0))
         # flag to permit exit from read loop
         self.goOn                 = True
         
@@ -125,9 +168,17 @@ class moteProbe(threading.Thread):
             self._bufferDataToSend,
             signal = 'fromMoteConnector@'+self.serialport,
         )
-    
-        # start myself
-        self.start()
+        dispatcher.connect(
+            self._getLinkStats_notif,
+            signal = 'getLinkStats',
+        )
+        
+        if self.ioLoop:
+            # the loop reads the serial port
+            self._openSerial()
+        else:
+            # start myself
+            self.start()
     
     #======================== thread ==========================================
     
@@ -139,69 +190,36 @@ class moteProbe(threading.Thread):
             while self.goOn:     # open serial port
                 if self.realserial:
                     log.debug("open serial port {0}@{1}".format(self.serialport,self.baudrate))
-                    self.serial = serial.Serial(self.serialport,self.baudrate)
+                    try:
+                        self.serial = serial.Serial(self.serialport,self.baudrate)
+                    except Exception as err:
+                        log.warning('{0}: could not open serial port: {1}'.format(self.name,err))
+                        self.numFailures += 1
+                        self.closeEvent.wait(self._getBackoff())
+                        continue
                 else:
                     log.debug("use emulated serial port {0}".format(self.serialport))
                     self.serial = self.emulatedMote.bspUart
                 while self.goOn: # read bytes from serial port
                     try:
-                        rxByte = self.serial.read(1)                        
+                        if self.realserial:
+                            # read whatever was received, at least one byte
+                            rxBytes = self.serial.read(max(self.serial.inWaiting(),1))
+                        else:
+                            # read whatever the emulated mote wrote, at least one byte
+                            rxBytes = self.serial.read(max(self.serial.read_available(),1))
                     except Exception as err:
                         print err
                         log.warning(err)
-                        time.sleep(1)
+                        if self.realserial:
+                            self.serial.close()
+                        self.numFailures += 1
+                        self.closeEvent.wait(self._getBackoff())
                         break
                     else:
-                        if      (
-                                    (not self.busyReceiving)             and 
-                                    self.lastRxByte==self.hdlc.HDLC_FLAG and
-                                    rxByte!=self.hdlc.HDLC_FLAG
-                                ):
-                            # start of frame
-                            log.debug("{0}: start of hdlc frame {1} {2}".format(self.name, u.formatStringBuf(self.hdlc.HDLC_FLAG), u.formatStringBuf(rxByte)))
-                            self.busyReceiving       = True
-                            self.inputBuf            = self.hdlc.HDLC_FLAG
-                            self.inputBuf           += rxByte
-                        elif    (
-                                    self.busyReceiving                   and
-                                    rxByte!=self.hdlc.HDLC_FLAG
-                                ):
-                            # middle of frame
-                            
-                            self.inputBuf           += rxByte
-                        elif    (
-                                    self.busyReceiving                   and
-                                    rxByte==self.hdlc.HDLC_FLAG
-                                ):
-                            # end of frame
-                            log.debug("{0}: end of hdlc frame {1} ".format(self.name, u.formatStringBuf(rxByte)))
-                            self.busyReceiving       = False
-                            self.inputBuf           += rxByte
-                            
-                            try:
-                                tempBuf = self.inputBuf
-                                self.inputBuf        = self.hdlc.dehdlcify(self.inputBuf)
-                                log.debug("{0}: {2} dehdlcized input: {1}".format(self.name, u.formatStringBuf(self.inputBuf), u.formatStringBuf(tempBuf)))
-                            except OpenHdlc.HdlcException as err:
-                                log.warning('{0}: invalid serial frame: {2} {1}'.format(self.name, err, u.formatStringBuf(tempBuf)))
-                            else:
-                                if self.inputBuf==chr(OpenParser.OpenParser.SERFRAME_MOTE2PC_REQUEST):
-                                    with self.outputBufLock:
-                                        if self.outputBuf:
-                                            outputToWrite = self.outputBuf.pop(0)
-                                            self.serial.write(outputToWrite)
-                                else:
-                                    # dispatch
-                                    dispatcher.send(
-                                        sender        = self.name,
-                                        signal        = 'fromMoteProbe@'+self.serialport,
-                                        data          = self.inputBuf[:],
-                                    )
-                        
-                        self.lastRxByte = rxByte
+                        self.numFailures  = 0
+                        self._handleRxBytes(rxBytes)
                                           
-                    if not self.realserial:
-                        rxByte = self.serial.doneReading()
         except Exception as err:
             errMsg=u.formatCrashMessage(self.name,err)
             print errMsg
@@ -218,16 +236,276 @@ class moteProbe(threading.Thread):
         with self.dataLock:
             return self.baudrate
     
+    def getOutputStats(self):
+        '''
+        \brief Statistics of the frames written to the mote, see
+            OutputQueue.getStats().
+        '''
+        return self.outputQueue.getStats()
+    
+    def getLinkStats(self):
+        '''
+        \brief Statistics of the serial link.
+        
+        \returns A dictionary with:
+            - serialPort, the name of the serial port
+            - numBytesIn, numBytesOut: the bytes read and written
+            - numFramesOk: the frames received intact
+            - numCrcErrors: the frames received with a wrong CRC, or too
+              short to hold one
+            - numEscapeErrors: the frames received with an invalid escape
+              sequence
+            - numOversizeFrames: the frames longer than MAX_FRAME_LENGTH,
+              usually two frames merged by a lost flag
+            - numFrameGaps: the times no frame was received for more than
+              FRAME_GAP seconds
+            - maxFrameGap: the longest time between two frames, in seconds
+            - bytesInPerSec, bytesOutPerSec: the byte rates over the last
+              RATE_WINDOW seconds
+        '''
+        now = time.time()
+        returnVal = {
+            'serialPort':         self.serialport,
+            'numBytesIn':         self.numBytesIn,
+            'numBytesOut':        self.numBytesOut,
+            'numFramesOk':        self.numFramesOk,
+            'numCrcErrors':       self.numCrcErrors,
+            'numEscapeErrors':    self.numEscapeErrors,
+            'numOversizeFrames':  self.numOversizeFrames,
+            'numFrameGaps':       self.numFrameGaps,
+            'maxFrameGap':        self.maxFrameGap,
+            'bytesInPerSec':      0,
+            'bytesOutPerSec':     0,
+        }
+        
+        # rates since the oldest sample in the window, or the newest one
+        samples = list(self.rateSamples)
+        recent  = [sample for sample in samples if sample[0]>=now-self.RATE_WINDOW] or samples[-1:]
+        if now>recent[0][0]:
+            (sampleTime,bytesIn,bytesOut) = recent[0]
+            returnVal['bytesInPerSec']    = (returnVal['numBytesIn']-bytesIn)/(now-sampleTime)
+            returnVal['bytesOutPerSec']   = (returnVal['numBytesOut']-bytesOut)/(now-sampleTime)
+        
+        return returnVal
+    
     def close(self):
         self.goOn = False
+        self.closeEvent.set()
+        if self.ioLoop:
+            with self.dataLock:
+                if self.reopenTimer:
+                    self.reopenTimer.cancel()
+            self._closeSerial()
     
     #======================== private =========================================
     
+    def _getBackoff(self):
+        return min(self.BACKOFF_MAX,self.BACKOFF_MIN*2**max(self.numFailures-1,0))
+    
+    def _openSerial(self):
+        '''
+        \brief Open the serial port, and have the ioLoop read it; on
+            failure, try again later.
+        '''
+        with self.dataLock:
+            self.reopenTimer      = None
+            if not self.goOn:
+                return
+            log.debug("open serial port {0}@{1}".format(self.serialport,self.baudrate))
+            try:
+                self.serial       = serial.Serial(self.serialport,self.baudrate,timeout=0)
+            except Exception as err:
+                log.warning('{0}: could not open serial port: {1}'.format(self.name,err))
+                self.numFailures += 1
+                self._scheduleReopen()
+                return
+            self.ioLoop.register(self.serial.fileno(),self._serialReadable)
+    
+    def _scheduleReopen(self):
+        '''
+        \brief Open the serial port again after a delay. Call with dataLock
+            held.
+        '''
+        if not self.goOn:
+            return
+        self.reopenTimer          = threading.Timer(self._getBackoff(),self._openSerial)
+        self.reopenTimer.setDaemon(True)
+        self.reopenTimer.start()
+    
+    def _serialReadable(self,fd):
+        '''
+        \brief Called by the ioLoop when the serial port has bytes to read.
+        '''
+        with self.dataLock:
+            serialPort            = self.serial
+        if not serialPort:
+            # closed meanwhile
+            return
+        try:
+            rxBytes = serialPort.read(self.READ_SIZE)
+        except Exception as err:
+            self._serialFailed(err)
+            return
+        self.numFailures          = 0
+        self._handleRxBytes(rxBytes)
+    
+    def _serialFailed(self,err):
+        '''
+        \brief Close the serial port after an error, and open it again later.
+        '''
+        log.warning('{0}: closing serial port: {1}'.format(self.name,err))
+        if not self.ioLoop:
+            # the reading thread fails next, and opens it again
+            with self.dataLock:
+                serialPort        = self.serial
+            serialPort.close()
+            return
+        self._closeSerial()
+        with self.dataLock:
+            self.numFailures     += 1
+            self._scheduleReopen()
+    
+    def _closeSerial(self):
+        with self.dataLock:
+            (serialPort,self.serial) = (self.serial,None)
+        if serialPort:
+            self.ioLoop.unregister(serialPort.fileno())
+            serialPort.close()
+    
+    def _handleRxBytes(self,rxBytes):
+        '''
+        \brief Run received bytes through the HDLC state machine.
+        
+        The frames they complete are dispatched once all bytes are handled,
+        and queued output is written once per chunk polled for.
+        '''
+        frames       = []
+        requests     = []
+        numFrames    = self.numFramesOk
+        for rxByte in rxBytes:
+            if      (
+                        (not self.busyReceiving)             and 
+                        self.lastRxByte==self.hdlc.HDLC_FLAG and
+                        rxByte!=self.hdlc.HDLC_FLAG
+                    ):
+                # start of frame
+                self.busyReceiving       = True
+                self.inputBuf            = self.hdlc.HDLC_FLAG
+                self.inputBuf           += rxByte
+            elif    (
+                        self.busyReceiving                   and
+                        rxByte!=self.hdlc.HDLC_FLAG
+                    ):
+                # middle of frame
+                
+                self.inputBuf           += rxByte
+            elif    (
+                        self.busyReceiving                   and
+                        rxByte==self.hdlc.HDLC_FLAG
+                    ):
+                # end of frame
+                self.busyReceiving       = False
+                self.inputBuf           += rxByte
+                
+                if len(self.inputBuf)>self.MAX_FRAME_LENGTH:
+                    self.numOversizeFrames += 1
+                    log.warning('{0}: dropping serial frame of {1} bytes'.format(self.name,len(self.inputBuf)))
+                    self.lastRxByte      = rxByte
+                    continue
+                try:
+                    tempBuf = self.inputBuf
+                    self.inputBuf        = self.hdlc.dehdlcify(self.inputBuf)
+                except OpenHdlc.HdlcException as err:
+                    if isinstance(err,OpenHdlc.HdlcEscapeException):
+                        self.numEscapeErrors += 1
+                    else:
+                        self.numCrcErrors    += 1
+                    log.warning('{0}: invalid serial frame: {2} {1}'.format(self.name, err, u.formatStringBuf(tempBuf)))
+                else:
+                    self.numFramesOk    += 1
+                    if self.inputBuf[:1]==chr(OpenParser.OpenParser.SERFRAME_MOTE2PC_REQUEST):
+                        requests        += [self.inputBuf]
+                    else:
+                        frames          += [self.inputBuf]
+            
+            self.lastRxByte = rxByte
+        
+        # link statistics, once per chunk
+        self.numBytesIn         += len(rxBytes)
+        if rxBytes:
+            self._updateLinkStats(time.time(),self.numFramesOk>numFrames)
+        
+        # answer the requests of the mote, unless closed meanwhile
+        with self.dataLock:
+            serialPort           = self.serial
+        for request in requests:
+            if not serialPort:
+                break
+            outputToWrite = ''.join(self.outputQueue.get(self._getRequestBudget(request)))
+            if not outputToWrite:
+                break
+            try:
+                serialPort.write(outputToWrite)
+            except Exception as err:
+                if not self.realserial:
+                    raise
+                self._serialFailed(err)
+                break
+            self.numBytesOut    += len(outputToWrite)
+        
+        # dispatch
+        for frame in frames:
+            dispatcher.send(
+                sender        = self.name,
+                signal        = 'fromMoteProbe@'+self.serialport,
+                data          = frame,
+            )
+    
+    def _updateLinkStats(self,now,gotFrames):
+        '''
+        \brief Measure the gaps between frames, and sample the byte counts
+            for the rates.
+        '''
+        if gotFrames:
+            if self.lastFrameTime!=None:
+                gap = now-self.lastFrameTime
+                if gap>self.FRAME_GAP:
+                    self.numFrameGaps += 1
+                if gap>self.maxFrameGap:
+                    self.maxFrameGap   = gap
+            self.lastFrameTime         = now
+        if now-self.rateSamples[-1][0]>=self.RATE_PERIOD:
+            self.rateSamples.append((now,self.numBytesIn,self.numBytesOut))
+    
+    def _getLinkStats_notif(self,sender,signal,data):
+        if not self.goOn:
+            # closed, yet not garbage collected
+            return None
+        return self.getLinkStats()
+    
+    def _getRequestBudget(self,request):
+        '''
+        \brief The number of bytes a request of the mote allows to write.
+        
+        A mote may follow the request byte with the free space of its input
+        buffer, on 2 bytes, little-endian; without it, it gets a single
+        frame per request.
+        '''
+        if len(request)==3:
+            return struct.unpack('<H',request[1:])[0]
+        return None
+    
     def _bufferDataToSend(self,data):
         
         # frame with HDLC
         hdlcData = self.hdlc.hdlcify(data)
         
-        # add to outputBuf
-        with self.outputBufLock:
-            self.outputBuf += [hdlcData]
+        # commands go before data
+        if data[:1]==chr(OpenParser.OpenParser.SERFRAME_PC2MOTE_DATA):
+            priority = OutputQueue.OutputQueue.PRIORITY_DATA
+        else:
+            priority = OutputQueue.OutputQueue.PRIORITY_CONTROL
+        
+        # add to the output queue
+        if not self.outputQueue.put(hdlcData,priority):
+            log.warning('{0}: output queue full or frame too long, dropping frame'.format(self.name))
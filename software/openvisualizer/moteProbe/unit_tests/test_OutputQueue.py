@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                     # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                           # moteProbe/
+
+import pytest
+
+import OutputQueue
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_OutputQueue.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_OutputQueue')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_OutputQueue',
+                        'OutputQueue',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+CONTROL = OutputQueue.OutputQueue.PRIORITY_CONTROL
+DATA    = OutputQueue.OutputQueue.PRIORITY_DATA
+
+#============================ tests ===========================================
+
+def test_priority():
+
+    log.debug("\n---------- test_priority")
+    
+    queue = OutputQueue.OutputQueue()
+    for f in ['d1','d2']:
+        queue.put(f,DATA)
+    queue.put('c1',CONTROL)
+    
+    # control frames go first, one frame per call without a budget
+    assert queue.get()==['c1']
+    assert queue.get()==['d1']
+    queue.put('c2',CONTROL)
+    assert queue.get()==['c2']
+    assert queue.get()==['d2']
+    assert queue.get()==[]
+
+def test_budget():
+
+    log.debug("\n---------- test_budget")
+    
+    queue = OutputQueue.OutputQueue()
+    queue.put('c'*10,CONTROL)
+    for i in range(5):
+        queue.put(str(i)*10,DATA)
+    
+    # as many frames as the budget allows, in order
+    assert queue.get(35)==['c'*10,'0'*10,'1'*10]
+    assert queue.get(0)==[]
+    
+    # a frame longer than the budget waits for a larger one
+    assert queue.get(5)==[]
+    assert queue.get(15)==['2'*10]
+    assert queue.get(100)==['3'*10,'4'*10]
+    assert queue.getStats()['numSent']==6
+    
+    # a frame longer than any budget is dropped
+    assert not queue.put('x'*(OutputQueue.OutputQueue.MAX_BUDGET+1),DATA)
+    assert queue.getStats()['numDropped']=={CONTROL: 0, DATA: 1}
+    assert queue.get(OutputQueue.OutputQueue.MAX_BUDGET)==[]
+
+def test_stats():
+
+    log.debug("\n---------- test_stats")
+    
+    queue = OutputQueue.OutputQueue()
+    
+    # full queues drop, per priority
+    for i in range(OutputQueue.OutputQueue.MAX_QUEUED[DATA]+3):
+        queue.put('d',DATA)
+    assert queue.put('c',CONTROL)
+    stats = queue.getStats()
+    assert stats['numDropped']=={CONTROL: 0, DATA: 3}
+    assert stats['numQueued']=={CONTROL: 1, DATA: OutputQueue.OutputQueue.MAX_QUEUED[DATA]}
+    assert stats['queueTime']['p50']==None
+    
+    # queue times are measured
+    queue.get(1000)
+    stats = queue.getStats()
+    assert 0<=stats['queueTime']['p50']<=stats['queueTime']['p99']<=stats['queueTime']['p100']<1
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                     # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                           # moteProbe/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import time
+import select
+import Queue
+import threading
+
+import pytest
+
+import moteProbe
+import PortWatcher
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_PortWatcher.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_PortWatcher')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_PortWatcher',
+                        'PortWatcher',
+                        'moteProbe',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT      = 2 # s
+
+#============================ helpers =========================================
+
+class FakeMonitor(object):
+    '''
+    \brief Stands for a pyudev Monitor, events are written to a pipe.
+    '''
+    def __init__(self):
+        (self.readFd,self.writeFd) = os.pipe()
+    def filter_by(self,subsystem):
+        pass
+    def start(self):
+        pass
+    def fileno(self):
+        return self.readFd
+    def poll(self,timeout=None):
+        if timeout==0 and not select.select([self.readFd],[],[],0)[0]:
+            return None
+        return os.read(self.readFd,1)
+    def sendEvent(self):
+        os.write(self.writeFd,'e')
+
+class FakePyudev(object):
+    monitor = FakeMonitor()
+    class Monitor(object):
+        @staticmethod
+        def from_netlink(context):
+            return FakePyudev.monitor
+    @staticmethod
+    def Context():
+        return None
+
+#============================ fixtures ========================================
+
+@pytest.fixture
+def fastRescan(monkeypatch):
+    # without udev, changes are only seen when rescanning
+    monkeypatch.setattr(PortWatcher,'pyudev',None)
+    monkeypatch.setattr(PortWatcher.PortWatcher,'RESCAN_PERIOD',0.05)
+
+#============================ tests ===========================================
+
+def test_plug(fastRescan):
+
+    log.debug("\n---------- test_plug")
+    
+    ports   = [('/dev/ttyUSB0',115200)]
+    events  = Queue.Queue()
+    watcher = PortWatcher.PortWatcher(
+        lambda port: events.put(('added',port)),
+        lambda port: events.put(('removed',port)),
+        findPorts = lambda: ports[:],
+    )
+    try:
+        # the ports present at start are reported before waitReady() returns
+        assert watcher.waitReady(TIMEOUT)
+        assert events.get_nowait()==('added',('/dev/ttyUSB0',115200))
+        
+        # then the ports plugged in and out
+        ports.append(('/dev/ttyUSB1',115200))
+        assert events.get(timeout=TIMEOUT)==('added',('/dev/ttyUSB1',115200))
+        ports.remove(('/dev/ttyUSB0',115200))
+        assert events.get(timeout=TIMEOUT)==('removed',('/dev/ttyUSB0',115200))
+        assert watcher.getPorts()==[('/dev/ttyUSB1',115200)]
+    finally:
+        watcher.close()
+    assert events.empty()
+
+def test_parallel(fastRescan):
+
+    log.debug("\n---------- test_parallel")
+    
+    # ports slow to open are opened at the same time
+    added   = []
+    def slowAdd(port):
+        time.sleep(0.3)
+        added.append(port)
+    startTime = time.time()
+    watcher = PortWatcher.PortWatcher(
+        slowAdd,
+        lambda port: None,
+        findPorts = lambda: [('/dev/ttyUSB{0}'.format(i),115200) for i in range(4)],
+    )
+    try:
+        assert watcher.waitReady(TIMEOUT)
+        assert time.time()-startTime<0.6
+        assert len(added)==4
+    finally:
+        watcher.close()
+
+def test_callbackError(fastRescan):
+
+    log.debug("\n---------- test_callbackError")
+    
+    # a port which fails to open does not stop the others
+    added   = []
+    def add(port):
+        if port[0]=='/dev/ttyUSB0':
+            raise IOError('no such device')
+        added.append(port)
+    watcher = PortWatcher.PortWatcher(
+        add,
+        lambda port: None,
+        findPorts = lambda: [('/dev/ttyUSB0',115200),('/dev/ttyUSB1',115200)],
+    )
+    try:
+        assert watcher.waitReady(TIMEOUT)
+        assert added==[('/dev/ttyUSB1',115200)]
+        assert watcher.isAlive()
+    finally:
+        watcher.close()
+
+@pytest.mark.skipif(os.name!='posix',reason='udev only exists on Linux')
+def test_udev(monkeypatch):
+
+    log.debug("\n---------- test_udev")
+    
+    # with udev, ports are only rescanned on tty events...
+    monkeypatch.setattr(PortWatcher,'pyudev',FakePyudev)
+    monkeypatch.setattr(PortWatcher.PortWatcher,'RESCAN_PERIOD',10)
+    ports   = []
+    events  = Queue.Queue()
+    watcher = PortWatcher.PortWatcher(
+        lambda port: events.put(('added',port)),
+        lambda port: None,
+        findPorts = lambda: ports[:],
+    )
+    assert watcher.waitReady(TIMEOUT)
+    ports.append(('/dev/ttyUSB0',115200))
+    FakePyudev.monitor.sendEvent()
+    FakePyudev.monitor.sendEvent()
+    assert events.get(timeout=TIMEOUT)==('added',('/dev/ttyUSB0',115200))
+    
+    # ...which close() does not wait for
+    startTime = time.time()
+    watcher.close()
+    assert time.time()-startTime<1
+    assert events.empty()
+
+@pytest.mark.skipif(os.name!='posix',reason='serial ports are only read from an IoLoop on POSIX systems')
+def test_missingPort(monkeypatch):
+
+    log.debug("\n---------- test_missingPort")
+    
+    from openTun import IoLoop
+    
+    # a port which cannot be opened is retried later, until closed
+    monkeypatch.setattr(moteProbe.moteProbe,'BACKOFF_MIN',0.05)
+    ioLoop = IoLoop.IoLoop(name='serialIoLoop')
+    try:
+        probe = moteProbe.moteProbe(serialport=('/dev/doesNotExist',115200),ioLoop=ioLoop)
+        assert probe.serial==None
+        time.sleep(0.2)
+        assert probe.numFailures>=2
+        probe.close()
+        numFailures = probe.numFailures
+        time.sleep(0.2)
+        assert probe.numFailures==numFailures
+    finally:
+        ioLoop.close()
@@ -120,3 +120,22 @@ def test_randdomBackAndForth(randomFrame):
     log.debug("dehdlcified:    {0}".format(u.formatStringBuf(frameDehdlcified)))
     
     assert frameDehdlcified==randomFrame
+
+def test_dehdlcifyErrors():
+
+    log.debug("\n---------- test_dehdlcifyErrors")
+    
+    hdlc  = OpenHdlc.OpenHdlc()
+    frame = hdlc.hdlcify('\x7d\x7e\x11')
+    
+    # a corrupted byte is a CRC error
+    with pytest.raises(OpenHdlc.HdlcCrcException):
+        hdlc.dehdlcify(frame[:-2]+chr(ord(frame[-2])^0x01)+frame[-1])
+    with pytest.raises(OpenHdlc.HdlcCrcException):
+        hdlc.dehdlcify(hdlc.HDLC_FLAG+'\x11'+hdlc.HDLC_FLAG)
+    
+    # an escape byte not followed by an escaped byte is an escape error
+    with pytest.raises(OpenHdlc.HdlcEscapeException):
+        hdlc.dehdlcify(frame[:2]+'\x11'+frame[3:])
+    with pytest.raises(OpenHdlc.HdlcEscapeException):
+        hdlc.dehdlcify(frame[:-1]+hdlc.HDLC_ESCAPE+frame[-1])
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                     # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                           # moteProbe/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import time
+import Queue
+import struct
+import select
+import threading
+
+import pytest
+
+if os.name!='posix':
+    pytest.skip('serial ports are only read from an IoLoop on POSIX systems')
+
+import tty
+import serial
+
+import moteProbe
+import OpenHdlc
+import OutputQueue
+from pydispatch    import dispatcher
+from openTun       import IoLoop
+from moteConnector import OpenParser
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_moteProbe.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_moteProbe')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  maxBytes=2*1024*1024,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in   [
+                        'test_moteProbe',
+                        'moteProbe',
+                        'IoLoop',
+                    ]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT      = 2 # s
+
+HDLC         = OpenHdlc.OpenHdlc()
+REQUEST_BYTE = chr(OpenParser.OpenParser.SERFRAME_MOTE2PC_REQUEST)
+REQUEST      = HDLC.hdlcify(REQUEST_BYTE)
+
+#============================ fixtures ========================================
+
+class FakeMote(object):
+    '''
+    \brief The mote end of a pseudo-terminal, standing for a serial port.
+    '''
+    def __init__(self):
+        (self.master,slave) = os.openpty()
+        tty.setraw(slave)
+        self.port           = os.ttyname(slave)
+        self.received       = Queue.Queue()
+        os.close(slave)
+    def write(self,data):
+        os.write(self.master,data)
+    def read(self,numBytes):
+        data = ''
+        while len(data)<numBytes:
+            (readable,_,_) = select.select([self.master],[],[],TIMEOUT)
+            if not readable:
+                break
+            data += os.read(self.master,numBytes-len(data))
+        return data
+    def close(self):
+        os.close(self.master)
+
+@pytest.fixture
+def ioLoop(request):
+    returnVal = IoLoop.IoLoop(name='serialIoLoop')
+    request.addfinalizer(returnVal.close)
+    return returnVal
+
+@pytest.fixture
+def motes(request,ioLoop):
+    motes  = [FakeMote() for _ in range(5)]
+    probes = [moteProbe.moteProbe(serialport=(m.port,115200),ioLoop=ioLoop) for m in motes]
+    for (m,p) in zip(motes,probes):
+        def receive(sender,signal,data,m=m):
+            m.received.put(data)
+        m.receive = receive # keep a reference, the dispatcher only keeps a weak one
+        dispatcher.connect(receive,signal='fromMoteProbe@'+m.port)
+    def fin():
+        for (m,p) in zip(motes,probes):
+            p.close()
+            m.close()
+    request.addfinalizer(fin)
+    return zip(motes,probes)
+
+#============================ tests ===========================================
+
+def test_read(motes):
+
+    log.debug("\n---------- test_read")
+    
+    # one thread reads all serial ports
+    assert not any(p.isAlive() for (m,p) in motes)
+    
+    # frames are dispatched, whichever way they are split or coalesced
+    for (i,(m,p)) in enumerate(motes):
+        stream = ''.join(HDLC.hdlcify('frame{0}.{1}'.format(i,j)) for j in range(10))
+        m.write(stream[:3])
+        time.sleep(0.01)
+        m.write(stream[3:])
+    for (i,(m,p)) in enumerate(motes):
+        for j in range(10):
+            assert m.received.get(timeout=TIMEOUT)=='frame{0}.{1}'.format(i,j)
+
+def test_write(motes):
+
+    log.debug("\n---------- test_write")
+    
+    (m,p) = motes[0]
+    
+    # frames for the mote are written when it asks for them
+    dispatcher.send(sender='test',signal='fromMoteConnector@'+m.port,data='hello')
+    dispatcher.send(sender='test',signal='fromMoteConnector@'+m.port,data='world')
+    m.write(REQUEST)
+    assert m.read(len(HDLC.hdlcify('hello')))==HDLC.hdlcify('hello')
+    m.write(REQUEST+HDLC.hdlcify('data'))
+    assert m.read(len(HDLC.hdlcify('world')))==HDLC.hdlcify('world')
+    assert m.received.get(timeout=TIMEOUT)=='data'
+
+def test_writeBudget(motes):
+
+    log.debug("\n---------- test_writeBudget")
+    
+    (m,p) = motes[0]
+    
+    # a mote telling how much it can take gets that much, commands first
+    for i in range(5):
+        dispatcher.send(sender='test',signal='fromMoteConnector@'+m.port,data='D'+str(i)*10)
+    dispatcher.send(sender='test',signal='fromMoteConnector@'+m.port,data='RT')
+    expected = [HDLC.hdlcify(f) for f in ['RT','D'+'0'*10,'D'+'1'*10]]
+    m.write(HDLC.hdlcify(REQUEST_BYTE+struct.pack('<H',len(''.join(expected)))))
+    assert m.read(len(''.join(expected)))==''.join(expected)
+    assert p.getOutputStats()['numQueued'][OutputQueue.OutputQueue.PRIORITY_DATA]==3
+
+def test_writeError(motes,monkeypatch):
+
+    log.debug("\n---------- test_writeError")
+    
+    (m,p) = motes[0]
+    monkeypatch.setattr(p,'BACKOFF_MIN',0.05)
+    
+    class BrokenSerial(object):
+        def __init__(self,serialPort):
+            self.serialPort = serialPort
+        def __getattr__(self,name):
+            return getattr(self.serialPort,name)
+        def write(self,data):
+            raise serial.SerialException('write failed')
+    
+    # a port failing to write is closed, then opened again
+    with p.dataLock:
+        brokenSerial = p.serial = BrokenSerial(p.serial)
+    dispatcher.send(sender='test',signal='fromMoteConnector@'+m.port,data='lost')
+    m.write(REQUEST)
+    startTime = time.time()
+    while p.serial in [brokenSerial,None] and time.time()-startTime<TIMEOUT:
+        time.sleep(0.01)
+    assert p.serial not in [brokenSerial,None]
+    assert not brokenSerial.isOpen()
+    dispatcher.send(sender='test',signal='fromMoteConnector@'+m.port,data='hello')
+    m.write(REQUEST)
+    assert m.read(len(HDLC.hdlcify('hello')))==HDLC.hdlcify('hello')
+
+def test_close(motes,ioLoop):
+
+    log.debug("\n---------- test_close")
+    
+    (m,p) = motes[0]
+    
+    # a closed probe stops reading, the others go on
+    p.close()
+    m.write(HDLC.hdlcify('lost'))
+    (m1,p1) = motes[1]
+    m1.write(HDLC.hdlcify('kept'))
+    assert m1.received.get(timeout=TIMEOUT)=='kept'
+    assert m.received.empty()
+
+def test_linkStats(motes):
+
+    log.debug("\n---------- test_linkStats")
+    
+    (m,p) = motes[0]
+    
+    # good and bad frames are counted
+    good      = HDLC.hdlcify('good')
+    badCrc    = good[:2]+chr(ord(good[2])^0x01)+good[3:]
+    badEscape = good[:2]+HDLC.HDLC_ESCAPE+'\x11'+good[3:]
+    oversize  = HDLC.HDLC_FLAG+'x'*p.MAX_FRAME_LENGTH+HDLC.HDLC_FLAG
+    stream    = good+badCrc+badEscape+oversize+REQUEST
+    dispatcher.send(sender='test',signal='fromMoteConnector@'+m.port,data='hello')
+    m.write(stream)
+    assert m.received.get(timeout=TIMEOUT)=='good'
+    assert m.read(len(HDLC.hdlcify('hello')))==HDLC.hdlcify('hello')
+    stats = p.getLinkStats()
+    assert stats['serialPort']==m.port
+    assert stats['numBytesIn']==len(stream)
+    assert stats['numBytesOut']==len(HDLC.hdlcify('hello'))
+    assert stats['numFramesOk']==2
+    assert stats['numCrcErrors']==1
+    assert stats['numEscapeErrors']==1
+    assert stats['numOversizeFrames']==1
+    assert stats['bytesInPerSec']>0
+    
+    # a pause between frames is a gap
+    p.FRAME_GAP = 0.1
+    time.sleep(0.2)
+    m.write(good)
+    assert m.received.get(timeout=TIMEOUT)=='good'
+    assert p.getLinkStats()['numFrameGaps']==1
+    assert p.getLinkStats()['maxFrameGap']>=0.2
+    
+    # every open probe answers on the event bus
+    p.close()
+    answers = [r for (f,r) in dispatcher.send(sender='test',signal='getLinkStats',data=None) if r]
+    assert sorted(r['serialPort'] for r in answers)==sorted(m1.port for (m1,p1) in motes[1:])
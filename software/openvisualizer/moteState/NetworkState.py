@@ -0,0 +1,268 @@
+'''
+\brief Module which aggregates the status of all motes into a network view.
+
+The status notifications of every mote are indexed as they arrive, so that
+network-wide questions (which motes hear a neighbor, which cells use a
+channel offset, which motes have a DAG rank) are answered without going
+through the moteState of every mote.
+'''
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('NetworkState')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+import threading
+
+from eventBus      import eventBusClient
+from openType      import typeAddr
+from openType      import typeCellType
+
+def formatAddr(type,bodyH,bodyL):
+    '''
+    \brief The string representation of an address, as in the moteState.
+    '''
+    addr = typeAddr.typeAddr()
+    addr.update(type,bodyH,bodyL)
+    return str(addr)
+
+class NetworkState(eventBusClient.eventBusClient):
+
+    CELLTYPES_TX         = [
+        typeCellType.typeCellType.CELLTYPE_ADV,
+        typeCellType.typeCellType.CELLTYPE_TX,
+        typeCellType.typeCellType.CELLTYPE_TXRX,
+    ]
+    
+    def __init__(self):
+        
+        # log
+        log.debug("create instance")
+        
+        # local variables
+        self.stateLock            = threading.Lock()
+        self.motes                = set() # serial ports of the motes which reported their status
+        self.addrs                = {}    # {serialPort: 64b address}
+        self.dagRanks             = {}    # {serialPort: DAG rank}
+        self.cells                = {}    # {(serialPort,row): cell dictionary}
+        self.neighbors            = {}    # {(serialPort,row): neighbor address}
+        
+        # indexes
+        self.motesByDagRank       = {}    # {DAG rank: set(serialPort)}
+        self.rowsByNeighbor       = {}    # {neighbor address: set((serialPort,row))}
+        self.cellsBySlot          = {}    # {(slotOffset,channelOffset): set((serialPort,row))}
+        self.cellsBySlotOffset    = {}    # {slotOffset: set((serialPort,row))}
+        self.cellsByChannelOffset = {}    # {channelOffset: set((serialPort,row))}
+        self.cellsByType          = {}    # {cell type: set((serialPort,row))}
+        
+        self.notifHandlers        = {
+            'Tuple_IdManager':    self._updateIdManager,
+            'Tuple_MyDagRank':    self._updateMyDagRank,
+            'Tuple_ScheduleRow':  self._updateScheduleRow,
+            'Tuple_NeighborsRow': self._updateNeighborsRow,
+        }
+        
+        # initialize parent class
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name             = 'NetworkState',
+            registrations    = [
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'fromMote.status',
+                    'callback'    : self._receivedStatus_notif,
+                },
+            ]
+        )
+    
+    #======================== public ==========================================
+    
+    def getMotes(self):
+        '''
+        \brief The serial ports of the motes which reported their status.
+        '''
+        with self.stateLock:
+            return sorted(self.motes)
+    
+    def getAddr(self,serialPort):
+        '''
+        \brief The 64-bit address of a mote, None if unknown.
+        '''
+        with self.stateLock:
+            return self.addrs.get(serialPort)
+    
+    def getDagRank(self,serialPort):
+        with self.stateLock:
+            return self.dagRanks.get(serialPort)
+    
+    def getMotesByDagRank(self,dagRank):
+        '''
+        \brief The serial ports of the motes at a DAG rank.
+        '''
+        with self.stateLock:
+            return sorted(self.motesByDagRank.get(dagRank,[]))
+    
+    def getMotesWithNeighbor(self,addr):
+        '''
+        \brief The serial ports of the motes which have a neighbor.
+        
+        \param addr The address of the neighbor, as in the moteState,
+            e.g. '14-15-92-09-02-2c-00-01 (64b)'.
+        '''
+        with self.stateLock:
+            return sorted(set([serialPort for (serialPort,row) in self.rowsByNeighbor.get(addr,[])]))
+    
+    def getCells(self,slotOffset=None,channelOffset=None,cellType=None):
+        '''
+        \brief The active cells of all motes matching the given criteria.
+        
+        \param slotOffset    The slot offset, None for any.
+        \param channelOffset The channel offset, None for any.
+        \param cellType      The cell type, one of typeCellType.CELLTYPE_*,
+            None for any.
+        
+        \returns A list of cell dictionaries, sorted by serial port and row.
+        '''
+        with self.stateLock:
+            
+            # use the most selective index first
+            candidates = []
+            if slotOffset!=None and channelOffset!=None:
+                candidates += [self.cellsBySlot.get((slotOffset,channelOffset),set())]
+            elif slotOffset!=None:
+                candidates += [self.cellsBySlotOffset.get(slotOffset,set())]
+            elif channelOffset!=None:
+                candidates += [self.cellsByChannelOffset.get(channelOffset,set())]
+            if cellType!=None:
+                candidates += [self.cellsByType.get(cellType,set())]
+            if not candidates:
+                keys = self.cells.keys()
+            else:
+                candidates.sort(key=len)
+                keys = candidates[0].intersection(*candidates[1:])
+            
+            return [dict(self.cells[k]) for k in sorted(keys)]
+    
+    def getSlotUsage(self):
+        '''
+        \brief The number of active cells at each slot offset, over all motes.
+        '''
+        with self.stateLock:
+            return dict([(s,len(keys)) for (s,keys) in self.cellsBySlotOffset.items()])
+    
+    def getConflicts(self):
+        '''
+        \brief The cells where several motes transmit at the same slot and
+            channel offsets.
+        
+        \returns A dictionary {(slotOffset,channelOffset): [cell,...]}.
+        '''
+        with self.stateLock:
+            returnVal = {}
+            for (slot,keys) in self.cellsBySlot.items():
+                txKeys = [k for k in keys if self.cells[k]['type'] in self.CELLTYPES_TX]
+                if len(set([serialPort for (serialPort,row) in txKeys]))>1:
+                    returnVal[slot] = [dict(self.cells[k]) for k in sorted(txKeys)]
+            return returnVal
+    
+    def removeMote(self,serialPort):
+        '''
+        \brief Forget all about a mote, e.g. when it is disconnected.
+        '''
+        with self.stateLock:
+            self.motes.discard(serialPort)
+            self.addrs.pop(serialPort,None)
+            self._setDagRank(serialPort,None)
+            for key in [k for k in self.cells.keys() if k[0]==serialPort]:
+                self._setCell(key,None)
+            for key in [k for k in self.neighbors.keys() if k[0]==serialPort]:
+                self._setNeighbor(key,None)
+    
+    #======================== private =========================================
+    
+    def _receivedStatus_notif(self,sender,signal,data):
+        
+        serialPort = sender.split('@',1)[-1]
+        handler    = self.notifHandlers.get(type(data).__name__)
+        
+        with self.stateLock:
+            self.motes.add(serialPort)
+            if handler:
+                handler(serialPort,data)
+    
+    def _updateIdManager(self,serialPort,notif):
+        self.addrs[serialPort] = formatAddr(
+            notif.my64bID_type,
+            notif.my64bID_bodyH,
+            notif.my64bID_bodyL,
+        )
+    
+    def _updateMyDagRank(self,serialPort,notif):
+        self._setDagRank(serialPort,notif.myDAGrank)
+    
+    def _updateScheduleRow(self,serialPort,notif):
+        if notif.type==typeCellType.typeCellType.CELLTYPE_OFF:
+            cell = None
+        else:
+            cell = {
+                'serialPort':    serialPort,
+                'row':           notif.row,
+                'slotOffset':    notif.slotOffset,
+                'channelOffset': notif.channelOffset,
+                'type':          notif.type,
+                'shared':        notif.shared,
+                'neighbor':      formatAddr(
+                                     notif.neighbor_type,
+                                     notif.neighbor_bodyH,
+                                     notif.neighbor_bodyL,
+                                 ),
+            }
+        self._setCell((serialPort,notif.row),cell)
+    
+    def _updateNeighborsRow(self,serialPort,notif):
+        if notif.used:
+            addr = formatAddr(notif.addr_type,notif.addr_bodyH,notif.addr_bodyL)
+        else:
+            addr = None
+        self._setNeighbor((serialPort,notif.row),addr)
+    
+    #======================== helpers =========================================
+    
+    def _setDagRank(self,serialPort,dagRank):
+        oldDagRank = self.dagRanks.pop(serialPort,None)
+        if oldDagRank!=None:
+            self._unindex(self.motesByDagRank,oldDagRank,serialPort)
+        if dagRank!=None:
+            self.dagRanks[serialPort] = dagRank
+            self.motesByDagRank.setdefault(dagRank,set()).add(serialPort)
+    
+    def _setCell(self,key,cell):
+        oldCell = self.cells.pop(key,None)
+        if oldCell!=None:
+            self._unindex(self.cellsBySlot,         (oldCell['slotOffset'],oldCell['channelOffset']),key)
+            self._unindex(self.cellsBySlotOffset,   oldCell['slotOffset'],                           key)
+            self._unindex(self.cellsByChannelOffset,oldCell['channelOffset'],                        key)
+            self._unindex(self.cellsByType,         oldCell['type'],                                 key)
+        if cell!=None:
+            self.cells[key] = cell
+            self.cellsBySlot.setdefault((cell['slotOffset'],cell['channelOffset']),set()).add(key)
+            self.cellsBySlotOffset.setdefault(cell['slotOffset'],set()).add(key)
+            self.cellsByChannelOffset.setdefault(cell['channelOffset'],set()).add(key)
+            self.cellsByType.setdefault(cell['type'],set()).add(key)
+    
+    def _setNeighbor(self,key,addr):
+        oldAddr = self.neighbors.pop(key,None)
+        if oldAddr!=None:
+            self._unindex(self.rowsByNeighbor,oldAddr,key)
+        if addr!=None:
+            self.neighbors[key] = addr
+            self.rowsByNeighbor.setdefault(addr,set()).add(key)
+    
+    def _unindex(self,index,indexKey,value):
+        values = index[indexKey]
+        values.discard(value)
+        if not values:
+            del index[indexKey]
@@ -0,0 +1,206 @@
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('StateStreamer')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+import json
+import time
+import Queue
+import threading
+
+from eventBus      import eventBusClient
+
+def formatEvent(serialPort,elemName,version,stateJson):
+    '''
+    \brief Format a state element as a server-sent event.
+    
+    \param serialPort The serial port of the mote.
+    \param elemName   The name of the state element.
+    \param version    The version of the state element.
+    \param stateJson  The state element, as returned by its toJson().
+    '''
+    data = '{{"serialPort": {0}, "name": {1}, "version": {2}, "state": {3}}}'.format(
+        json.dumps(serialPort),
+        json.dumps(elemName),
+        version,
+        stateJson,
+    )
+    return 'event: moteState\n'+''.join(['data: {0}\n'.format(l) for l in data.split('\n')])+'\n'
+
+class StateStreamer(eventBusClient.eventBusClient):
+    '''
+    \brief Pushes the state elements of the motes to subscribers, as they change.
+    
+    Changes are coalesced during COALESCE_WINDOW, then each changed element
+    is serialized once, whatever the number of subscribers.
+    '''
+    
+    COALESCE_WINDOW = 0.2    # s
+    QUEUE_SIZE      = 100    # messages a subscriber can lag behind before being dropped
+    KEEPALIVE       = 15     # s without message before a keepalive comment is sent
+    DROPPED         = None   # put in the queue of a dropped subscriber
+    
+    def __init__(self,moteStates):
+        
+        # log
+        log.debug("create instance")
+        
+        # store params
+        self.moteStates      = moteStates # kept as is, motes can be added and removed
+        
+        # local variables
+        self.streamCond      = threading.Condition()
+        self.pending         = set()    # (serialPort,elemName) changed since the last push
+        self.versions        = {}       # {(serialPort,elemName): version last pushed}
+        self.subscribers     = []
+        
+        # initialize parent class
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name             = 'StateStreamer',
+            registrations    = [
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'moteStateChanged',
+                    'callback'    : self._moteStateChanged_notif,
+                },
+            ]
+        )
+        
+        # start the thread pushing the changes
+        self.thread          = threading.Thread(target=self._run,name='StateStreamer')
+        self.thread.setDaemon(True)
+        self.thread.start()
+    
+    #======================== public ==========================================
+    
+    def subscribe(self):
+        '''
+        \brief Subscribe to the changes.
+        
+        \returns A Queue.Queue the messages are put in, see formatEvent().
+        '''
+        q = Queue.Queue(self.QUEUE_SIZE)
+        with self.streamCond:
+            self.subscribers.append(q)
+        return q
+    
+    def unsubscribe(self,q):
+        with self.streamCond:
+            if q in self.subscribers:
+                self.subscribers.remove(q)
+    
+    def getSnapshot(self):
+        '''
+        \brief The current state of all motes, as one message.
+        '''
+        messages   = []
+        moteStates = self._getMoteStates()
+        for serialPort in sorted(moteStates.keys()):
+            ms = moteStates[serialPort]
+            for elemName in sorted(ms.getStateElemNames()):
+                (version,stateJson) = ms.getStateElemIfChanged(elemName)
+                messages.append(formatEvent(serialPort,elemName,version,stateJson))
+        return ''.join(messages)
+    
+    def stream(self):
+        '''
+        \brief Generator of the messages for one subscriber.
+        
+        Yields a snapshot of the state first, then the changes. Ends if the
+        subscriber is dropped, so that the client connects again and gets a
+        fresh snapshot.
+        '''
+        q = self.subscribe()
+        try:
+            yield self.getSnapshot()
+            while self.goOn:
+                try:
+                    message = q.get(timeout=self.KEEPALIVE)
+                except Queue.Empty:
+                    yield ': keepalive\n\n'
+                else:
+                    if message is self.DROPPED:
+                        return
+                    yield message
+        finally:
+            self.unsubscribe(q)
+    
+    def close(self):
+        with self.streamCond:
+            self.goOn = False
+            self.streamCond.notify()
+    
+    #======================== private =========================================
+    
+    def _moteStateChanged_notif(self,sender,signal,data):
+        with self.streamCond:
+            self.pending.add((data['serialPort'],data['elemName']))
+            self.streamCond.notify()
+    
+    def _getMoteStates(self):
+        '''
+        \brief The moteStates, indexed by serial port.
+        '''
+        return dict([(ms.moteConnector.serialport,ms) for ms in self.moteStates[:]])
+    
+    def _run(self):
+        while True:
+            with self.streamCond:
+                while self.goOn and not self.pending:
+                    self.streamCond.wait()
+                if not self.goOn:
+                    break
+            
+            # let more changes accumulate
+            time.sleep(self.COALESCE_WINDOW)
+            
+            with self.streamCond:
+                changes      = self.pending
+                self.pending = set()
+            
+            self._push(changes)
+    
+    def _push(self,changes):
+        
+        # serialize each changed element once
+        messages   = []
+        moteStates = self._getMoteStates()
+        for (serialPort,elemName) in sorted(changes):
+            ms = moteStates.get(serialPort)
+            if ms is None:
+                continue
+            state = ms.getStateElemIfChanged(elemName,self.versions.get((serialPort,elemName)))
+            if state is None:
+                continue
+            (version,stateJson) = state
+            self.versions[(serialPort,elemName)] = version
+            messages.append(formatEvent(serialPort,elemName,version,stateJson))
+        if not messages:
+            return
+        message = ''.join(messages)
+        
+        # hand the same message to every subscriber
+        with self.streamCond:
+            subscribers = self.subscribers[:]
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except Queue.Full:
+                log.warning('dropping subscriber which lags {0} messages behind'.format(self.QUEUE_SIZE))
+                self.unsubscribe(q)
+                self._drop(q)
+    
+    def _drop(self,q):
+        '''
+        \brief Replace what a dropped subscriber did not read by DROPPED.
+        '''
+        try:
+            while True:
+                q.get_nowait()
+        except Queue.Empty:
+            pass
+        q.put_nowait(self.DROPPED)
@@ -8,6 +8,7 @@ log.addHandler(NullHandler())
 
 import copy
 import time
+import array
 import threading
 import json
 
@@ -22,34 +23,68 @@ from openType      import openType,         \
 
 class OpenEncoder(json.JSONEncoder):
     def default(self, obj):
-        if   isinstance(obj, (StateElem,openType.openType)):
-            return { obj.__class__.__name__: obj.__dict__ }
+        if   isinstance(obj, openType.openType):
+            return { obj.__class__.__name__: obj.getFields() }
+        elif isinstance(obj, StateElem):
+            return { obj.__class__.__name__: obj._toDict() }
         else:
             return super(OpenEncoder, self).default(obj)
                           
 class StateElem(object):
     
+    __slots__ = ['meta','data','version','jsonCache']
+    
     def __init__(self):
         self.meta                      = [{}]
         self.data                      = []
+        self.version                   = 0            # incremented at each update
+        self.jsonCache                 = (None,None)  # (version,JSON) of the last toJson()
         
         self.meta[0]['numUpdates']     = 0
         self.meta[0]['lastUpdated']    = None
     
     #======================== public ==========================================
     
-    def update(self):
+    def update(self,*args):
+        '''
+        \brief Update the state, see _update().
+        
+        The version changes once the new state is written, so a toJson()
+        racing with an update never caches part of it under the new version.
+        '''
         self.meta[0]['lastUpdated']    = time.time()
         self.meta[0]['numUpdates']    += 1
+        self._update(*args)
+        self.version                  += 1
+    
+    def getVersion(self):
+        return self.version
     
     def toJson(self):
-        return json.dumps(self._toDict(),sort_keys=True,indent=4)
+        '''
+        \brief The state, as JSON.
+        
+        The JSON is only built again after the state was updated.
+        '''
+        (version,returnVal) = self.jsonCache
+        if version!=self.version:
+            # an update racing with this call makes the cache look out of date
+            version        = self.version
+            returnVal      = json.dumps(self._toDict(),sort_keys=True,indent=4)
+            self.jsonCache = (version,returnVal)
+        return returnVal
     
     def __str__(self):
         return self.toJson()
     
     #======================== private =========================================
     
+    def _update(self,*args):
+        '''
+        \brief Write the new state, from the arguments of update().
+        '''
+        pass
+    
     def _toDict(self):
         returnVal = {}
         returnVal['meta'] = self._elemToDict(self.meta)
@@ -83,8 +118,9 @@ class StateElem(object):
 
 class StateOutputBuffer(StateElem):
     
-    def update(self,notif):
-        StateElem.update(self)
+    __slots__ = []
+    
+    def _update(self,notif):
         if len(self.data)==0:
             self.data.append({})
         self.data[0]['index_write']         = notif.index_write
@@ -92,8 +128,9 @@ class StateOutputBuffer(StateElem):
 
 class StateAsn(StateElem):
     
-    def update(self,notif):
-        StateElem.update(self)
+    __slots__ = []
+    
+    def _update(self,notif):
         if len(self.data)==0:
             self.data.append({})
         if 'asn' not in self.data[0]:
@@ -104,8 +141,9 @@ class StateAsn(StateElem):
 
 class StateAsnSynch(StateElem):                                       # my
     
-    def update(self,notif):
-        StateElem.update(self)
+    __slots__ = []
+    
+    def _update(self,notif):
         if len(self.data)==0:
             self.data.append({})
         if 'asnsynch' not in self.data[0]:
@@ -116,8 +154,9 @@ class StateAsnSynch(StateElem):                                       # my
 
 class StateMacStats(StateElem):
     
-    def update(self,notif):
-        StateElem.update(self)
+    __slots__ = []
+    
+    def _update(self,notif):
         if len(self.data)==0:
             self.data.append({})
         self.data[0]['numSyncPkt']          = notif.numSyncPkt
@@ -127,116 +166,171 @@ class StateMacStats(StateElem):
         self.data[0]['numDeSync']           = notif.numDeSync
         self.data[0]['dutyCycle']           = notif.dutyCycle
 
-class StateScheduleRow(StateElem):
+class StateRow(object):
+    '''
+    \brief One row of a StateTable.
+    
+    The table stores its rows column by column; a row object only points at
+    its index in the table, and can be created whenever needed.
+    '''
+    
+    __slots__ = ['table','row']
+    
+    COLUMNS   = []   # the names of the columns of the table
+    TYPES     = {}   # {column: openType subclass} for columns holding an openType
+    
+    def __init__(self,table,row):
+        self.table                          = table
+        self.row                            = row
+    
+    def __getitem__(self,column):
+        return self.table.columns[column][self.row]
+    
+    def __setitem__(self,column,value):
+        self.table.columns[column][self.row] = value
+    
+    #======================== public ==========================================
+    
+    def update(self):
+        self.table.lastUpdated[self.row]    = time.time()
+        self.table.numUpdates[self.row]    += 1
+    
+    def isUpdated(self):
+        return self.table.numUpdates[self.row]>0
+    
+    def toDict(self):
+        returnVal = {}
+        for column in self.COLUMNS:
+            v = self[column]
+            if isinstance(v,openType.openType):
+                returnVal[column] = str(v)
+            else:
+                returnVal[column] = v
+        return returnVal
 
+class StateScheduleRow(StateRow):
+    
+    __slots__ = []
+    
+    COLUMNS   = [
+        'slotOffset',
+        'type',
+        'shared',
+        'channelOffset',
+        'neighbor',
+        'numRx',
+        'numTx',
+        'numTxACK',
+        'lastUsedAsn',
+    ]
+    TYPES     = {
+        'type':          typeCellType.typeCellType,
+        'neighbor':      typeAddr.typeAddr,
+        'lastUsedAsn':   typeAsn.typeAsn,
+    }
+    
     def update(self,notif):
-        StateElem.update(self)
-        if len(self.data)==0:
-            self.data.append({})
-        self.data[0]['slotOffset']          = notif.slotOffset
-        if 'type' not in self.data[0]:
-            self.data[0]['type']            = typeCellType.typeCellType()
-        self.data[0]['type'].update(notif.type)
-        self.data[0]['shared']              = notif.shared
-        self.data[0]['channelOffset']       = notif.channelOffset
-        if 'neighbor' not in self.data[0]:
-            self.data[0]['neighbor']        = typeAddr.typeAddr()
-        self.data[0]['neighbor'].update(notif.neighbor_type,
-                                        notif.neighbor_bodyH,
-                                        notif.neighbor_bodyL)
-        self.data[0]['numRx']               = notif.numRx
-        self.data[0]['numTx']               = notif.numTx
-        self.data[0]['numTxACK']            = notif.numTxACK
-        if 'lastUsedAsn' not in self.data[0]:
-            self.data[0]['lastUsedAsn']     = typeAsn.typeAsn()
-        self.data[0]['lastUsedAsn'].update(notif.lastUsedAsn_0_1,
-                                           notif.lastUsedAsn_2_3,
-                                           notif.lastUsedAsn_4)
+        StateRow.update(self)
+        self['slotOffset']                  = notif.slotOffset
+        self['type'].update(notif.type)
+        self['shared']                      = notif.shared
+        self['channelOffset']               = notif.channelOffset
+        self['neighbor'].update(notif.neighbor_type,
+                                notif.neighbor_bodyH,
+                                notif.neighbor_bodyL)
+        self['numRx']                       = notif.numRx
+        self['numTx']                       = notif.numTx
+        self['numTxACK']                    = notif.numTxACK
+        self['lastUsedAsn'].update(notif.lastUsedAsn_0_1,
+                                   notif.lastUsedAsn_2_3,
+                                   notif.lastUsedAsn_4)
 
 class StateBackoff(StateElem):
     
-    def update(self,notif):
-        StateElem.update(self)
+    __slots__ = []
+    
+    def _update(self,notif):
         if len(self.data)==0:
             self.data.append({})
         self.data[0]['backoffExponent']     = notif.backoffExponent
         self.data[0]['backoff']             = notif.backoff
 
-class StateQueueRow(StateElem):
+class StateQueueRow(StateRow):
     
-    def update(self,creator,owner):
-        StateElem.update(self)
-        if len(self.data)==0:
-            self.data.append({})
-        
-        if 'creator' not in self.data[0]:
-            self.data[0]['creator']         = typeComponent.typeComponent()
-        self.data[0]['creator'].update(creator)
-        if 'owner' not in self.data[0]:
-            self.data[0]['owner']           = typeComponent.typeComponent()
-        self.data[0]['owner'].update(owner)
-
-class StateQueue(StateElem):
+    __slots__ = []
     
-    def __init__(self):
-        StateElem.__init__(self)
-        
-        for i in range(10):
-            self.data.append(StateQueueRow())
+    COLUMNS   = [
+        'creator',
+        'owner',
+    ]
+    TYPES     = {
+        'creator':       typeComponent.typeComponent,
+        'owner':         typeComponent.typeComponent,
+    }
     
-    def update(self,notif):
-        StateElem.update(self)
-        self.data[0].update(notif.creator_0,notif.owner_0)
-        self.data[1].update(notif.creator_1,notif.owner_1)
-        self.data[2].update(notif.creator_2,notif.owner_2)
-        self.data[3].update(notif.creator_3,notif.owner_3)
-        self.data[4].update(notif.creator_4,notif.owner_4)
-        self.data[5].update(notif.creator_5,notif.owner_5)
-        self.data[6].update(notif.creator_6,notif.owner_6)
-        self.data[7].update(notif.creator_7,notif.owner_7)
-        self.data[8].update(notif.creator_8,notif.owner_8)
-        self.data[9].update(notif.creator_9,notif.owner_9)
+    def update(self,creator,owner):
+        StateRow.update(self)
+        self['creator'].update(creator)
+        self['owner'].update(owner)
 
-class StateNeighborsRow(StateElem):
+class StateNeighborsRow(StateRow):
+    
+    __slots__ = []
+    
+    COLUMNS   = [
+        'used',
+        'parentPreference',
+        'stableNeighbor',
+        'switchStabilityCounter',
+        'addr',
+        'DAGrank',
+        'rssi',
+        'numRx',
+        'numTx',
+        'numTxACK',
+        'numKA',                                                              # my
+        'numWraps',
+        'asn',
+    ]
+    TYPES     = {
+        'addr':          typeAddr.typeAddr,
+        'rssi':          typeRssi.typeRssi,
+        'asn':           typeAsn.typeAsn,
+    }
     
     def update(self,notif):
-        StateElem.update(self)
-        if len(self.data)==0:
-            self.data.append({})
-        self.data[0]['used']                     = notif.used
-        self.data[0]['parentPreference']         = notif.parentPreference
-        self.data[0]['stableNeighbor']           = notif.stableNeighbor
-        self.data[0]['switchStabilityCounter']   = notif.switchStabilityCounter
-        if 'addr' not in self.data[0]:
-            self.data[0]['addr']                 = typeAddr.typeAddr()
-        self.data[0]['addr'].update(notif.addr_type,
-                                    notif.addr_bodyH,
-                                    notif.addr_bodyL)
-        self.data[0]['DAGrank']                  = notif.DAGrank
-        if 'rssi' not in self.data[0]:
-            self.data[0]['rssi']                 = typeRssi.typeRssi()
-        self.data[0]['rssi'].update(notif.rssi)
-        self.data[0]['numRx']                    = notif.numRx
-        self.data[0]['numTx']                    = notif.numTx
-        self.data[0]['numTxACK']                 = notif.numTxACK
-        self.data[0]['numKA']                    = notif.numKA                       # my
-        self.data[0]['numWraps']                 = notif.numWraps
-        if 'asn' not in self.data[0]:
-            self.data[0]['asn']                  = typeAsn.typeAsn()
-        self.data[0]['asn'].update(notif.asn_0_1,
-                                   notif.asn_2_3,
-                                   notif.asn_4)
+        StateRow.update(self)
+        self['used']                        = notif.used
+        self['parentPreference']            = notif.parentPreference
+        self['stableNeighbor']              = notif.stableNeighbor
+        self['switchStabilityCounter']      = notif.switchStabilityCounter
+        self['addr'].update(notif.addr_type,
+                            notif.addr_bodyH,
+                            notif.addr_bodyL)
+        self['DAGrank']                     = notif.DAGrank
+        self['rssi'].update(notif.rssi)
+        self['numRx']                       = notif.numRx
+        self['numTx']                       = notif.numTx
+        self['numTxACK']                    = notif.numTxACK
+        self['numKA']                       = notif.numKA                       # my
+        self['numWraps']                    = notif.numWraps
+        self['asn'].update(notif.asn_0_1,
+                           notif.asn_2_3,
+                           notif.asn_4)
 
 class StateIsSync(StateElem):
     
-    def update(self,notif):
-        StateElem.update(self)
+    __slots__ = []
+    
+    def _update(self,notif):
         if len(self.data)==0:
             self.data.append({})
         self.data[0]['isSync']              = notif.isSync
 
 class StateIdManager(StateElem):
     
+    __slots__ = ['eventBusClient','moteConnector']
+    
     def __init__(self,eventBusClient,moteConnector):
         StateElem.__init__(self)
         self.eventBusClient  = eventBusClient
@@ -248,10 +342,9 @@ class StateIdManager(StateElem):
         except IndexError:
             return None
     
-    def update(self,notif):
+    def _update(self,notif):
     
         # update state
-        StateElem.update(self)
         if len(self.data)==0:
             self.data.append({})
         self.data[0]['isDAGroot']           = notif.isDAGroot
@@ -291,26 +384,88 @@ class StateIdManager(StateElem):
 
 class StateMyDagRank(StateElem):
     
-    def update(self,notif):
-        StateElem.update(self)
+    __slots__ = []
+    
+    def _update(self,notif):
         if len(self.data)==0:
             self.data.append({})
         self.data[0]['myDAGrank']           = notif.myDAGrank
 
 class StateTable(StateElem):
-
+    '''
+    \brief A state made of rows, e.g. the schedule of a mote.
+    
+    Rows are stored column by column: one list per column, and arrays for
+    the update counter and time of each row. The openType objects of a row
+    are created with it, then updated in place.
+    '''
+    
+    __slots__ = ['columns','numUpdates','lastUpdated']
+    
     def __init__(self,rowClass,columnOrder=None):
         StateElem.__init__(self)
         self.meta[0]['rowClass']            = rowClass
         if columnOrder:
             self.meta[0]['columnOrder']     = columnOrder
         self.data                           = []
+        self.columns                        = dict([(c,[]) for c in rowClass.COLUMNS])
+        self.numUpdates                     = array.array('L')
+        self.lastUpdated                    = array.array('d')
+    
+    #======================== public ==========================================
+    
+    def getNumRows(self):
+        return len(self.numUpdates)
+    
+    def getRow(self,row):
+        '''
+        \brief Return a row, adding rows to the table as needed.
+        '''
+        rowClass = self.meta[0]['rowClass']
+        while len(self.numUpdates)<row+1:
+            for column in rowClass.COLUMNS:
+                if column in rowClass.TYPES:
+                    self.columns[column].append(rowClass.TYPES[column]())
+                else:
+                    self.columns[column].append(None)
+            self.numUpdates.append(0)
+            self.lastUpdated.append(0)
+        return rowClass(self,row)
+    
+    #======================== private =========================================
+    
+    def _update(self,notif):
+        self.getRow(notif.row).update(notif)
+    
+    def _toDict(self):
+        returnVal = {}
+        returnVal['meta'] = self._elemToDict(self.meta)
+        returnVal['data'] = []
+        for row in range(self.getNumRows()):
+            r = self.getRow(row)
+            if r.isUpdated():
+                returnVal['data'].append(r.toDict())
+        return returnVal
 
-    def update(self,notif):
-        StateElem.update(self)
-        while len(self.data)<notif.row+1:
-            self.data.append(self.meta[0]['rowClass']())
-        self.data[notif.row].update(notif)
+class StateQueue(StateTable):
+    
+    __slots__ = []
+    
+    def __init__(self):
+        StateTable.__init__(self,StateQueueRow,columnOrder='creator.owner')
+        self.getRow(9)
+    
+    def _update(self,notif):
+        self.getRow(0).update(notif.creator_0,notif.owner_0)
+        self.getRow(1).update(notif.creator_1,notif.owner_1)
+        self.getRow(2).update(notif.creator_2,notif.owner_2)
+        self.getRow(3).update(notif.creator_3,notif.owner_3)
+        self.getRow(4).update(notif.creator_4,notif.owner_4)
+        self.getRow(5).update(notif.creator_5,notif.owner_5)
+        self.getRow(6).update(notif.creator_6,notif.owner_6)
+        self.getRow(7).update(notif.creator_7,notif.owner_7)
+        self.getRow(8).update(notif.creator_8,notif.owner_8)
+        self.getRow(9).update(notif.creator_9,notif.owner_9)
 
 class moteState(eventBusClient.eventBusClient):
     
@@ -434,6 +589,8 @@ class moteState(eventBusClient.eventBusClient):
                 self.state[self.ST_MYDAGRANK].update,
         
         }
+        
+        self.stateNames = dict([(v,k) for (k,v) in self.state.items()])
               # initialize parent class
         eventBusClient.eventBusClient.__init__(
             self,
@@ -467,6 +624,33 @@ class moteState(eventBusClient.eventBusClient):
         
         return returnVal
     
+    def getStateElemIfChanged(self,elemName,sinceVersion=None):
+        '''
+        \brief Get a state element as JSON, unless it did not change.
+        
+        \param elemName     The name of the state element.
+        \param sinceVersion The version the caller already has, None if none.
+        
+        \returns A tuple (version,json), or None if the element is still at
+            sinceVersion.
+        '''
+        
+        if elemName not in self.state:
+            raise ValueError('No state called {0}'.format(elemName))
+        
+        with self.stateLock:
+            elem = self.state[elemName]
+            if elem.getVersion()==sinceVersion:
+                return None
+            return (elem.getVersion(),elem.toJson())
+    
+    def close(self):
+        '''
+        \brief Stop receiving the status of the mote, e.g. when it is
+            unplugged.
+        '''
+        self.unregisterAll()
+    
     def triggerAction(self,action):
         
         # dispatch
@@ -494,6 +678,7 @@ class moteState(eventBusClient.eventBusClient):
             if self._isnamedtupleinstance(data,k):
                 found = True
                 v(data)
+                elem = v.im_self
                 break
         
         # unlock the state data
@@ -501,6 +686,16 @@ class moteState(eventBusClient.eventBusClient):
         
         if found==False:
             raise SystemError("No handler for data {0}".format(data))
+        
+        # announce the change, e.g. to the StateStreamer
+        self.dispatch(
+            signal        = 'moteStateChanged',
+            data          = {
+                                'serialPort':    self.moteConnector.serialport,
+                                'elemName':      self.stateNames[elem],
+                                'version':       elem.getVersion(),
+                            },
+        )
     
     def _isnamedtupleinstance(self,var,tupleInstance):
         return var._fields==tupleInstance._fields
\ No newline at end of file
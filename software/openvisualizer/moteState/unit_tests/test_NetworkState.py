@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+from moteState     import NetworkState
+from moteConnector import ParserStatus
+from eventBus      import eventBusClient
+from openType      import typeCellType
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_NetworkState.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_NetworkState')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_NetworkState',
+                   'NetworkState',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TX   = typeCellType.typeCellType.CELLTYPE_TX
+RX   = typeCellType.typeCellType.CELLTYPE_RX
+OFF  = typeCellType.typeCellType.CELLTYPE_OFF
+
+#============================ helpers =========================================
+
+parserStatus = ParserStatus.ParserStatus()
+
+def makeNotif(name,**fields):
+    '''
+    \brief Build a status notification, fields not given are set to 0.
+    '''
+    namedTuple = parserStatus.named_tuple[name]
+    return namedTuple(**dict([(f,fields.get(f,0)) for f in namedTuple._fields]))
+
+def notify(ns,serialPort,name,**fields):
+    ns._receivedStatus_notif('moteConnector@{0}'.format(serialPort),'fromMote.status',makeNotif(name,**fields))
+
+def addCell(ns,serialPort,row,slotOffset,channelOffset,type,neighbor=0):
+    notify(ns,serialPort,'ScheduleRow',
+        row             = row,
+        slotOffset      = slotOffset,
+        channelOffset   = channelOffset,
+        type            = type,
+        neighbor_type   = 2,
+        neighbor_bodyH  = neighbor,
+    )
+
+def addNeighbor(ns,serialPort,row,neighbor,used=1):
+    notify(ns,serialPort,'NeighborsRow',
+        row             = row,
+        used            = used,
+        addr_type       = 2,
+        addr_bodyH      = neighbor,
+    )
+
+def addr(neighbor):
+    return NetworkState.formatAddr(2,neighbor,0)
+
+#============================ tests ===========================================
+
+def test_neighbors():
+
+    log.debug("\n---------- test_neighbors")
+    
+    ns = NetworkState.NetworkState()
+    
+    addNeighbor(ns,'A',0,0x11)
+    addNeighbor(ns,'A',1,0x22)
+    addNeighbor(ns,'B',0,0x22)
+    assert ns.getMotesWithNeighbor(addr(0x11))==['A']
+    assert ns.getMotesWithNeighbor(addr(0x22))==['A','B']
+    
+    # a row which changes is moved to the new neighbor
+    addNeighbor(ns,'A',1,0x33)
+    assert ns.getMotesWithNeighbor(addr(0x22))==['B']
+    assert ns.getMotesWithNeighbor(addr(0x33))==['A']
+    
+    # an unused row is removed
+    addNeighbor(ns,'B',0,0x22,used=0)
+    assert ns.getMotesWithNeighbor(addr(0x22))==[]
+    assert addr(0x22) not in ns.rowsByNeighbor
+
+def test_cells():
+
+    log.debug("\n---------- test_cells")
+    
+    ns = NetworkState.NetworkState()
+    
+    addCell(ns,'A',0,slotOffset=1,channelOffset=3,type=TX)
+    addCell(ns,'A',1,slotOffset=2,channelOffset=3,type=RX)
+    addCell(ns,'B',0,slotOffset=1,channelOffset=3,type=TX)
+    addCell(ns,'B',1,slotOffset=4,channelOffset=5,type=TX)
+    
+    assert [(c['serialPort'],c['row']) for c in ns.getCells(channelOffset=3,cellType=TX)]==[('A',0),('B',0)]
+    assert [(c['serialPort'],c['row']) for c in ns.getCells(slotOffset=2)]==[('A',1)]
+    assert [(c['serialPort'],c['row']) for c in ns.getCells(slotOffset=1,channelOffset=3)]==[('A',0),('B',0)]
+    assert len(ns.getCells())==4
+    assert ns.getSlotUsage()=={1: 2, 2: 1, 4: 1}
+    assert ns.getConflicts().keys()==[(1,3)]
+    
+    # a cell which is switched off leaves the indexes
+    addCell(ns,'B',0,slotOffset=1,channelOffset=3,type=OFF)
+    assert ns.getConflicts()=={}
+    assert ns.getSlotUsage()=={1: 1, 2: 1, 4: 1}
+    assert [(c['serialPort'],c['row']) for c in ns.getCells(channelOffset=3,cellType=TX)]==[('A',0)]
+    
+    # a cell which moves is reindexed
+    addCell(ns,'B',1,slotOffset=2,channelOffset=3,type=TX)
+    assert ns.getCells(channelOffset=5)==[]
+    assert [(c['serialPort'],c['row']) for c in ns.getCells(slotOffset=2,channelOffset=3)]==[('A',1),('B',1)]
+    assert ns.getConflicts()=={}
+
+def test_dagRank():
+
+    log.debug("\n---------- test_dagRank")
+    
+    ns = NetworkState.NetworkState()
+    
+    notify(ns,'A','MyDagRank',myDAGrank=1)
+    notify(ns,'B','MyDagRank',myDAGrank=2)
+    notify(ns,'C','MyDagRank',myDAGrank=2)
+    assert ns.getMotesByDagRank(2)==['B','C']
+    
+    notify(ns,'C','MyDagRank',myDAGrank=3)
+    assert ns.getMotesByDagRank(2)==['B']
+    assert ns.getDagRank('C')==3
+
+def test_removeMote():
+
+    log.debug("\n---------- test_removeMote")
+    
+    ns = NetworkState.NetworkState()
+    
+    notify(ns,'A','IdManager',my64bID_type=2,my64bID_bodyH=0x11)
+    notify(ns,'A','MyDagRank',myDAGrank=1)
+    addCell(ns,'A',0,slotOffset=1,channelOffset=3,type=TX)
+    addNeighbor(ns,'A',0,0x22)
+    notify(ns,'B','Asn')
+    assert ns.getMotes()==['A','B']
+    assert ns.getAddr('A')==addr(0x11)
+    
+    ns.removeMote('A')
+    assert ns.getMotes()==['B']
+    assert ns.getAddr('A')==None
+    assert ns.getCells()==[]
+    assert ns.getMotesWithNeighbor(addr(0x22))==[]
+    assert ns.getMotesByDagRank(1)==[]
+    assert ns.cellsBySlot=={} and ns.cellsByType=={} and ns.motesByDagRank=={}
+
+def test_eventBus():
+
+    log.debug("\n---------- test_eventBus")
+    
+    ns     = NetworkState.NetworkState()
+    sender = eventBusClient.eventBusClient('moteConnector@test_eventBus',[])
+    
+    sender.dispatch('fromMote.status',makeNotif('MyDagRank',myDAGrank=7))
+    assert ns.getMotesByDagRank(7)==['test_eventBus']
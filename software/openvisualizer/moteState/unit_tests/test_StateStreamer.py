@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import json
+import Queue
+
+import pytest
+
+from moteState     import moteState
+from moteState     import StateStreamer
+from moteConnector import ParserStatus
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_StateStreamer.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_StateStreamer')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_StateStreamer',
+                   'StateStreamer',
+                   'moteState',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT = 2 # s
+
+#============================ helpers =========================================
+
+class MoteConnector(object):
+    def __init__(self,serialport):
+        self.serialport = serialport
+
+parserStatus = ParserStatus.ParserStatus()
+
+def makeNotif(name,**fields):
+    namedTuple = parserStatus.named_tuple[name]
+    return namedTuple(**dict([(f,fields.get(f,1)) for f in namedTuple._fields]))
+
+def parseEvents(message):
+    '''
+    \brief Parse server-sent events into a list of dictionaries.
+    '''
+    returnVal = []
+    for event in message.split('\n\n'):
+        lines = event.split('\n')
+        data  = '\n'.join([l[len('data: '):] for l in lines if l.startswith('data: ')])
+        if data:
+            assert 'event: moteState' in lines
+            returnVal.append(json.loads(data))
+    return returnVal
+
+@pytest.fixture
+def streamer(request,monkeypatch):
+    monkeypatch.setattr(StateStreamer.StateStreamer,'COALESCE_WINDOW',0.05)
+    moteStates = [
+        moteState.moteState(MoteConnector('{0}@1'.format(request.function.__name__))),
+        moteState.moteState(MoteConnector('{0}@2'.format(request.function.__name__))),
+    ]
+    returnVal  = StateStreamer.StateStreamer(moteStates)
+    request.addfinalizer(returnVal.close)
+    return (returnVal,moteStates)
+
+#============================ tests ===========================================
+
+def test_formatEvent():
+
+    log.debug("\n---------- test_formatEvent")
+    
+    message = StateStreamer.formatEvent('COM1','Asn',3,'{\n "data": []\n}')
+    assert message.endswith('\n\n')
+    assert parseEvents(message)==[
+        {'serialPort': 'COM1', 'name': 'Asn', 'version': 3, 'state': {'data': []}},
+    ]
+
+def test_snapshot(streamer):
+
+    log.debug("\n---------- test_snapshot")
+    
+    (st,moteStates) = streamer
+    
+    events = parseEvents(st.getSnapshot())
+    assert len(events)==sum([len(ms.getStateElemNames()) for ms in moteStates])
+    assert set([e['serialPort'] for e in events])==set([ms.moteConnector.serialport for ms in moteStates])
+
+def test_coalesce(streamer):
+
+    log.debug("\n---------- test_coalesce")
+    
+    (st,moteStates) = streamer
+    q               = st.subscribe()
+    
+    # a burst of changes is pushed as a single message, with the last version
+    for i in range(10):
+        moteStates[0]._receivedStatus_notif(None,None,makeNotif('Asn',asn_0_1=i))
+    moteStates[1]._receivedStatus_notif(None,None,makeNotif('IsSync'))
+    
+    events = parseEvents(q.get(timeout=TIMEOUT))
+    assert [(e['serialPort'],e['name'],e['version']) for e in events]==[
+        (moteStates[0].moteConnector.serialport,moteState.moteState.ST_ASN,   10),
+        (moteStates[1].moteConnector.serialport,moteState.moteState.ST_ISSYNC, 1),
+    ]
+    assert json.loads(moteStates[0].getStateElem(moteState.moteState.ST_ASN).toJson())==events[0]['state']
+    
+    with pytest.raises(Queue.Empty):
+        q.get(timeout=0.2)
+
+def test_fanout(streamer):
+
+    log.debug("\n---------- test_fanout")
+    
+    (st,moteStates) = streamer
+    queues          = [st.subscribe() for _ in range(5)]
+    
+    # every subscriber gets the same message, serialized once
+    moteStates[0]._receivedStatus_notif(None,None,makeNotif('MyDagRank'))
+    messages = [q.get(timeout=TIMEOUT) for q in queues]
+    assert all([m is messages[0] for m in messages])
+    
+    # unsubscribed queues get nothing
+    st.unsubscribe(queues[0])
+    moteStates[0]._receivedStatus_notif(None,None,makeNotif('MyDagRank'))
+    assert parseEvents(queues[1].get(timeout=TIMEOUT))[0]['version']==2
+    assert queues[0].empty()
+
+def test_slowSubscriber(streamer,monkeypatch):
+
+    log.debug("\n---------- test_slowSubscriber")
+    
+    (st,moteStates) = streamer
+    monkeypatch.setattr(st,'QUEUE_SIZE',1)
+    slow            = st.subscribe()
+    fast            = st.subscribe()
+    stream          = st.stream()
+    stream.next()
+    
+    # a subscriber which does not keep up is dropped
+    for _ in range(2):
+        moteStates[0]._receivedStatus_notif(None,None,makeNotif('MyDagRank'))
+        fast.get(timeout=TIMEOUT)
+    assert slow not in st.subscribers
+    assert fast in st.subscribers
+    
+    # and its stream ends, for the client to connect again
+    with pytest.raises(StopIteration):
+        stream.next()
+    assert len(st.subscribers)==1
+
+def test_plugged(streamer):
+
+    log.debug("\n---------- test_plugged")
+    
+    (st,moteStates) = streamer
+    q               = st.subscribe()
+    
+    # motes plugged in after start are streamed, unplugged ones are not
+    plugged         = moteState.moteState(MoteConnector('test_plugged@3'))
+    moteStates.append(plugged)
+    del moteStates[0]
+    assert set([e['serialPort'] for e in parseEvents(st.getSnapshot())])==set(['test_plugged@2','test_plugged@3'])
+    plugged._receivedStatus_notif(None,None,makeNotif('MyDagRank'))
+    assert parseEvents(q.get(timeout=TIMEOUT))[0]['serialPort']=='test_plugged@3'
@@ -0,0 +1,190 @@
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('IoLoop')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+import os
+import sys
+import errno
+import fcntl
+import select
+import threading
+
+import openvisualizer_utils as u
+
+def setNonBlocking(fd):
+    flags = fcntl.fcntl(fd,fcntl.F_GETFL)
+    fcntl.fcntl(fd,fcntl.F_SETFL,flags|os.O_NONBLOCK)
+
+class IoLoop(threading.Thread):
+    '''
+    \brief Thread which waits on several file descriptors at once.
+    
+    Each registered file descriptor has a callback, called from this thread
+    with the file descriptor as only parameter each time it is readable, and
+    optionally a second one, called each time it is writable. The callbacks
+    are expected to read or write what is ready without blocking.
+    
+    The loop is woken up through a pipe when file descriptors are
+    (un)registered or when it is closed, so it never has to poll.
+    
+    \note Uses epoll where available (Linux), select otherwise. Not
+        available on Windows, where pipes can not be waited on.
+    '''
+    
+    def __init__(self,name='IoLoop'):
+        
+        # local variables
+        self.goOn                 = True
+        self.dataLock             = threading.Lock()
+        self.callbacks            = {}    # {fd: callback}
+        self.writeCallbacks       = {}    # {fd: callback}, for the fds waited on to be writable
+        (self.wakeupRx,self.wakeupTx) = os.pipe()
+        setNonBlocking(self.wakeupRx)
+        setNonBlocking(self.wakeupTx)
+        if hasattr(select,'epoll'):
+            self.epoll            = select.epoll()
+            self.epoll.register(self.wakeupRx,select.EPOLLIN)
+        else:
+            self.epoll            = None
+        
+        # initialize parent
+        threading.Thread.__init__(self)
+        
+        # give this thread a name
+        self.name                 = name
+        self.setDaemon(True)
+        
+        # start myself
+        self.start()
+    
+    def run(self):
+        try:
+            while self.goOn:
+                
+                # wait for a file descriptor to be readable or writable
+                for (fd,readable,writable) in self._wait():
+                    if fd==self.wakeupRx:
+                        self._drainWakeup()
+                        continue
+                    if readable:
+                        self._call(self.callbacks,fd)
+                    if writable:
+                        self._call(self.writeCallbacks,fd)
+            
+            # free the file descriptors of the loop
+            with self.dataLock:
+                if self.epoll:
+                    self.epoll.close()
+                os.close(self.wakeupRx)
+                os.close(self.wakeupTx)
+        except Exception as err:
+            errMsg=u.formatCrashMessage(self.name,err)
+            print errMsg
+            log.critical(errMsg)
+            sys.exit(1)
+    
+    #======================== public ==========================================
+    
+    def register(self,fd,callback,writeCallback=None):
+        '''
+        \brief Call callback(fd) from the loop each time fd is readable.
+        
+        Registering a file descriptor again replaces its callbacks.
+        
+        \param writeCallback If not None, called as writeCallback(fd) each
+            time fd is writable. Only wait for this while there is something
+            to write, a socket is writable most of the time.
+        '''
+        with self.dataLock:
+            if not self.goOn:
+                raise ValueError('{0} is closed'.format(self.name))
+            if self.epoll:
+                events = select.EPOLLIN
+                if writeCallback:
+                    events |= select.EPOLLOUT
+                if fd in self.callbacks:
+                    self.epoll.modify(fd,events)
+                else:
+                    self.epoll.register(fd,events)
+            self.callbacks[fd] = callback
+            if writeCallback:
+                self.writeCallbacks[fd] = writeCallback
+            else:
+                self.writeCallbacks.pop(fd,None)
+            self._wakeup()
+    
+    def unregister(self,fd):
+        with self.dataLock:
+            if not self.goOn or fd not in self.callbacks:
+                return
+            del self.callbacks[fd]
+            self.writeCallbacks.pop(fd,None)
+            if self.epoll:
+                self.epoll.unregister(fd)
+            self._wakeup()
+    
+    def close(self):
+        with self.dataLock:
+            if not self.goOn:
+                return
+            self.goOn = False
+            self._wakeup()
+    
+    #======================== private =========================================
+    
+    def _wait(self):
+        '''
+        \returns A list of (fd,readable,writable) tuples.
+        '''
+        try:
+            if self.epoll:
+                # errors and hang-ups are for the read callback to find out
+                return [
+                    (fd,bool(events&~select.EPOLLOUT),bool(events&select.EPOLLOUT))
+                    for (fd,events) in self.epoll.poll()
+                ]
+            else:
+                with self.dataLock:
+                    readFds  = self.callbacks.keys()
+                    writeFds = self.writeCallbacks.keys()
+                (readable,writable,_) = select.select([self.wakeupRx]+readFds,writeFds,[])
+                return [(fd,True,False) for fd in readable]+[(fd,False,True) for fd in writable]
+        except (IOError,OSError,select.error) as err:
+            if err.args[0]==errno.EINTR:
+                return []
+            raise
+    
+    def _call(self,callbacks,fd):
+        with self.dataLock:
+            callback = callbacks.get(fd)
+        if callback==None:
+            # unregistered while waiting
+            return
+        try:
+            callback(fd)
+        except Exception as err:
+            log.critical(u.formatCriticalMessage(err))
+    
+    def _wakeup(self):
+        '''
+        \brief Wake the loop up; called with dataLock held, so the loop can
+            not close the pipe meanwhile.
+        '''
+        try:
+            os.write(self.wakeupTx,'x')
+        except OSError as err:
+            # the pipe is full, the loop will wake up anyway
+            if err.errno!=errno.EAGAIN:
+                raise
+    
+    def _drainWakeup(self):
+        try:
+            while os.read(self.wakeupRx,4096):
+                pass
+        except OSError as err:
+            if err.errno!=errno.EAGAIN:
+                raise
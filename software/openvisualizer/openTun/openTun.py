@@ -7,8 +7,6 @@ log.setLevel(logging.ERROR)
 log.addHandler(NullHandler())
 
 import os
-import socket
-import time
 
 import openvisualizer_utils as u
 from   eventBus import eventBusClient
@@ -44,6 +42,8 @@ class OpenTun(eventBusClient.eventBusClient):
     This class is abstract, with concrete subclases based on operating system.
     '''
     
+    CLOSE_TIMEOUT        = 1 # s
+    
     def __init__(self):
         
         # log
@@ -80,25 +80,18 @@ class OpenTun(eventBusClient.eventBusClient):
     #======================== public ==========================================
     
     def close(self):
-        self.tunReadThread.close()
         
-        # Send a packet to openTun interface to break out of blocking read.
-        attempts = 0
-        while self.tunReadThread.isAlive() and attempts < 3:
-            attempts += 1
-            try:
-                log.debug('Sending UDP packet to close openTun')
-                sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
-                # Destination must route through the TUN host, but not be the host itself.
-                # OK if host does not really exist.
-                dst      = IPV6PREFIX + IPV6HOST
-                dst[15] += 1
-                # Payload and destination port are arbitrary
-                sock.sendto('stop', (u.formatIPv6Addr(dst),18004))
-                # Give thread some time to exit
-                time.sleep(0.05)
-            except Exception as err:
-                log.error('Unable to send UDP to close tunReadThread: {0}'.join(err))
+        # stop writing to the interface
+        self.unregister(
+            sender        = self.WILDCARD,
+            signal        = 'v6ToInternet',
+            callback      = self._v6ToInternet_notif,
+        )
+        
+        self.tunReadThread.close()
+        self.tunReadThread.join(self.CLOSE_TIMEOUT)
+        if self.tunReadThread.isAlive():
+            log.error('tunReadThread did not stop within {0}s'.format(self.CLOSE_TIMEOUT))
     
     #======================== private =========================================
     
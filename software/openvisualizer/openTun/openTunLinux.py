@@ -9,12 +9,15 @@ log.addHandler(NullHandler())
 import threading
 import time
 import os
+import io
 import sys
 import struct
 import traceback
+import collections
 
 import openvisualizer_utils as u
 import openTun
+import IoLoop
 from   fcntl     import ioctl
 from   eventBus  import eventBusClient
 
@@ -33,16 +36,21 @@ TUNSETIFF          = 0x400454ca
 
 #============================ helper classes ==================================
 
-class TunReadThread(threading.Thread):
+class TunReader(object):
     '''
-    \brief Thread which continously reads input from a TUN interface.
+    \brief Reads input from a TUN interface, when an IoLoop finds it readable.
     
     When data is received from the interface, it calls a callback configured
     during instantiation.
+    
+    Each time the interface becomes readable, all packets waiting in it are
+    read, into the same buffer, before returning to the loop.
     '''
     
     ETHERNET_MTU        = 1500
     IPv6_HEADER_LENGTH  = 40
+    TUN_HEADER_LENGTH   = len(VIRTUALTUNID)
+    MAX_BATCH           = 64   # maximum number of packets read per wakeup
     
     def __init__(self,tunIf,callback):
     
@@ -51,59 +59,54 @@ class TunReadThread(threading.Thread):
         self.callback             = callback
         
         # local variables
-        self.goOn                 = True
-        
-        # initialize parent
-        threading.Thread.__init__(self)
-        
-        # give this thread a name
-        self.name                 = 'TunReadThread'
-        
-        # start myself
-        self.start()
+        IoLoop.setNonBlocking(self.tunIf)
+        self.tunFile              = io.FileIO(self.tunIf,'rb',closefd=False)
+        self.buf                  = bytearray(self.TUN_HEADER_LENGTH+self.ETHERNET_MTU)
     
-    def run(self):
-        try:
-            p =[]
-            
-            while self.goOn:
-                
-                # wait for data
-                p =  os.read(self.tunIf,self.ETHERNET_MTU)
-           
-                # convert input from a string to a byte list
-                p = [ord(b) for b in p]
-                
-                # debug info
-                log.debug('packet captured on tun interface: {0}'.format(u.formatBuf(p)))
-    
-                # remove tun ID octets
-                p = p[4:]
-                
-                # make sure it's an IPv6 packet (i.e., starts with 0x6x)
-                if (p[0]&0xf0) != 0x60:
-                    log.debug('this is not an IPv6 packet')
-                    continue
-                
-                # because of the nature of tun for Windows, p contains ETHERNET_MTU
-                # bytes. Cut at length of IPv6 packet.
-                p = p[:self.IPv6_HEADER_LENGTH+256*p[4]+p[5]]
-                
-                # call the callback
-                self.callback(p)
-        except Exception as err:
-            errMsg=u.formatCrashMessage(self.name,err)
-            print errMsg
-            log.critical(errMsg)
-            sys.exit(1)
-            
     #======================== public ==========================================
     
-    def close(self):
-        self.goOn = False
+    def readPackets(self,fd):
+        '''
+        \brief Read the packets which are ready, up to MAX_BATCH.
+        
+        \param fd The file descriptor of the interface, as passed by the IoLoop.
+        '''
+        for _ in range(self.MAX_BATCH):
+            p = self._readPacket()
+            if p==None:
+                break
+            if p:
+                self.callback(p)
     
     #======================== private =========================================
     
+    def _readPacket(self):
+        '''
+        \brief Read one packet from the TUN interface.
+        
+        \returns The IPv6 packet, as a list of bytes; an empty list if the
+            packet was dropped; None if no packet is ready.
+        '''
+        
+        numBytes = self.tunFile.readinto(self.buf)
+        if not numBytes:
+            return None
+        
+        # debug info
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('packet captured on tun interface: {0}'.format(u.formatBuf(list(self.buf[:numBytes]))))
+        
+        # make sure it's an IPv6 packet (i.e., starts with 0x6x), after the tun ID octets
+        start = self.TUN_HEADER_LENGTH
+        if numBytes<start+self.IPv6_HEADER_LENGTH or (self.buf[start]&0xf0) != 0x60:
+            log.debug('this is not an IPv6 packet')
+            return []
+        
+        # cut at length of IPv6 packet
+        end = start+self.IPv6_HEADER_LENGTH+256*self.buf[start+4]+self.buf[start+5]
+        
+        return list(self.buf[start:min(end,numBytes)])
+
 #============================ main class ======================================
 
 class OpenTunLinux(openTun.OpenTun):
@@ -116,11 +119,21 @@ class OpenTunLinux(openTun.OpenTun):
         # log
         log.debug("create instance")
         
+        # local variables
+        self.txQueue              = collections.deque()
+        self.txLock               = threading.Lock()
+        
         # initialize parent class
         openTun.OpenTun.__init__(self)
     
     #======================== public ==========================================
     
+    def getIoLoop(self):
+        '''
+        \brief The IoLoop reading the TUN interface, e.g. to also wait on sockets.
+        '''
+        return self.tunReadThread
+    
     #======================== private =========================================
     
     def _v6ToInternet_notif(self,sender,signal,data):
@@ -129,17 +142,26 @@ class OpenTunLinux(openTun.OpenTun):
         
         This function forwards the data to the the TUN interface.
         Read from tun interface and forward to 6lowPAN
-        '''
         
-        data = VIRTUALTUNID + data
+        Packets are queued; whichever thread finds the interface free writes
+        all the queued packets, including those queued by other threads in
+        the meantime.
+        '''
         
-        # convert data to string
-        data  = ''.join([chr(b) for b in data])
+        self.txQueue.append(bytearray(VIRTUALTUNID+data))
         
+        while self.txQueue and self.txLock.acquire(False):
+            try:
+                while self.txQueue:
+                    self._writePacket(self.txQueue.popleft())
+            finally:
+                self.txLock.release()
+    
+    def _writePacket(self,frame):
         try:
             # write over tuntap interface
-            os.write(self.tunIf, data)
-            log.debug("data dispatched to tun correctly {0}, {1}".format(signal,sender))
+            os.write(self.tunIf, frame)
+            log.debug("data dispatched to tun correctly")
         except Exception as err:
             errMsg=u.formatCriticalMessage(err)
             print errMsg
@@ -193,11 +215,16 @@ class OpenTunLinux(openTun.OpenTun):
         '''
         \brief Creates and starts the thread to read messages arriving from 
                the TUN interface
+        
+        This thread is an IoLoop, which other sockets can share, see
+        getIoLoop().
         '''
-        return TunReadThread(
+        ioLoop = IoLoop.IoLoop(name='TunReadThread')
+        ioLoop.register(
             self.tunIf,
-            self._v6ToMesh_notif
+            TunReader(self.tunIf,self._v6ToMesh_notif).readPackets,
         )
+        return ioLoop
    
     #======================== helpers =========================================
     
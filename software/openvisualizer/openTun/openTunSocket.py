@@ -0,0 +1,172 @@
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('openTunSocket')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+import time
+import errno
+import socket
+import threading
+import collections
+
+import openTunLinux
+import pcapFile
+
+#============================ main class ======================================
+
+class OpenTunSocket(openTunLinux.OpenTunLinux):
+    '''
+    \brief Stand-in for the TUN interface, which needs neither root nor
+        /dev/net/tun.
+    
+    The interface is one end of a socket pair, which keeps packet boundaries
+    like a TUN device does. The other end plays the host: packets injected
+    there are read exactly as OpenTunLinux reads the TUN interface, and
+    packets written to the interface are collected there.
+    '''
+    
+    MAX_RECEIVED         = 1000 # number of received packets kept
+    FRAME_MAX_LENGTH     = openTunLinux.TunReader.TUN_HEADER_LENGTH+openTunLinux.TunReader.ETHERNET_MTU
+    
+    def __init__(self):
+        # log
+        log.debug("create instance")
+        
+        # local variables
+        self.receivedCond         = threading.Condition()
+        self.received             = collections.deque(maxlen=self.MAX_RECEIVED)
+        self.numInjected          = 0
+        self.numReceived          = 0
+        self.recorder             = None
+        
+        # initialize parent class
+        openTunLinux.OpenTunLinux.__init__(self)
+        
+        # collect what is written to the interface
+        self.getIoLoop().register(self.hostSock.fileno(),self._hostReadable)
+    
+    #======================== public ==========================================
+    
+    def inject(self,packet):
+        '''
+        \brief Send an IPv6 packet to the mesh, as if the host routed it to
+            the interface.
+        
+        \param packet The IPv6 packet, as a list of bytes.
+        '''
+        self.hostSock.send(bytearray(openTunLinux.VIRTUALTUNID+packet))
+        with self.receivedCond:
+            self.numInjected += 1
+    
+    def replayPcap(self,filename,speed=None):
+        '''
+        \brief Inject the IPv6 packets of a capture file.
+        
+        \param filename The capture file, see pcapFile.readPcap().
+        \param speed    How much faster than captured to replay, e.g. 1 for
+            the original pace; None to inject as fast as possible.
+        
+        \returns The number of packets injected.
+        '''
+        numPackets = 0
+        startTime  = time.time()
+        firstTs    = None
+        for (ts,packet) in pcapFile.readPcap(filename):
+            if speed:
+                if firstTs==None:
+                    firstTs = ts
+                delay = startTime+(ts-firstTs)/speed-time.time()
+                if delay>0:
+                    time.sleep(delay)
+            self.inject(packet)
+            numPackets += 1
+        return numPackets
+    
+    def startRecording(self,filename):
+        '''
+        \brief Write the packets received from now on to a capture file.
+        '''
+        with self.receivedCond:
+            self._stopRecording()
+            self.recorder         = pcapFile.PcapWriter(filename)
+    
+    def stopRecording(self):
+        with self.receivedCond:
+            self._stopRecording()
+    
+    def waitReceived(self,numPackets,timeout=None):
+        '''
+        \brief Wait until numPackets packets have been received in total.
+        
+        \returns True if they have, False on timeout.
+        '''
+        endTime = None if timeout==None else time.time()+timeout
+        with self.receivedCond:
+            while self.numReceived<numPackets:
+                if endTime==None:
+                    self.receivedCond.wait()
+                else:
+                    remaining = endTime-time.time()
+                    if remaining<=0:
+                        return False
+                    self.receivedCond.wait(remaining)
+            return True
+    
+    def getReceived(self):
+        '''
+        \brief The last MAX_RECEIVED packets received from the mesh, each as
+            a list of bytes.
+        '''
+        with self.receivedCond:
+            return list(self.received)
+    
+    def getStats(self):
+        with self.receivedCond:
+            return {
+                'numInjected':    self.numInjected,
+                'numReceived':    self.numReceived,
+            }
+    
+    def close(self):
+        openTunLinux.OpenTunLinux.close(self)
+        self.stopRecording()
+        self.hostSock.close()
+        self.tunSock.close()
+    
+    #======================== private =========================================
+    
+    def _createTunIf(self):
+        '''
+        \brief Create the socket pair standing for the TUN interface.
+        
+        \return The file descriptor of the interface end.
+        '''
+        (self.tunSock,self.hostSock) = socket.socketpair(socket.AF_UNIX,socket.SOCK_SEQPACKET)
+        return self.tunSock.fileno()
+    
+    def _hostReadable(self,fd):
+        while True:
+            try:
+                frame = self.hostSock.recv(self.FRAME_MAX_LENGTH,socket.MSG_DONTWAIT)
+            except socket.error as err:
+                if err.errno in [errno.EAGAIN,errno.EWOULDBLOCK]:
+                    # nothing more to read
+                    return
+                raise
+            if not frame:
+                return
+            packet = list(bytearray(frame)[len(openTunLinux.VIRTUALTUNID):])
+            with self.receivedCond:
+                self.received.append(packet)
+                self.numReceived += 1
+                if self.recorder:
+                    self.recorder.write(packet,time.time())
+                self.receivedCond.notifyAll()
+    
+    def _stopRecording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder         = None
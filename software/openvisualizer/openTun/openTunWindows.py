@@ -87,6 +87,9 @@ class TunReadThread(threading.Thread):
                 try:
                     l, p = win32file.ReadFile(self.tunIf, rxbuffer, self.overlappedRx)
                     win32event.WaitForSingleObject(self.overlappedRx.hEvent, win32event.INFINITE)
+                    if not self.goOn:
+                        # woken up by close()
+                        break
                     self.overlappedRx.Offset = self.overlappedRx.Offset + len(p)
                 except Exception as err:
                     print err
@@ -119,6 +122,9 @@ class TunReadThread(threading.Thread):
     
     def close(self):
         self.goOn = False
+        
+        # break out of the pending read
+        win32event.SetEvent(self.overlappedRx.hEvent)
     
     #======================== private =========================================
     
@@ -0,0 +1,366 @@
+'''
+\brief Read and write IPv6 packets in libpcap capture files, and write
+    link-layer frames in pcapng capture files.
+
+Only the classic libpcap format is read, in either byte order, with
+micro- or nanosecond timestamps.
+'''
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('pcapFile')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+import os
+import stat
+import errno
+import struct
+import threading
+
+#============================ defines =========================================
+
+MAGIC_USEC          = 0xa1b2c3d4
+MAGIC_NSEC          = 0xa1b23c4d
+
+LINKTYPE_NULL       = 0
+LINKTYPE_ETHERNET   = 1
+LINKTYPE_RAW        = 101
+LINKTYPE_LOOP       = 108
+LINKTYPE_LINUX_SLL  = 113
+LINKTYPE_IPV6       = 229
+LINKTYPE_IEEE802_15_4_NOFCS = 230
+
+BLOCK_SHB           = 0x0a0d0d0a
+BLOCK_IDB           = 0x00000001
+BLOCK_EPB           = 0x00000006
+BYTE_ORDER_MAGIC    = 0x1a2b3c4d
+
+ETHERTYPE_IPV6      = 0x86dd
+
+SNAPLEN             = 65535
+
+class PcapException(Exception):
+    pass
+
+#============================ reading =========================================
+
+def readPcap(filename):
+    '''
+    \brief Iterate over the IPv6 packets of a capture file.
+    
+    Packets which are not IPv6 are skipped.
+    
+    \param filename The capture file.
+    
+    \returns A generator of (timestamp,packet) tuples, the timestamp in
+        seconds and the packet as a list of bytes, starting at the IPv6
+        header.
+    '''
+    with open(filename,'rb') as f:
+        
+        # global header
+        header = f.read(24)
+        if len(header)<24:
+            raise PcapException('{0}: not a pcap file'.format(filename))
+        for endian in ['<','>']:
+            magic = struct.unpack(endian+'I',header[:4])[0]
+            if magic in [MAGIC_USEC,MAGIC_NSEC]:
+                break
+        else:
+            raise PcapException('{0}: not a pcap file'.format(filename))
+        tsUnit   = 1e-9 if magic==MAGIC_NSEC else 1e-6
+        linkType = struct.unpack(endian+'I',header[20:24])[0]
+        
+        # packets
+        while True:
+            recordHeader = f.read(16)
+            if len(recordHeader)<16:
+                break
+            (tsSec,tsFrac,inclLen,origLen) = struct.unpack(endian+'IIII',recordHeader)
+            data = f.read(inclLen)
+            if len(data)<inclLen:
+                log.warning('{0}: truncated last packet'.format(filename))
+                break
+            packet = _getIPv6(linkType,bytearray(data))
+            if packet!=None:
+                yield (tsSec+tsFrac*tsUnit,list(packet))
+
+def _getIPv6(linkType,frame):
+    '''
+    \brief The IPv6 packet in a frame, None if it holds something else.
+    '''
+    if   linkType in [LINKTYPE_RAW,LINKTYPE_IPV6]:
+        packet = frame
+    elif linkType in [LINKTYPE_NULL,LINKTYPE_LOOP]:
+        packet = frame[4:]
+    elif linkType==LINKTYPE_ETHERNET:
+        if len(frame)<14 or (frame[12]<<8|frame[13])!=ETHERTYPE_IPV6:
+            return None
+        packet = frame[14:]
+    elif linkType==LINKTYPE_LINUX_SLL:
+        if len(frame)<16 or (frame[14]<<8|frame[15])!=ETHERTYPE_IPV6:
+            return None
+        packet = frame[16:]
+    else:
+        raise PcapException('unsupported link type {0}'.format(linkType))
+    if not packet or (packet[0]&0xf0)!=0x60:
+        return None
+    return packet
+
+#============================ writing =========================================
+
+class PcapWriter(object):
+    '''
+    \brief Write IPv6 packets to a capture file, without link-layer header.
+    '''
+    
+    def __init__(self,filename):
+        self.file                 = open(filename,'wb')
+        self.file.write(struct.pack('<IHHiIII',MAGIC_USEC,2,4,0,0,SNAPLEN,LINKTYPE_RAW))
+    
+    def write(self,packet,timestamp):
+        '''
+        \brief Append a packet.
+        
+        \param packet    The IPv6 packet, as a list of bytes or a bytearray.
+        \param timestamp The time it was seen, in seconds since the epoch.
+        '''
+        (tsSec,tsUsec) = divmod(int(round(timestamp*1e6)),1000000)
+        self.file.write(struct.pack('<IIII',tsSec,tsUsec,len(packet),len(packet)))
+        self.file.write(bytearray(packet))
+    
+    def close(self):
+        self.file.close()
+
+class PcapngWriter(object):
+    '''
+    \brief Write link-layer frames to pcapng capture files, buffered.
+    
+    write() only appends the frame to a memory buffer; flush() writes all
+    that is buffered in a single call, and is meant to be called from
+    another thread than write(), so that a slow disk or a named pipe nobody
+    reads never holds the writer back. What does not fit in the buffer is
+    dropped and counted.
+    
+    With maxFileSize, the capture continues in a new file once the current
+    one exceeds it: capture.pcapng, then capture.1.pcapng,
+    capture.2.pcapng... A named pipe is never rotated.
+    
+    A named pipe is written without blocking: while nobody reads it, or
+    while its reader lags behind, frames stay in the buffer, and those which
+    do not fit are dropped. When its reader goes away, the next one gets a
+    new capture, with its own headers.
+    '''
+    
+    MAX_BUFFERED         = 4*1024*1024 # bytes
+    
+    def __init__(self,filename,linkType,maxFileSize=None,maxBuffered=MAX_BUFFERED):
+        '''
+        \param filename    The capture file, or a named pipe. It is opened by
+            the first flush(), since opening a named pipe waits for a reader.
+        \param linkType    The link type of the frames, e.g.
+            LINKTYPE_IEEE802_15_4_NOFCS.
+        \param maxFileSize The size, in bytes, above which to start a new
+            file; None to never rotate.
+        \param maxBuffered The size, in bytes, of the buffer.
+        '''
+        
+        # store params
+        self.filename             = filename
+        self.linkType             = linkType
+        self.maxFileSize          = maxFileSize
+        self.maxBuffered          = maxBuffered
+        
+        # local variables
+        self.bufferLock           = threading.Lock()
+        self.fileLock             = threading.Lock()
+        self.buffer               = bytearray()
+        self.fd                   = None
+        self.pending              = bytearray() # written to the file only in part
+        self.fileSize             = 0
+        self.fileIndex            = 0
+        self.isPipe               = os.path.exists(filename) and stat.S_ISFIFO(os.stat(filename).st_mode)
+        self.numWritten           = 0
+        self.numDropped           = 0
+    
+    #======================== public ==========================================
+    
+    def write(self,frame,timestamp):
+        '''
+        \brief Append a frame.
+        
+        \param frame     The frame, as a list of bytes or a bytearray.
+        \param timestamp The time it was seen, in seconds since the epoch.
+        '''
+        frame     = bytearray(frame)
+        padding   = -len(frame)%4
+        blockLen  = 32+len(frame)+padding
+        ts        = int(round(timestamp*1e6))
+        with self.bufferLock:
+            if len(self.buffer)+blockLen>self.maxBuffered:
+                self.numDropped  += 1
+                return
+            self.buffer          += struct.pack('<IIIIIII',BLOCK_EPB,blockLen,0,ts>>32,ts&0xffffffff,len(frame),len(frame))
+            self.buffer          += frame
+            self.buffer          += '\x00'*padding
+            self.buffer          += struct.pack('<I',blockLen)
+            self.numWritten      += 1
+    
+    def getBuffered(self):
+        '''
+        \brief The number of bytes waiting for flush().
+        '''
+        with self.bufferLock:
+            return len(self.buffer)
+    
+    def getStats(self):
+        with self.bufferLock:
+            return {
+                'numWritten':     self.numWritten,
+                'numDropped':     self.numDropped,
+                'fileIndex':      self.fileIndex,
+            }
+    
+    def flush(self):
+        '''
+        \brief Write what is buffered to the capture file.
+        '''
+        with self.fileLock:
+            
+            # finish what the reader of the pipe did not take last time
+            if self.pending:
+                self._write(self.pending)
+                if self.pending:
+                    return
+            
+            with self.bufferLock:
+                (data,self.buffer) = (self.buffer,bytearray())
+            if not data:
+                return
+            if self.fd==None:
+                if self.fileSize and not self.isPipe:
+                    # the previous file is full, continue in the next one
+                    with self.bufferLock:
+                        self.fileIndex += 1
+                self._open()
+            if self.fd==None or self.pending:
+                # nobody reads the pipe, or not fast enough; keep the frames
+                # for later
+                with self.bufferLock:
+                    self.buffer       = data+self.buffer
+                return
+            self._write(data)
+            if self.maxFileSize and not self.isPipe and self.fileSize>self.maxFileSize:
+                self._close()
+    
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            with self.fileLock:
+                self._close()
+    
+    #======================== private =========================================
+    
+    def _open(self):
+        '''
+        \brief Open the current file, and start it with the section and
+            interface description blocks. Call with fileLock held.
+        
+        A named pipe nobody reads is left closed.
+        '''
+        if self.fileIndex:
+            (root,ext)            = os.path.splitext(self.filename)
+            filename              = '{0}.{1}{2}'.format(root,self.fileIndex,ext)
+        else:
+            filename              = self.filename
+        if self.isPipe:
+            try:
+                self.fd           = os.open(filename,os.O_WRONLY|os.O_NONBLOCK)
+            except OSError as err:
+                if err.errno==errno.ENXIO:
+                    return
+                raise
+        else:
+            self.fd               = os.open(filename,os.O_WRONLY|os.O_CREAT|os.O_TRUNC,0644)
+        log.info('writing capture to {0}'.format(filename))
+        self.fileSize             = 0
+        header                    = struct.pack('<IIIHHqI',BLOCK_SHB,28,BYTE_ORDER_MAGIC,1,0,-1,28)
+        header                   += struct.pack('<IIHHII',BLOCK_IDB,20,self.linkType,0,SNAPLEN,20)
+        self._write(bytearray(header))
+    
+    def _write(self,data):
+        '''
+        \brief Write data to the file, keeping in pending what a pipe does
+            not take. Call with fileLock held.
+        '''
+        numWritten                = 0
+        try:
+            while numWritten<len(data):
+                numWritten       += os.write(self.fd,buffer(data,numWritten))
+        except OSError as err:
+            if err.errno==errno.EAGAIN:
+                # the reader of the pipe lags behind
+                pass
+            elif err.errno==errno.EPIPE:
+                # the reader of the pipe is gone
+                log.warning('reader of {0} gone, {1} bytes lost'.format(self.filename,len(data)-numWritten))
+                self._close()
+                return
+            else:
+                raise
+        self.fileSize            += numWritten
+        self.pending              = data[numWritten:]
+    
+    def _close(self):
+        '''
+        \brief Close the file, dropping what a pipe did not take. Call with
+            fileLock held.
+        '''
+        if self.fd!=None:
+            os.close(self.fd)
+            self.fd               = None
+        self.pending              = bytearray()
+
+def readPcapng(filename):
+    '''
+    \brief Iterate over the frames of a pcapng capture file.
+    
+    Only the enhanced packet blocks of the first interface are read, as
+    written by PcapngWriter; other blocks are skipped.
+    
+    \param filename The capture file.
+    
+    \returns A generator of (timestamp,frame) tuples, the timestamp in
+        seconds and the frame as a list of bytes.
+    '''
+    with open(filename,'rb') as f:
+        
+        # section header block
+        header = f.read(12)
+        if len(header)<12 or struct.unpack('<I',header[:4])[0]!=BLOCK_SHB:
+            raise PcapException('{0}: not a pcapng file'.format(filename))
+        for endian in ['<','>']:
+            if struct.unpack(endian+'I',header[8:12])[0]==BYTE_ORDER_MAGIC:
+                break
+        else:
+            raise PcapException('{0}: not a pcapng file'.format(filename))
+        f.seek(struct.unpack(endian+'I',header[4:8])[0])
+        
+        # other blocks
+        while True:
+            blockHeader = f.read(8)
+            if len(blockHeader)<8:
+                break
+            (blockType,blockLen) = struct.unpack(endian+'II',blockHeader)
+            body = f.read(blockLen-8)
+            if len(body)<blockLen-8:
+                log.warning('{0}: truncated last block'.format(filename))
+                break
+            if blockType!=BLOCK_EPB:
+                continue
+            (interfaceId,tsHigh,tsLow,capLen,origLen) = struct.unpack(endian+'IIIII',body[:20])
+            yield (((tsHigh<<32)|tsLow)*1e-6,list(bytearray(body[20:20+capLen])))
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                                   # openTun/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import time
+import Queue
+import socket
+
+import pytest
+
+if os.name!='posix':
+    pytest.skip('IoLoop only runs on POSIX systems')
+
+import IoLoop
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_IoLoop.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_IoLoop')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_IoLoop',
+                   'IoLoop',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT = 2 # s
+
+#============================ helpers =========================================
+
+@pytest.fixture(params=[True,False])
+def ioLoop(request,monkeypatch):
+    '''
+    \brief An IoLoop, using epoll or select.
+    '''
+    if not request.param:
+        monkeypatch.delattr(IoLoop.select,'epoll',raising=False)
+    elif not hasattr(IoLoop.select,'epoll'):
+        pytest.skip('no epoll on this system')
+    returnVal = IoLoop.IoLoop()
+    def fin():
+        returnVal.close()
+        returnVal.join(TIMEOUT)
+    request.addfinalizer(fin)
+    return returnVal
+
+def makeReader(sock,received):
+    def readable(fd):
+        received.put((sock,sock.recv(4096)))
+    return readable
+
+#============================ tests ===========================================
+
+def test_multiplex(ioLoop):
+
+    log.debug("\n---------- test_multiplex")
+    
+    received = Queue.Queue()
+    pairs    = [socket.socketpair() for _ in range(3)]
+    for (a,b) in pairs:
+        ioLoop.register(a.fileno(),makeReader(a,received))
+    
+    # data on any socket reaches its callback
+    for (i,(a,b)) in enumerate(reversed(pairs)):
+        b.send(str(i))
+        assert received.get(timeout=TIMEOUT)==(a,str(i))
+    
+    # an unregistered socket is not read anymore
+    ioLoop.unregister(pairs[0][0].fileno())
+    pairs[0][1].send('x')
+    pairs[1][1].send('y')
+    assert received.get(timeout=TIMEOUT)==(pairs[1][0],'y')
+    with pytest.raises(Queue.Empty):
+        received.get(timeout=0.1)
+    
+    for (a,b) in pairs:
+        a.close()
+        b.close()
+
+def test_writable(ioLoop):
+
+    log.debug("\n---------- test_writable")
+    
+    (a,b)    = socket.socketpair()
+    a.setblocking(False)
+    writable = Queue.Queue()
+    
+    # fill the socket up
+    try:
+        while True:
+            a.send('x'*4096)
+    except socket.error:
+        pass
+    ioLoop.register(a.fileno(),lambda fd: None,writable.put)
+    with pytest.raises(Queue.Empty):
+        writable.get(timeout=0.1)
+    
+    # once the other end reads, the socket is writable
+    b.setblocking(False)
+    try:
+        while True:
+            b.recv(65536)
+    except socket.error:
+        pass
+    assert writable.get(timeout=TIMEOUT)==a.fileno()
+    
+    # registering without a write callback stops waiting for it
+    ioLoop.register(a.fileno(),lambda fd: None)
+    time.sleep(0.1)
+    while not writable.empty():
+        writable.get()
+    with pytest.raises(Queue.Empty):
+        writable.get(timeout=0.1)
+    
+    a.close()
+    b.close()
+
+def test_callbackError(ioLoop):
+
+    log.debug("\n---------- test_callbackError")
+    
+    received = Queue.Queue()
+    (a,b)    = socket.socketpair()
+    calls    = []
+    def failing(fd):
+        calls.append(a.recv(4096))
+        raise ValueError('failing callback')
+    ioLoop.register(a.fileno(),failing)
+    b.send('x')
+    startTime = time.time()
+    while not calls and time.time()-startTime<TIMEOUT:
+        time.sleep(0.01)
+    
+    # the loop survives a failing callback
+    (c,d)    = socket.socketpair()
+    ioLoop.register(c.fileno(),makeReader(c,received))
+    d.send('y')
+    assert received.get(timeout=TIMEOUT)==(c,'y')
+    assert calls==['x']
+    assert ioLoop.isAlive()
+
+def test_close(ioLoop):
+
+    log.debug("\n---------- test_close")
+    
+    (a,b) = socket.socketpair()
+    ioLoop.register(a.fileno(),lambda fd: None)
+    
+    # nothing to read, yet the loop stops at once
+    startTime = time.time()
+    ioLoop.close()
+    ioLoop.join(TIMEOUT)
+    assert not ioLoop.isAlive()
+    assert time.time()-startTime<0.5
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                                   # openTun/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import Queue
+import socket
+import threading
+import collections
+
+import pytest
+
+if os.name!='posix':
+    pytest.skip('openTunLinux only runs on Linux')
+
+import openTunLinux
+import IoLoop
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_openTunLinux.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_openTunLinux')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_openTunLinux',
+                   'openTunLinux',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT = 2 # s
+
+#============================ helpers =========================================
+
+def makeIPv6(payload):
+    '''
+    \brief Build an IPv6 packet, as a list of bytes.
+    '''
+    return [0x60,0,0,0,len(payload)>>8,len(payload)&0xff,17,64]+[0]*32+payload
+
+def makeFrame(packet):
+    '''
+    \brief What the TUN interface delivers for a packet.
+    '''
+    return ''.join([chr(b) for b in openTunLinux.VIRTUALTUNID+packet])
+
+@pytest.fixture
+def tunPair(request):
+    '''
+    \brief A socket pair which, like a TUN interface, keeps packet boundaries.
+    '''
+    (tunSide,testSide) = socket.socketpair(socket.AF_UNIX,socket.SOCK_SEQPACKET)
+    def fin():
+        tunSide.close()
+        testSide.close()
+    request.addfinalizer(fin)
+    return (tunSide,testSide)
+
+#============================ tests ===========================================
+
+def test_read(tunPair):
+
+    log.debug("\n---------- test_read")
+    
+    (tunSide,testSide) = tunPair
+    received           = Queue.Queue()
+    
+    packets = [
+        makeIPv6([1,2,3]),
+        makeIPv6(range(200)),
+        makeIPv6([4]),
+    ]
+    
+    # packets waiting together are all delivered, in order
+    for p in packets:
+        testSide.send(makeFrame(p))
+    testSide.send(makeFrame([0x45]+[0]*50))                   # IPv4, dropped
+    testSide.send(makeFrame(makeIPv6([5,6])+[0xff]*10))       # trailing bytes cut
+    
+    reader = openTunLinux.TunReader(tunSide.fileno(),received.put)
+    ioLoop = IoLoop.IoLoop()
+    ioLoop.register(tunSide.fileno(),reader.readPackets)
+    try:
+        for p in packets:
+            assert received.get(timeout=TIMEOUT)==p
+        assert received.get(timeout=TIMEOUT)==makeIPv6([5,6])
+        
+        # and so are the packets arriving later
+        testSide.send(makeFrame(makeIPv6([7])))
+        assert received.get(timeout=TIMEOUT)==makeIPv6([7])
+    finally:
+        ioLoop.close()
+        ioLoop.join(TIMEOUT)
+    assert not ioLoop.isAlive()
+    assert received.empty()
+
+def test_readBatch(tunPair,monkeypatch):
+
+    log.debug("\n---------- test_readBatch")
+    
+    monkeypatch.setattr(openTunLinux.TunReader,'MAX_BATCH',2)
+    (tunSide,testSide) = tunPair
+    received           = []
+    
+    for i in range(3):
+        testSide.send(makeFrame(makeIPv6([i])))
+    
+    # at most MAX_BATCH packets per call, none blocks when nothing is ready
+    reader = openTunLinux.TunReader(tunSide.fileno(),received.append)
+    reader.readPackets(tunSide.fileno())
+    assert received==[makeIPv6([0]),makeIPv6([1])]
+    reader.readPackets(tunSide.fileno())
+    reader.readPackets(tunSide.fileno())
+    assert received==[makeIPv6([0]),makeIPv6([1]),makeIPv6([2])]
+
+def test_write(tunPair):
+
+    log.debug("\n---------- test_write")
+    
+    (tunSide,testSide) = tunPair
+    
+    # a bare instance, without TUN interface nor read thread
+    tun         = openTunLinux.OpenTunLinux.__new__(openTunLinux.OpenTunLinux)
+    tun.tunIf   = tunSide.fileno()
+    tun.txQueue = collections.deque()
+    tun.txLock  = threading.Lock()
+    
+    packet = makeIPv6([1,2,3])
+    tun._v6ToInternet_notif(None,'v6ToInternet',packet)
+    assert testSide.recv(2048)==makeFrame(packet)
+    
+    # packets queued while another thread writes are written by that thread
+    tun.txLock.acquire()
+    tun._v6ToInternet_notif(None,'v6ToInternet',makeIPv6([4]))
+    assert len(tun.txQueue)==1
+    tun.txLock.release()
+    tun._v6ToInternet_notif(None,'v6ToInternet',makeIPv6([5]))
+    assert testSide.recv(2048)==makeFrame(makeIPv6([4]))
+    assert testSide.recv(2048)==makeFrame(makeIPv6([5]))
+    assert not tun.txQueue
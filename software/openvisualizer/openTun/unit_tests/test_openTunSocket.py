@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                                   # openTun/
+sys.path.insert(0, os.path.join(here, '..', '..','eventBus','PyDispatcher-2.0.3'))   # PyDispatcher-2.0.3/
+
+import gc
+import Queue
+import struct
+
+import pytest
+
+if os.name!='posix':
+    pytest.skip('openTunSocket only runs on POSIX systems')
+
+import openTun
+import openTunSocket
+import pcapFile
+from openLbr  import openLbr
+from eventBus import eventBusClient
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_openTunSocket.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_openTunSocket')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_openTunSocket',
+                   'openTunSocket',
+                   'pcapFile',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+TIMEOUT   = 2 # s
+
+MOTE      = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x02]
+DAGROOT   = [0x14,0x15,0x92,0x00,0x00,0x00,0x00,0x01]
+HOST_ADDR = [0x20,0x01,0x0d,0xb8]+[0x00]*11+[0x01]
+
+#============================ helpers =========================================
+
+def makeIPv6(payload,dst=openTun.IPV6PREFIX+MOTE):
+    '''
+    \brief Build a UDP-like IPv6 packet from the Internet, as a list of bytes.
+    '''
+    return [0x60,0,0,0,len(payload)>>8,len(payload)&0xff,17,64]+HOST_ADDR+dst+payload
+
+class MeshSink(eventBusClient.eventBusClient):
+    '''
+    \brief Answers source route requests, and collects what goes to the mesh.
+    '''
+    def __init__(self):
+        self.toMesh = Queue.Queue()
+        eventBusClient.eventBusClient.__init__(
+            self,
+            name                  = 'MeshSink',
+            registrations         = [
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'getSourceRoute',
+                    'callback'    : self._getSourceRoute_notif,
+                },
+                {
+                    'sender'      : self.WILDCARD,
+                    'signal'      : 'bytesToMesh',
+                    'callback'    : self._bytesToMesh_notif,
+                },
+            ]
+        )
+    def _getSourceRoute_notif(self,sender,signal,data):
+        return [data,DAGROOT]
+    def _bytesToMesh_notif(self,sender,signal,data):
+        self.toMesh.put(data)
+
+@pytest.fixture
+def tun(request):
+    # the event bus only holds weak references; make sure the LBRs and sinks
+    # of earlier tests are gone, or they would handle the packets too
+    gc.collect()
+    returnVal = openTunSocket.OpenTunSocket()
+    request.addfinalizer(returnVal.close)
+    return returnVal
+
+#============================ tests ===========================================
+
+def test_toMesh(tun):
+
+    log.debug("\n---------- test_toMesh")
+    
+    lbr   = openLbr.OpenLbr()
+    lbr._setPrefix_notif(None,'networkPrefix',openTun.IPV6PREFIX)
+    sink  = MeshSink()
+    
+    # injected packets go through the LBR to the mesh
+    for i in range(10):
+        tun.inject(makeIPv6([i]*8))
+    for i in range(10):
+        (nextHop,lowpan) = sink.toMesh.get(timeout=TIMEOUT)
+        assert nextHop==MOTE
+        assert lowpan[-8:]==[i]*8
+    assert tun.getStats()['numInjected']==10
+
+def test_toInternet(tun,tmpdir):
+
+    log.debug("\n---------- test_toInternet")
+    
+    filename = str(tmpdir.join('received.pcap'))
+    sender   = eventBusClient.eventBusClient('test_toInternet',[])
+    
+    # packets for the Internet are written to the interface, and recorded
+    tun.startRecording(filename)
+    for i in range(3):
+        sender.dispatch('v6ToInternet',makeIPv6([i],dst=HOST_ADDR))
+    assert tun.waitReceived(3,TIMEOUT)
+    tun.stopRecording()
+    assert tun.getReceived()==[makeIPv6([i],dst=HOST_ADDR) for i in range(3)]
+    assert [p for (ts,p) in pcapFile.readPcap(filename)]==tun.getReceived()
+    assert not tun.waitReceived(4,0.05)
+
+def test_replayPcap(tun,tmpdir):
+
+    log.debug("\n---------- test_replayPcap")
+    
+    filename = str(tmpdir.join('capture.pcap'))
+    writer   = pcapFile.PcapWriter(filename)
+    for i in range(5):
+        writer.write(makeIPv6([i]),1000+0.01*i)
+    writer.close()
+    
+    lbr      = openLbr.OpenLbr()
+    lbr._setPrefix_notif(None,'networkPrefix',openTun.IPV6PREFIX)
+    sink     = MeshSink()
+    
+    assert tun.replayPcap(filename,speed=10)==5
+    for i in range(5):
+        assert sink.toMesh.get(timeout=TIMEOUT)[1][-1]==i
+
+def test_readPcap(tmpdir):
+
+    log.debug("\n---------- test_readPcap")
+    
+    # an Ethernet capture, big-endian, with an IPv4 frame to skip
+    filename = str(tmpdir.join('ethernet.pcap'))
+    packet   = makeIPv6([1,2,3])
+    with open(filename,'wb') as f:
+        f.write(struct.pack('>IHHiIII',pcapFile.MAGIC_USEC,2,4,0,0,65535,pcapFile.LINKTYPE_ETHERNET))
+        for (ts,ethertype,body) in [(1.5,0x0800,[0x45]+[0]*19),(2.25,0x86dd,packet)]:
+            frame = [0]*12+[ethertype>>8,ethertype&0xff]+body
+            f.write(struct.pack('>IIII',int(ts),int((ts%1)*1e6),len(frame),len(frame)))
+            f.write(bytearray(frame))
+    
+    assert list(pcapFile.readPcap(filename))==[(2.25,packet)]
+    
+    with open(filename,'wb') as f:
+        f.write('not a capture file at all')
+    with pytest.raises(pcapFile.PcapException):
+        list(pcapFile.readPcap(filename))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+import os
+import sys
+here = sys.path[0]
+sys.path.insert(0, os.path.join(here, '..', '..'))                             # openvisualizer/
+sys.path.insert(0, os.path.join(here, '..'))                                   # openTun/
+
+import time
+import errno
+import struct
+
+import pytest
+
+import pcapFile
+
+import logging
+import logging.handlers
+
+#============================ logging =========================================
+
+LOGFILE_NAME = 'test_pcapFile.log'
+
+import logging
+class NullHandler(logging.Handler):
+    def emit(self, record):
+        pass
+log = logging.getLogger('test_pcapFile')
+log.setLevel(logging.ERROR)
+log.addHandler(NullHandler())
+
+logHandler = logging.handlers.RotatingFileHandler(LOGFILE_NAME,
+                                                  backupCount=5,
+                                                  mode='w')
+logHandler.setFormatter(logging.Formatter("%(asctime)s [%(name)s:%(levelname)s] %(message)s"))
+for loggerName in ['test_pcapFile',
+                   'pcapFile',]:
+    temp = logging.getLogger(loggerName)
+    temp.setLevel(logging.DEBUG)
+    temp.addHandler(logHandler)
+
+#============================ defines =========================================
+
+FRAMES = [[0x41,0xcc,0x66,0xca,0xfe]+[i]*(i+1) for i in range(10)]
+
+#============================ tests ===========================================
+
+def test_pcapng(tmpdir):
+
+    log.debug("\n---------- test_pcapng")
+    
+    filename = str(tmpdir.join('capture.pcapng'))
+    writer   = pcapFile.PcapngWriter(filename,pcapFile.LINKTYPE_IEEE802_15_4_NOFCS)
+    
+    # nothing is written before a flush
+    for (i,frame) in enumerate(FRAMES):
+        writer.write(frame,1000+0.25*i)
+    assert not os.path.exists(filename)
+    writer.close()
+    
+    # the interface has the 802.15.4 link type, and the frames are all there
+    with open(filename,'rb') as f:
+        data = f.read()
+    assert struct.unpack('<IIH',data[28:38])==(pcapFile.BLOCK_IDB,20,pcapFile.LINKTYPE_IEEE802_15_4_NOFCS)
+    assert list(pcapFile.readPcapng(filename))==[(1000+0.25*i,frame) for (i,frame) in enumerate(FRAMES)]
+    assert writer.getStats()['numWritten']==len(FRAMES)
+
+def test_pcapngRotate(tmpdir):
+
+    log.debug("\n---------- test_pcapngRotate")
+    
+    filename = str(tmpdir.join('capture.pcapng'))
+    writer   = pcapFile.PcapngWriter(filename,pcapFile.LINKTYPE_IEEE802_15_4_NOFCS,maxFileSize=100)
+    for frame in FRAMES:
+        writer.write(frame,1000)
+        writer.flush()
+    writer.close()
+    
+    # every file starts with its own headers, and no frame is lost
+    filenames = [filename]+[str(tmpdir.join('capture.{0}.pcapng'.format(i))) for i in range(1,writer.getStats()['fileIndex']+1)]
+    assert len(filenames)>1
+    assert sorted(os.listdir(str(tmpdir)))==sorted(os.path.basename(f) for f in filenames)
+    frames = []
+    for f in filenames:
+        frames += [frame for (ts,frame) in pcapFile.readPcapng(f)]
+    assert frames==FRAMES
+
+def test_pcapngDrop(tmpdir):
+
+    log.debug("\n---------- test_pcapngDrop")
+    
+    filename = str(tmpdir.join('capture.pcapng'))
+    writer   = pcapFile.PcapngWriter(filename,pcapFile.LINKTYPE_IEEE802_15_4_NOFCS,maxBuffered=100)
+    
+    # what does not fit in the buffer is dropped, and counted
+    for frame in FRAMES:
+        writer.write(frame,1000)
+    writer.close()
+    numWritten = writer.getStats()['numWritten']
+    assert 0<numWritten<len(FRAMES)
+    assert writer.getStats()['numDropped']==len(FRAMES)-numWritten
+    assert [frame for (ts,frame) in pcapFile.readPcapng(filename)]==FRAMES[:numWritten]
+
+@pytest.mark.skipif(os.name!='posix',reason='named pipes are POSIX')
+def test_pcapngPipe(tmpdir):
+
+    log.debug("\n---------- test_pcapngPipe")
+    
+    filename = str(tmpdir.join('capture.fifo'))
+    os.mkfifo(filename)
+    writer   = pcapFile.PcapngWriter(filename,pcapFile.LINKTYPE_IEEE802_15_4_NOFCS,maxBuffered=256*1024)
+    big      = [0x41]*1000
+    
+    def readAll(fd):
+        data = ''
+        while True:
+            try:
+                chunk = os.read(fd,65536)
+            except OSError as err:
+                assert err.errno==errno.EAGAIN
+                return data
+            if not chunk:
+                return data
+            data += chunk
+    
+    def parse(data,name):
+        with open(str(tmpdir.join(name)),'wb') as f:
+            f.write(data)
+        return [frame for (ts,frame) in pcapFile.readPcapng(str(tmpdir.join(name)))]
+    
+    # nobody reads the pipe: flushing does not block, the frames wait
+    writer.write(FRAMES[0],1000)
+    startTime = time.time()
+    writer.flush()
+    assert time.time()-startTime<0.5
+    assert writer.getBuffered()>0
+    
+    # a reader which lags behind does not block the writer either
+    reader   = os.open(filename,os.O_RDONLY|os.O_NONBLOCK)
+    for _ in range(200):
+        writer.write(big,1000)
+    startTime = time.time()
+    writer.flush()
+    assert time.time()-startTime<0.5
+    data     = ''
+    while writer.pending or writer.getBuffered():
+        data += readAll(reader)
+        writer.flush()
+    data    += readAll(reader)
+    assert parse(data,'first.pcapng')==[FRAMES[0]]+[big]*200
+    
+    # once the reader is gone, the next one gets a capture of its own
+    os.close(reader)
+    writer.write(FRAMES[1],1000)
+    writer.flush()
+    reader   = os.open(filename,os.O_RDONLY|os.O_NONBLOCK)
+    writer.write(FRAMES[2],1000)
+    writer.flush()
+    assert parse(readAll(reader),'second.pcapng')==[FRAMES[2]]
+    os.close(reader)
+    writer.close()
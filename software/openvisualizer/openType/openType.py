@@ -8,15 +8,31 @@ log.setLevel(logging.DEBUG)
 log.addHandler(NullHandler())
 
 class openType(object):
+    '''
+    \brief Base class of the types found in the state of a mote.
+    
+    Motes report their state many times per second, so instances are updated
+    in place, and use __slots__ rather than a __dict__ to stay small.
+    '''
+    
+    __slots__ = ['initialized']
     
     def __init__(self):
-        # log
-        log.debug("creating object")
-        
         self.initialized = None
     
     #======================== public ==========================================
     
+    def getFields(self):
+        '''
+        \brief The fields of this object which are set, as a dictionary.
+        '''
+        returnVal = {}
+        for cls in type(self).__mro__:
+            for name in getattr(cls,'__slots__',[]):
+                if hasattr(self,name):
+                    returnVal[name] = getattr(self,name)
+        return returnVal
+    
     def initFromBytes(self,byteArray):
         raise NotImplementedError
     
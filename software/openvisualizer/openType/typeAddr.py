@@ -18,10 +18,9 @@ class typeAddr(openType.openType):
     ADDR_PREFIX  = 5
     ADDR_ANYCAST = 6
     
+    __slots__    = ['type','desc','addr']
+    
     def __init__(self):
-        # log
-        log.debug("creating object")
-        
         # initialize parent class
         openType.openType.__init__(self)
     
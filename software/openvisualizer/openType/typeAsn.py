@@ -11,10 +11,9 @@ import openType
 
 class typeAsn(openType.openType):
     
+    __slots__ = ['asn']
+    
     def __init__(self):
-        # log
-        log.debug("creating object")
-        
         # initialize parent class
         openType.openType.__init__(self)
     
@@ -19,10 +19,9 @@ class typeCellType(openType.openType):
     CELLTYPE_SERIALRX        = 5
     CELLTYPE_MORESERIALRX    = 6
     
+    __slots__                = ['type','desc']
+    
     def __init__(self):
-        # log
-        log.debug("creating object")
-        
         # initialize parent class
         openType.openType.__init__(self)
     
@@ -49,7 +48,6 @@ class typeCellType(openType.openType):
             self.desc = 'MORESERIALRX'
         else:
             self.desc = 'unknown'
-            self.addr = None
     
     #======================== private =========================================
     
\ No newline at end of file
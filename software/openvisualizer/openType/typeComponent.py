@@ -70,10 +70,9 @@ class typeComponent(openType.openType):
     COMPONENT_UDPLATENCY                = 0x2f
     COMPONENT_TEST                      = 0x30
     
+    __slots__                           = ['type','desc']
+    
     def __init__(self):
-        # log
-        log.debug("creating object")
-        
         # initialize parent class
         openType.openType.__init__(self)
     
@@ -195,7 +194,6 @@ class typeComponent(openType.openType):
             self.desc = 'TEST'
         else:
             self.desc = 'unknown'
-            self.addr = None
     
     #======================== private =========================================
     
\ No newline at end of file
@@ -11,10 +11,9 @@ import openType
 
 class typeRssi(openType.openType):
     
+    __slots__ = ['rssi']
+    
     def __init__(self):
-        # log
-        log.debug("creating object")
-        
         # initialize parent class
         openType.openType.__init__(self)
     